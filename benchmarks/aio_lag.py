@@ -0,0 +1,91 @@
+"""Measure event loop lag while hashing concurrent streams with asyncio.
+
+STREAMS streams of SIZE bytes, produced in 64 KiB chunks, are hashed
+concurrently with SHA256 while a ticker measures how late the event loop
+wakes it every millisecond. Compares tls.hashlib.aio.iter_digest() with
+calling update() on the event loop for each 1 MiB of coalesced chunks, and
+with consuming the chunks without hashing them, the lag of the producers
+alone. Requires Python 3.6 or later and a CPU for each stream:
+
+    $ python benchmarks/aio_lag.py
+"""
+from __future__ import absolute_import, division, print_function
+import asyncio
+import os
+from timeit import default_timer
+
+from tls import hashlib
+from tls.hashlib import aio
+
+STREAMS = 4
+SIZE = 2 * 1024 * 1024 * 1024
+CHUNK = 64 * 1024
+INTERVAL = 0.001
+
+BLOCK = os.urandom(CHUNK)
+
+
+async def produce():
+    "Generate the chunks of a stream, yielding to the event loop for each"
+    for _ in range(SIZE // CHUNK):
+        await asyncio.sleep(0)
+        yield BLOCK
+
+
+async def consume(chunks):
+    "Consume chunks without hashing them"
+    async for data in chunks:
+        pass
+
+
+async def inline(chunks):
+    "Hash chunks on the event loop, coalesced to the same size as aio"
+    digest = hashlib.sha256()
+    buff = bytearray()
+    async for data in chunks:
+        buff += data
+        if len(buff) >= aio.CHUNK_SIZE:
+            digest.update(buff)
+            buff = bytearray()
+    digest.update(buff)
+    return digest
+
+
+async def offloaded(chunks):
+    return await aio.iter_digest(chunks, b'SHA256')
+
+
+async def ticker(lags, done):
+    "Record how late each tick of the event loop is"
+    loop = asyncio.get_event_loop()
+    while not done.is_set():
+        start = loop.time()
+        await asyncio.sleep(INTERVAL)
+        lags.append(loop.time() - start - INTERVAL)
+
+
+async def measure(case):
+    lags = []
+    done = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, done))
+    start = default_timer()
+    await asyncio.gather(*[case(produce()) for _ in range(STREAMS)])
+    elapsed = default_timer() - start
+    done.set()
+    await tick
+    return elapsed, sorted(lags)
+
+
+def main():
+    loop = asyncio.get_event_loop()
+    for case in (consume, inline, offloaded):
+        elapsed, lags = loop.run_until_complete(measure(case))
+        p99 = lags[int(len(lags) * 0.99)]
+        print('{0:<10} {1:8.1f} MiB/s p99 lag {2:6.3f} ms max lag {3:6.3f} '
+              'ms'.format(case.__name__,
+                  STREAMS * SIZE / elapsed / 1024 / 1024,
+                  1e3 * p99, 1e3 * lags[-1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Measure the throughput of AES-128-CBC with an HMAC-SHA1 using Cipher.
+
+Compares the default chain of cipher, buffer and memory BIOs, retrieving
+the output with ciphertext(), with the direct mode returning the output of
+update(). Small records encrypt a message of 64 bytes with a new
+initialise() for each, and bulk encrypts 64 MiB in updates of 64 KiB:
+
+    $ python benchmarks/cipher_direct.py
+"""
+from __future__ import absolute_import, division, print_function
+import timeit
+
+from tls import cipherlib
+
+KEY = b'\x0b' * 16
+IVECTOR = b'\x00' * 16
+RECORD = b'\x00' * 64
+RECORDS = 10000
+CHUNK = b'\x00' * (64 * 1024)
+CHUNKS = 1024
+
+REPEAT = 3
+
+
+def records(direct):
+    cipher = cipherlib.Cipher(direct=direct)
+    output = []
+    for _ in range(RECORDS):
+        cipher.initialise(KEY, IVECTOR)
+        if direct:
+            output.append(cipher.update(RECORD) + cipher.finish())
+        else:
+            cipher.update(RECORD)
+            cipher.finish()
+            output.append(cipher.ciphertext())
+    return output
+
+
+def bulk(direct):
+    cipher = cipherlib.Cipher(direct=direct)
+    cipher.initialise(KEY, IVECTOR)
+    for _ in range(CHUNKS):
+        if direct:
+            cipher.update(CHUNK)
+        else:
+            cipher.update(CHUNK)
+            cipher.ciphertext()
+    cipher.finish()
+    cipher.ciphertext()
+
+
+def main():
+    for direct in (False, True):
+        mode = 'direct' if direct else 'chain'
+        best = min(timeit.repeat(lambda: records(direct), repeat=REPEAT,
+                number=1))
+        print('{0:<7} records {1:10.0f} records/s'.format(mode,
+            RECORDS / best))
+        best = min(timeit.repeat(lambda: bulk(direct), repeat=REPEAT,
+                number=1))
+        print('{0:<7} bulk    {1:10.1f} MiB/s'.format(mode,
+            CHUNKS * len(CHUNK) / best / 1024 ** 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Measure the latency of hashing and finalising short messages.
+
+Each iteration hashes a 32 byte message with SHA256 and retrieves its digest,
+comparing the per object scratch space used by MessageDigest with the
+previous implementation, which allocated and initialised a new context and
+buffers for each digest and formatted hexdigest() one byte at a time:
+
+    $ python benchmarks/digest_final.py
+"""
+from __future__ import absolute_import, division, print_function
+import itertools
+import timeit
+
+from tls import hashlib
+from tls.c import api
+
+NUMBER = 100000
+REPEAT = 5
+
+MESSAGE = b'\x00' * 32
+
+
+def previous_digest(digest):
+    "The allocation per call digest of the previous implementation"
+    buff = api.new('unsigned char[]', api.EVP_MAX_MD_SIZE)
+    size = api.new('unsigned int*')
+    context = api.new('EVP_MD_CTX*')
+    api.EVP_DigestInit_ex(context, digest._md, api.NULL)
+    api.EVP_MD_CTX_copy_ex(context, digest._context)
+    api.EVP_DigestFinal_ex(context, buff, size)
+    api.EVP_MD_CTX_cleanup(context)
+    return buff, size[0]
+
+
+def previous_hexdigest(digest):
+    buff, size = previous_digest(digest)
+    return b''.join('{0:02x}'.format(b).encode()
+            for b in itertools.islice(buff, size))
+
+
+def before():
+    digest = hashlib.sha256(MESSAGE)
+    buff, size = previous_digest(digest)
+    return bytes(api.buffer(buff, size))
+
+
+def before_hex():
+    return previous_hexdigest(hashlib.sha256(MESSAGE))
+
+
+def after():
+    return hashlib.sha256(MESSAGE).digest()
+
+
+def after_hex():
+    return hashlib.sha256(MESSAGE).hexdigest()
+
+
+OUTPUT = bytearray(64)
+
+
+def after_into():
+    return hashlib.sha256(MESSAGE).digest_into(OUTPUT)
+
+
+def main():
+    for case in (before, after, after_into, before_hex, after_hex):
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER))
+        print('{0:<12} {1:8.2f} us'.format(case.__name__,
+            1e6 * best / NUMBER))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Measure the memory held by live hash objects and the rate of creating them.
+
+Compares MessageDigest, which has no instance dictionary and reuses digest
+contexts from a free list for each algorithm, with the previous
+implementation, which had an instance dictionary and allocated and cleaned
+up a new context for every object. The Python memory of each live object is
+measured with tracemalloc on Python 3.4 and later, and the native memory
+allocated by OpenSSL when OPENTLS_MEMORY_ACCOUNTING is set:
+
+    $ OPENTLS_MEMORY_ACCOUNTING=1 python benchmarks/digest_footprint.py
+"""
+from __future__ import absolute_import, division, print_function
+import gc
+import timeit
+import weakref
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from tls import hashlib
+from tls.c import api, memory
+
+LIVE = 100000
+NUMBER = 100000
+REPEAT = 5
+
+DESCRIPTOR = hashlib.descriptor(b'SHA256')
+
+
+class PreviousDigest(object):
+    "The construction of a MessageDigest by the previous implementation"
+
+    def __init__(self, descriptor, data=None, engine=None):
+        context = api.new('EVP_MD_CTX*')
+        cleanup = lambda _: api.EVP_MD_CTX_cleanup(context)
+        self._context = context
+        self._descriptor = descriptor
+        self._md = descriptor.md
+        self._engine = engine
+        self._scratch = None
+        api.EVP_DigestInit_ex(context, self._md, api.NULL)
+        self._weakref = weakref.ref(self, cleanup)
+
+
+def before():
+    return PreviousDigest(DESCRIPTOR)
+
+
+def after():
+    return hashlib.MessageDigest(DESCRIPTOR)
+
+
+def footprint(case):
+    "Return the Python and native bytes held by each live object of case"
+    gc.collect()
+    native = memory.totals().live if memory.enabled else 0
+    python = tracemalloc.get_traced_memory()[0] if tracemalloc else 0
+    objects = [case() for _ in range(LIVE)]
+    if tracemalloc:
+        python = (tracemalloc.get_traced_memory()[0] - python) / LIVE
+    if memory.enabled:
+        native = (memory.totals().live - native) / LIVE
+    del objects
+    return python, native
+
+
+def main():
+    if tracemalloc:
+        tracemalloc.start()
+    for case in (before, after):
+        python, native = footprint(case)
+        print('{0:<8} {1:8.0f} B python {2:8.0f} B native'.format(
+            case.__name__, python, native))
+    if tracemalloc:
+        tracemalloc.stop()
+    for case in (before, after):
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER))
+        print('{0:<8} {1:10.0f} objects/s'.format(case.__name__,
+            NUMBER / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Measure the rate of creating, updating and finalising short digests.
+
+Each iteration runs sha256(b'x').digest(), which is dominated by the cost of
+creating a hash object:
+
+    $ python benchmarks/digest_new.py
+"""
+from __future__ import absolute_import, division, print_function
+import timeit
+
+SETUP = "from tls import hashlib"
+
+CASES = (
+    ('sha256', "hashlib.sha256(b'x').digest()"),
+    ('new', "hashlib.new(b'SHA256', b'x').digest()"),
+)
+
+NUMBER = 100000
+REPEAT = 5
+
+
+def main():
+    for name, statement in CASES:
+        timer = timeit.Timer(statement, SETUP)
+        best = min(timer.repeat(REPEAT, NUMBER))
+        print('{0:<8} {1:10.0f} digests/s'.format(name, NUMBER / best))
+
+
+if __name__ == '__main__':
+    main()
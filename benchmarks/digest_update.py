@@ -0,0 +1,72 @@
+"""Measure the throughput of MessageDigest.update() for different input sizes.
+
+SHA256 digests are updated with 64 B, 4 KiB, 1 MiB and 64 MiB inputs by:
+
+ - tls:     tls.hashlib, passing the input's buffer to OpenSSL.
+ - copying: the previous implementation, copying the input into a new
+            char[] before each call to EVP_DigestUpdate.
+ - stdlib:  Python's hashlib.
+
+    $ python benchmarks/digest_update.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import hashlib as stdlib_hashlib
+
+from tls import hashlib
+from tls.c import api
+
+SIZES = (
+    ('64 B', 64),
+    ('4 KiB', 4 * 1024),
+    ('1 MiB', 1024 * 1024),
+    ('64 MiB', 64 * 1024 * 1024),
+)
+# bytes hashed for each size and implementation
+VOLUME = 256 * 1024 * 1024
+
+
+def tls_update(data, count):
+    digest = hashlib.new(b'SHA256')
+    for _ in range(count):
+        digest.update(data)
+    digest.digest()
+
+
+def copying_update(data, count):
+    digest = hashlib.new(b'SHA256')
+    for _ in range(count):
+        buff = api.new('char[]', data)
+        ptr = api.cast('void*', buff)
+        api.EVP_DigestUpdate(digest._context, ptr, len(data))
+    digest.digest()
+
+
+def stdlib_update(data, count):
+    digest = stdlib_hashlib.sha256()
+    for _ in range(count):
+        digest.update(data)
+    digest.digest()
+
+
+def throughput(update, data):
+    "Return the GB/s hashed by update"
+    count = max(1, VOLUME // len(data))
+    start = default_timer()
+    update(data, count)
+    seconds = default_timer() - start
+    return count * len(data) / seconds / 1e9
+
+
+def main():
+    updates = (('tls', tls_update), ('copying', copying_update),
+               ('stdlib', stdlib_update))
+    for label, size in SIZES:
+        data = b'\x00' * size
+        for name, update in updates:
+            print('{0:<8} {1:<8} {2:8.3f} GB/s'.format(
+                label, name, throughput(update, data)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare the throughput of OpenSSL's default implementations and an engine.
+
+Bulk hashing, encryption and random number generation are measured with the
+default implementations and with each engine named on the command line,
+defaulting to rdrand. Engines that are not available are skipped:
+
+    $ python benchmarks/engine.py rdrand
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import sys
+
+from tls import cipherlib, engine, hashlib
+from tls.c import api
+
+BLOCK = b'\x00' * (1024 * 1024)
+ROUNDS = 32
+KEY = b'montypythonfunny'
+IVECTOR = b'\x00' * 16
+
+
+def sha256(engine_):
+    digest = hashlib.new(b'SHA256', engine=engine_)
+    for _ in range(ROUNDS):
+        digest.update(BLOCK)
+    digest.digest()
+
+
+def aes_128_cbc(engine_):
+    cipher = cipherlib.Cipher(encrypt=True, algorithm=b'AES-128-CBC',
+            digest=None, engine=engine_)
+    cipher.initialise(KEY, IVECTOR)
+    for _ in range(ROUNDS):
+        cipher.update(BLOCK)
+        cipher.ciphertext()
+    cipher.finish()
+
+
+def rand_bytes(engine_):
+    buff = api.new('unsigned char[]', len(BLOCK))
+    if engine_ is not None:
+        engine_.set_default(engine.ENGINE_METHOD_RAND)
+    for _ in range(ROUNDS):
+        api.RAND_bytes(buff, len(buff))
+
+
+def throughput(work, engine_):
+    "Return the MB/s processed by work using engine"
+    start = default_timer()
+    work(engine_)
+    seconds = default_timer() - start
+    return ROUNDS * len(BLOCK) / seconds / 1e6
+
+
+def main(names):
+    available = engine.engines_available()
+    engines = [('default', None)]
+    for name in names:
+        if name not in available:
+            print('{0}: engine not available'.format(name.decode()))
+            continue
+        engines.append((name.decode(), engine.Engine(name)))
+    for work in (sha256, aes_128_cbc):
+        for name, engine_ in engines:
+            print('{0:<12} {1:<10} {2:10.1f} MB/s'.format(
+                work.__name__, name, throughput(work, engine_)))
+    # an engine installed as the default RAND method stays installed
+    for name, engine_ in engines:
+        print('{0:<12} {1:<10} {2:10.1f} MB/s'.format(
+            rand_bytes.__name__, name, throughput(rand_bytes, engine_)))
+
+
+if __name__ == '__main__':
+    main([name.encode() for name in sys.argv[1:]] or [b'rdrand'])
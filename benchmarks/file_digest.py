@@ -0,0 +1,70 @@
+"""Measure the throughput of hashing a 1 GiB temporary file.
+
+Compares hashlib.file_digest() given a file name, given an open file object
+and a Python loop reading chunks into MessageDigest.update(), with the
+standard library's hashlib reading the same chunks:
+
+    $ python benchmarks/file_digest.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import hashlib as stdlib_hashlib
+import os
+import tempfile
+
+from tls import hashlib
+
+SIZE = 1024 * 1024 * 1024
+CHUNK = 1024 * 1024
+
+
+def create():
+    "Return the name of a new temporary file of SIZE bytes"
+    fd, filename = tempfile.mkstemp()
+    block = os.urandom(CHUNK)
+    for _ in range(SIZE // CHUNK):
+        os.write(fd, block)
+    os.close(fd)
+    return filename
+
+
+def filename_digest(filename):
+    hashlib.file_digest(filename, b'SHA256').digest()
+
+
+def fileobj_digest(filename):
+    with open(filename, 'rb') as fileobj:
+        hashlib.file_digest(fileobj, b'SHA256').digest()
+
+
+def read_loop(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(CHUNK), b''):
+            digest.update(chunk)
+    digest.digest()
+
+
+def stdlib_loop(filename):
+    digest = stdlib_hashlib.sha256()
+    with open(filename, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(CHUNK), b''):
+            digest.update(chunk)
+    digest.digest()
+
+
+def main():
+    filename = create()
+    try:
+        for case in (filename_digest, fileobj_digest, read_loop, stdlib_loop):
+            start = default_timer()
+            case(filename)
+            seconds = default_timer() - start
+            print('{0:<16} {1:8.3f} GB/s'.format(case.__name__,
+                SIZE / seconds / 1e9))
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
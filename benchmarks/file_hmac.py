@@ -0,0 +1,69 @@
+"""Measure the throughput of authenticating a 1 GiB file with HMAC-SHA256.
+
+ - update:    reading the file in Python and calling HMAC.update() for each
+              chunk.
+ - file_hmac: tls.hmac.file_hmac() reading the file in OpenSSL.
+ - copy:      copying the file through an HMACFilter with
+              BIOChain.copy_to(), authenticating it in the same pass.
+
+The file is created in a temporary directory and removed afterwards:
+
+    $ python benchmarks/file_hmac.py
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from tls import hmac
+from tls import io
+
+KEY = b'\x0b' * 32
+DIGEST = b'sha256'
+SIZE = 1024 ** 3
+CHUNK = 1024 * 1024
+
+REPEAT = 3
+
+
+def update(path):
+    mac = hmac.new(KEY, None, DIGEST)
+    with open(path, 'rb') as fileobj:
+        data = fileobj.read(CHUNK)
+        while data:
+            mac.update(data)
+            data = fileobj.read(CHUNK)
+    return mac.digest()
+
+
+def file_hmac(path):
+    return hmac.file_hmac(KEY, path, DIGEST).digest()
+
+
+def copy(path):
+    with io.BIOFile(path) as source:
+        with io.BIOFile(path + '.copy', 'w') as destination:
+            mac = hmac.HMACFilter(source, KEY, DIGEST)
+            source.copy_to(destination, CHUNK)
+            return mac.digest()
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'data')
+        with open(path, 'wb') as fileobj:
+            for _ in range(SIZE // CHUNK):
+                fileobj.write(os.urandom(CHUNK))
+        for case in (update, file_hmac, copy):
+            best = min(timeit.repeat(lambda: case(path), repeat=REPEAT,
+                    number=1))
+            print('{0:<10} {1:8.1f} MiB/s'.format(case.__name__,
+                SIZE / best / 1024 ** 2))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Report the import time and memory use of each public module.
+
+Compares importing each module with the prebuilt bindings loaded lazily
+against also loading every group of bindings, as was done before the
+bindings were split into groups. Each measurement imports the module in a
+new interpreter. Build the extension modules before running the benchmark:
+
+    $ python tls/c/_build.py
+    $ python benchmarks/footprint.py
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 5
+
+MODULES = [
+    'tls.err',
+    'tls.hashlib',
+    'tls.hmac',
+    'tls.random',
+    'tls.kdf',
+    'tls.cipherlib',
+    'tls.io',
+]
+
+SCRIPT = """
+import resource
+from timeit import default_timer
+start = default_timer()
+import {module}
+if {eager}:
+    from tls.c import api
+    for name in list(api._providers):
+        getattr(api, name, None)
+elapsed = default_timer() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def measure(module, eager):
+    "Return the best import time and peak RSS (KiB) for module"
+    script = SCRIPT.format(module=module, eager=eager)
+    timings = []
+    for _ in range(REPEAT):
+        output = subprocess.check_output([sys.executable, '-c', script],
+                cwd=ROOT)
+        elapsed, rss = output.decode().split()
+        timings.append(float(elapsed))
+    return min(timings), int(rss)
+
+
+def main():
+    print('{0:<14} {1:>9} {2:>9} {3:>9} {4:>9}'.format(
+        'module', 'lazy ms', 'all ms', 'lazy KiB', 'all KiB'))
+    for module in MODULES:
+        lazy_time, lazy_rss = measure(module, eager=False)
+        eager_time, eager_rss = measure(module, eager=True)
+        print('{0:<14} {1:9.1f} {2:9.1f} {3:9d} {4:9d}'.format(module,
+            1000 * lazy_time, 1000 * eager_time, lazy_rss, eager_rss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Measure the rate of hashing many small records.
+
+Compares hashing each record with a new hash object, hash_many() given a
+list of records and hash_many() given one buffer and an array of offsets,
+with the standard library's hashlib:
+
+    $ python benchmarks/hash_many.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import array
+import hashlib as stdlib_hashlib
+import os
+import random
+
+from tls import hashlib
+from tls.c import api
+
+COUNT = 200000
+RECORDS = [os.urandom(random.randint(32, 512)) for _ in range(COUNT)]
+BUFFER = b''.join(RECORDS)
+SIZE_T = api.ffi.sizeof('size_t')
+OFFSETS = array.array('L' if array.array('L').itemsize == SIZE_T else 'Q', [0])
+for record in RECORDS:
+    OFFSETS.append(OFFSETS[-1] + len(record))
+
+
+def objects():
+    return [hashlib.sha256(record).digest() for record in RECORDS]
+
+
+def many_list():
+    return hashlib.hash_many(b'SHA256', RECORDS)
+
+
+def many_offsets():
+    return hashlib.hash_many(b'SHA256', BUFFER, OFFSETS, packed=True)
+
+
+def stdlib():
+    return [stdlib_hashlib.sha256(record).digest() for record in RECORDS]
+
+
+def main():
+    for case in (objects, many_list, many_offsets, stdlib):
+        start = default_timer()
+        case()
+        seconds = default_timer() - start
+        print('{0:<14} {1:12.0f} records/s'.format(case.__name__,
+            COUNT / seconds))
+
+
+if __name__ == '__main__':
+    main()
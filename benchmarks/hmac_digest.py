@@ -0,0 +1,39 @@
+"""Measure the latency of calculating HMAC-SHA256 of short messages.
+
+Compares the one shot tls.hmac.digest() with creating an HMAC object using
+tls.hmac.new(), and with the standard library's hmac.digest() on Python 3.7
+and later:
+
+    $ python benchmarks/hmac_digest.py
+"""
+from __future__ import absolute_import, division, print_function
+import hmac as stdlib_hmac
+import timeit
+
+from tls import hmac
+
+KEY = b'\x0b' * 32
+SIZES = (16, 64, 256)
+
+NUMBER = 100000
+REPEAT = 5
+
+
+def cases(message):
+    yield 'new', lambda: hmac.new(KEY, message, b'sha256').digest()
+    yield 'digest', lambda: hmac.digest(KEY, message, b'sha256')
+    if hasattr(stdlib_hmac, 'digest'):
+        yield 'stdlib', lambda: stdlib_hmac.digest(KEY, message, 'sha256')
+
+
+def main():
+    for size in SIZES:
+        message = b'\x00' * size
+        for name, case in cases(message):
+            best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER))
+            print('{0:4d} B {1:<8} {2:8.2f} us'.format(size, name,
+                1e6 * best / NUMBER))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Measure the rate of signing short messages with HMAC-SHA256.
+
+Compares keying a new HMAC object for every message with copying the
+prepared states of an HMACKey, and with resetting a single HMAC object:
+
+    $ python benchmarks/hmac_key.py
+"""
+from __future__ import absolute_import, division, print_function
+import timeit
+
+from tls import hmac
+
+KEY = b'\x0b' * 32
+MESSAGE = b'\x00' * 64
+DIGEST = b'sha256'
+
+NUMBER = 100000
+REPEAT = 5
+
+
+def per_message():
+    return hmac.new(KEY, MESSAGE, DIGEST).digest()
+
+
+PREPARED = hmac.HMACKey(KEY, DIGEST)
+
+
+def key_new():
+    return PREPARED.new(MESSAGE).digest()
+
+
+REUSED = hmac.new(KEY, None, DIGEST)
+
+
+def reset():
+    REUSED.reset()
+    REUSED.update(MESSAGE)
+    return REUSED.digest()
+
+
+def main():
+    for case in (per_message, key_new, reset):
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER))
+        print('{0:<12} {1:10.0f} messages/s'.format(case.__name__,
+            NUMBER / best))
+
+
+if __name__ == '__main__':
+    main()
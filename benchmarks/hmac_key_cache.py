@@ -0,0 +1,71 @@
+"""Measure the rate of signing messages for many tenants with HMAC-SHA256.
+
+Tenants are drawn from a Zipfian distribution over 50k tenants, so a few hot
+tenants sign most messages. Compares keying a new HMAC object for every
+message with an HMACKeyCache of several sizes, reporting its hit rate:
+
+    $ python benchmarks/hmac_key_cache.py
+"""
+from __future__ import absolute_import, division, print_function
+import bisect
+import random
+import timeit
+
+from tls import hmac
+
+TENANTS = 50000
+EXPONENT = 1.1
+MESSAGE = b'\x00' * 64
+DIGEST = b'sha256'
+SIZES = (1000, 5000, 50000)
+
+NUMBER = 100000
+REPEAT = 3
+
+
+def zipf(count, exponent, number, seed=0):
+    "Return number tenant ids drawn from a Zipfian distribution"
+    weights = [1 / (rank ** exponent) for rank in range(1, count + 1)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    rand = random.Random(seed)
+    return [bisect.bisect(cumulative, rand.random() * total)
+            for _ in range(number)]
+
+
+def load(tenant):
+    return 'tenant-{0}-secret-key'.format(tenant).encode()
+
+
+def per_message(tenants):
+    for tenant in tenants:
+        hmac.new(load(tenant), MESSAGE, DIGEST).digest()
+
+
+def cached(cache, tenants):
+    for tenant in tenants:
+        cache.new(tenant, MESSAGE).digest()
+
+
+def main():
+    tenants = zipf(TENANTS, EXPONENT, NUMBER)
+    best = min(timeit.repeat(lambda: per_message(tenants), repeat=REPEAT,
+            number=1))
+    print('{0:<14} {1:10.0f} messages/s'.format('per message',
+        NUMBER / best))
+    for size in SIZES:
+        cache = hmac.HMACKeyCache(load, maxsize=size, digestmod=DIGEST)
+        cached(cache, tenants)
+        best = min(timeit.repeat(lambda: cached(cache, tenants),
+                repeat=REPEAT, number=1))
+        info = cache.info()
+        print('{0:<14} {1:10.0f} messages/s  hit rate {2:6.2%}'.format(
+            'cache {0}'.format(size), NUMBER / best,
+            info.hits / (info.hits + info.misses)))
+
+
+if __name__ == '__main__':
+    main()
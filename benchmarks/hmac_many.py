@@ -0,0 +1,44 @@
+"""Measure the throughput of signing and verifying batches of messages.
+
+Compares a Python loop of tls.hmac.digest() and tls.hmac.compare_digest()
+with tls.hmac.sign_many() and tls.hmac.verify_many(), for batches of 10k to
+1M messages of 64 bytes signed with HMAC-SHA256:
+
+    $ python benchmarks/hmac_many.py
+"""
+from __future__ import absolute_import, division, print_function
+import timeit
+
+from tls import hmac
+
+KEY = b'\x0b' * 32
+DIGEST = b'sha256'
+SIZE = 64
+COUNTS = (10000, 100000, 1000000)
+
+REPEAT = 3
+
+
+def cases(messages, tags):
+    yield 'sign loop', lambda: [hmac.digest(KEY, message, DIGEST)
+                                for message in messages]
+    yield 'sign_many', lambda: hmac.sign_many(KEY, messages, DIGEST,
+                                              packed=True)
+    yield 'verify loop', lambda: [
+            hmac.compare_digest(hmac.digest(KEY, message, DIGEST), tag)
+            for message, tag in zip(messages, tags)]
+    yield 'verify_many', lambda: hmac.verify_many(KEY, messages, tags, DIGEST)
+
+
+def main():
+    for count in COUNTS:
+        messages = [str(i).zfill(SIZE).encode() for i in range(count)]
+        tags = hmac.sign_many(KEY, messages, DIGEST)
+        for name, case in cases(messages, tags):
+            best = min(timeit.repeat(case, repeat=REPEAT, number=1))
+            print('{0:8d} {1:<12} {2:12.0f} messages/s'.format(count, name,
+                count / best))
+
+
+if __name__ == '__main__':
+    main()
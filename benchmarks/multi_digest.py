@@ -0,0 +1,63 @@
+"""Measure the throughput of calculating MD5, SHA1 and SHA256 of a file.
+
+Compares hashlib.file_digest() with a MultiDigest, reading the file once,
+against three passes of hashlib.file_digest() with a single algorithm and a
+Python loop updating three hash objects with each chunk:
+
+    $ python benchmarks/multi_digest.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import os
+import tempfile
+
+from tls import hashlib
+
+NAMES = (b'MD5', b'SHA1', b'SHA256')
+SIZE = 256 * 1024 * 1024
+CHUNK = 1024 * 1024
+
+
+def create():
+    "Return the name of a new temporary file of SIZE bytes"
+    fd, filename = tempfile.mkstemp()
+    block = os.urandom(CHUNK)
+    for _ in range(SIZE // CHUNK):
+        os.write(fd, block)
+    os.close(fd)
+    return filename
+
+
+def multi_digest(filename):
+    return hashlib.file_digest(filename, NAMES).digests()
+
+
+def three_passes(filename):
+    return dict((name, hashlib.file_digest(filename, name).digest())
+                for name in NAMES)
+
+
+def python_loop(filename):
+    digests = [hashlib.new(name) for name in NAMES]
+    with open(filename, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(CHUNK), b''):
+            for digest in digests:
+                digest.update(chunk)
+    return dict((digest.name, digest.digest()) for digest in digests)
+
+
+def main():
+    filename = create()
+    try:
+        for case in (multi_digest, three_passes, python_loop):
+            start = default_timer()
+            case(filename)
+            seconds = default_timer() - start
+            print('{0:<14} {1:8.3f} GB/s'.format(case.__name__,
+                SIZE / seconds / 1e9))
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measure the rate of encrypting 4 KiB pages with AES-128-CTR.
+
+Compares encrypting each page with the BIO chain of Cipher, with direct
+update() returning new bytes, with update_into() writing to a preallocated
+bytearray and with update_into() encrypting the page in place. The pages are
+not authenticated by an HMAC. The peak Python memory allocated while
+encrypting the pages is measured with tracemalloc on Python 3.4 and later,
+and the native allocations made by OpenSSL for each page when
+OPENTLS_MEMORY_ACCOUNTING is set:
+
+    $ OPENTLS_MEMORY_ACCOUNTING=1 python benchmarks/page_encrypt.py
+"""
+from __future__ import absolute_import, division, print_function
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from tls import cipherlib
+from tls.c import memory
+
+KEY = b'\x0b' * 16
+IVECTOR = b'\x00' * 16
+PAGE_SIZE = 4096
+PAGES = 10000
+
+REPEAT = 3
+
+
+def chain(pages, out):
+    cipher = cipherlib.Cipher(True, b'AES-128-CTR', None)
+    for page in pages:
+        cipher.initialise(KEY, IVECTOR)
+        cipher.update(page)
+        cipher.finish()
+        cipher.ciphertext()
+
+
+def direct(pages, out):
+    cipher = cipherlib.Cipher(True, b'AES-128-CTR', None, direct=True)
+    for page in pages:
+        cipher.initialise(KEY, IVECTOR)
+        cipher.update(page)
+        cipher.finish()
+
+
+def update_into(pages, out):
+    cipher = cipherlib.Cipher(True, b'AES-128-CTR', None, direct=True)
+    for page in pages:
+        cipher.initialise(KEY, IVECTOR)
+        size = cipher.update_into(page, out)
+        cipher.finish_into(out[size:])
+
+
+def in_place(pages, out):
+    cipher = cipherlib.Cipher(True, b'AES-128-CTR', None, direct=True)
+    for page in pages:
+        cipher.initialise(KEY, IVECTOR)
+        cipher.update_into(page, page)
+        cipher.finish_into(out)
+
+
+def allocations(case, pages, out):
+    "Return the peak Python bytes and the native allocations of each page"
+    python = native = 0
+    if tracemalloc:
+        tracemalloc.start()
+    if memory.enabled:
+        native = memory.totals().total
+    case(pages, out)
+    if memory.enabled:
+        native = (memory.totals().total - native) / len(pages)
+    if tracemalloc:
+        python = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return python, native
+
+
+def main():
+    pages = [bytearray(PAGE_SIZE) for _ in range(PAGES)]
+    out = memoryview(bytearray(2 * PAGE_SIZE))
+    for case in (chain, direct, update_into, in_place):
+        best = min(timeit.repeat(lambda: case(pages, out), repeat=REPEAT,
+                number=1))
+        python, native = allocations(case, pages, out)
+        print('{0:<12} {1:8.1f} MB/s {2:8d} B python peak {3:6.2f} native '
+              'allocations per page'.format(case.__name__,
+                  PAGES * PAGE_SIZE / best / 1e6, python, native))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure the cost of listing the available algorithms.
+
+ - import:    importing tls.hashlib and tls.cipherlib, which no longer list
+              the algorithms.
+ - callback:  tls.util.all_obj_type_names() for digests and ciphers, the
+              import time scan of previous versions.
+ - build:     first use of both registries, listing the algorithms with a
+              single call to OpenSSL for each.
+ - cached:    first use of both registries loaded from OPENTLS_REGISTRY_CACHE.
+
+Each measurement runs in a new interpreter:
+
+    $ python benchmarks/registry.py
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 5
+
+SCRIPTS = {
+    'import': """
+import tls.c
+from timeit import default_timer
+start = default_timer()
+import tls.hashlib, tls.cipherlib
+print(default_timer() - start)
+""",
+    'callback': """
+from tls.c import api
+from tls.util import all_obj_type_names
+from timeit import default_timer
+start = default_timer()
+all_obj_type_names(api.OBJ_NAME_TYPE_MD_METH)
+all_obj_type_names(api.OBJ_NAME_TYPE_CIPHER_METH)
+print(default_timer() - start)
+""",
+    'build': """
+from tls import registry
+from timeit import default_timer
+start = default_timer()
+len(registry.digests), len(registry.ciphers)
+print(default_timer() - start)
+""",
+}
+SCRIPTS['cached'] = SCRIPTS['build']
+
+
+def measure(case, directory):
+    "Return the seconds taken by a case in a new interpreter"
+    env = dict(os.environ)
+    if case == 'cached':
+        env['OPENTLS_REGISTRY_CACHE'] = directory
+    output = subprocess.check_output([sys.executable, '-c', SCRIPTS[case]],
+            cwd=ROOT, env=env)
+    return float(output.decode().strip())
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        measure('cached', directory)
+        for case in ('import', 'callback', 'build', 'cached'):
+            timings = [measure(case, directory) for _ in range(REPEAT)]
+            print('{0:<10} best {1:8.2f} ms  mean {2:8.2f} ms'.format(case,
+                1000 * min(timings), 1000 * sum(timings) / len(timings)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
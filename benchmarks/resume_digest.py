@@ -0,0 +1,53 @@
+"""Measure the latency of completing a chunked upload's digest.
+
+An upload of CHUNKS chunks of CHUNK bytes has its final chunk received by a
+worker. Before, the worker rehashed the whole upload. After, it resumes from
+the state exported after the previous chunk, hashing only the final chunk.
+The cost of exporting and importing a state is also reported:
+
+    $ python benchmarks/resume_digest.py
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import timeit
+
+from tls import hashlib
+
+CHUNK = 8 * 1024 * 1024
+CHUNKS = 32
+NUMBER = 10000
+REPEAT = 5
+
+
+def main():
+    chunk = os.urandom(CHUNK)
+    digest = hashlib.sha256()
+    for _ in range(CHUNKS - 1):
+        digest.update(chunk)
+    state = digest.export_state()
+
+    def rehash():
+        digest = hashlib.sha256()
+        for _ in range(CHUNKS):
+            digest.update(chunk)
+        return digest.digest()
+
+    def resume():
+        digest = hashlib.import_state(state)
+        digest.update(chunk)
+        return digest.digest()
+
+    for case in (rehash, resume):
+        best = min(timeit.repeat(case, repeat=REPEAT, number=1))
+        print('{0:<8} {1:10.2f} ms'.format(case.__name__, 1e3 * best))
+    cases = (
+        ('export', digest.export_state),
+        ('import', lambda: hashlib.import_state(state)),
+    )
+    for name, case in cases:
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER))
+        print('{0:<8} {1:10.2f} us'.format(name, 1e6 * best / NUMBER))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Compare the import time of the OpenSSL bindings.
+
+ - cold:     ffi.verify() with an empty cache, compiling the bindings.
+ - warm:     ffi.verify() with a populated cache, parsing the definitions.
+ - prebuilt: loading the extension module built by tls/c/_build.py.
+
+Each measurement imports tls.c in a new interpreter. Build the extension
+module before running the benchmark:
+
+    $ python tls/c/_build.py
+    $ python benchmarks/startup.py
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import subprocess
+import sys
+
+import cffi.verifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE = os.path.join(ROOT, 'tls', 'c', '__pycache__')
+REPEAT = 5
+
+SCRIPT = """
+from timeit import default_timer
+start = default_timer()
+import tls.c
+print(default_timer() - start)
+"""
+
+
+def import_time(prebuilt):
+    "Return the seconds taken to import tls.c in a new interpreter"
+    env = dict(os.environ, OPENTLS_PREBUILT='1' if prebuilt else '0')
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT],
+            cwd=ROOT, env=env)
+    return float(output.decode().strip())
+
+
+def cold():
+    cffi.verifier.cleanup_tmpdir(CACHE)
+    return import_time(prebuilt=False)
+
+
+def warm():
+    return import_time(prebuilt=False)
+
+
+def prebuilt():
+    return import_time(prebuilt=True)
+
+
+def main():
+    for case in (cold, warm, prebuilt):
+        timings = [case() for _ in range(REPEAT)]
+        print('{0:<10} best {1:8.1f} ms  mean {2:8.1f} ms'.format(
+            case.__name__, 1000 * min(timings),
+            1000 * sum(timings) / len(timings)))
+
+
+if __name__ == '__main__':
+    main()
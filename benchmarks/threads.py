@@ -0,0 +1,60 @@
+"""Measure how bulk hashing and encryption scale across threads.
+
+Each thread repeatedly hashes, or encrypts, a block of data using tls.hashlib
+and tls.cipherlib. cffi releases the GIL while OpenSSL is running, so the
+aggregate throughput should grow with the number of threads up to the number
+of available cores:
+
+    $ python benchmarks/threads.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import threading
+
+from tls import cipherlib, hashlib
+
+THREADS = (1, 2, 4, 8)
+BLOCK = b'\x00' * (1024 * 1024)
+ROUNDS = 32
+KEY = b'montypythonfunny'
+IVECTOR = b'\x00' * 16
+
+
+def sha256():
+    digest = hashlib.new(b'SHA256')
+    for _ in range(ROUNDS):
+        digest.update(BLOCK)
+    digest.digest()
+
+
+def aes_128_cbc():
+    cipher = cipherlib.Cipher(encrypt=True, algorithm=b'AES-128-CBC',
+            digest=None)
+    cipher.initialise(KEY, IVECTOR)
+    for _ in range(ROUNDS):
+        cipher.update(BLOCK)
+        cipher.ciphertext()
+    cipher.finish()
+
+
+def throughput(work, count):
+    "Return the MB/s processed by count threads each calling work once"
+    threads = [threading.Thread(target=work) for _ in range(count)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = default_timer() - start
+    return count * ROUNDS * len(BLOCK) / seconds / 1e6
+
+
+def main():
+    for work in (sha256, aes_128_cbc):
+        for count in THREADS:
+            print('{0:<12} {1:>2} threads {2:10.1f} MB/s'.format(
+                work.__name__, count, throughput(work, count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Measure how tree hashing scales with the number of threads.
+
+A 512 MiB input is hashed with TreeHash using 1, 2, 4, ... threads up to the
+number of cores, and compared with a single MessageDigest:
+
+    $ python benchmarks/tree_hash.py
+"""
+from __future__ import absolute_import, division, print_function
+from timeit import default_timer
+import multiprocessing
+
+from tls import hashlib
+
+SIZE = 512 * 1024 * 1024
+CHUNK = 8 * 1024 * 1024
+DATA = b'\x00' * CHUNK
+
+
+def message_digest(_):
+    digest = hashlib.sha256()
+    for _ in range(SIZE // CHUNK):
+        digest.update(DATA)
+    return digest.digest()
+
+
+def tree_hash(threads):
+    tree = hashlib.TreeHash(b'SHA256', threads=threads)
+    for _ in range(SIZE // CHUNK):
+        tree.update(DATA)
+    return tree.digest()
+
+
+def throughput(case, threads):
+    "Return the GB/s hashed by case"
+    start = default_timer()
+    case(threads)
+    seconds = default_timer() - start
+    return SIZE / seconds / 1e9
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    print('{0:<16} {1:>3} threads {2:8.3f} GB/s'.format(
+        'MessageDigest', 1, throughput(message_digest, 1)))
+    for threads in counts:
+        print('{0:<16} {1:>3} threads {2:8.3f} GB/s'.format(
+            'TreeHash', threads, throughput(tree_hash, threads)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Measure the throughput of wrapping Python file objects as BIOs.
+
+Each iteration wraps a file object with tls.io.wrap_io(), writes a short
+message through the BIO and releases it. Run the benchmark on two revisions
+to compare them:
+
+    $ python benchmarks/wrap_io.py
+"""
+from __future__ import absolute_import, division, print_function
+import gc
+import timeit
+
+SETUP = """
+from io import BytesIO
+from tls import io
+from tls.c import api
+data = api.new('char[]', b'Now for something completely different')
+"""
+
+WRAP = "bio = io.wrap_io(BytesIO())"
+WRITE = WRAP + "; api.BIO_write(bio, data, len(data))"
+
+NUMBER = 10000
+REPEAT = 5
+
+
+def main():
+    for name, statement in (('wrap', WRAP), ('wrap+write', WRITE)):
+        timer = timeit.Timer(statement, SETUP)
+        best = min(timer.repeat(REPEAT, NUMBER))
+        gc.collect()
+        print('{0:<12} {1:10.0f} wraps/s'.format(name, NUMBER / best))
+
+
+if __name__ == '__main__':
+    main()
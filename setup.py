@@ -23,7 +23,7 @@ PYTHON3K = sys.version_info[0] > 2
 setup(
     name='opentls',
     version=load_version(),
-    packages=['tls'],
+    packages=['tls', 'tls.c', 'tls.hashlib', 'tls.io'],
     zip_safe=False,
     author='Aaron Iles',
     author_email='aaron.iles@gmail.com',
@@ -48,7 +48,17 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: System :: Networking'
     ],
-    install_requires=['cffi==0.3'],
+    setup_requires=['cffi>=1.8'],
+    install_requires=['cffi>=1.8'],
+    cffi_modules=[
+        'tls/c/_build.py:build_core',
+        'tls/c/_build.py:build_digest',
+        'tls/c/_build.py:build_cipher',
+        'tls/c/_build.py:build_bio',
+        'tls/c/_build.py:build_rand',
+        'tls/c/_build.py:build_engine',
+        'tls/c/_build.py:build_ssl',
+    ],
     tests_require=['mock'] + [] if PYTHON3K else ['unittest2'],
     test_suite="tests" if PYTHON3K else "unittest2.collector"
 )
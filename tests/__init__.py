@@ -9,7 +9,7 @@ try:
 except ImportError:
     import unittest
 
-import cffi
+import cffi.verifier
 
 import tls.c
 
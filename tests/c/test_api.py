@@ -0,0 +1,203 @@
+"""Test loading of the OpenSSL bindings"""
+from __future__ import absolute_import, division, print_function
+import gc
+import os
+import sys
+import threading
+import weakref
+
+import mock
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls.c import _build
+from tls.c import API, Ownership, api
+
+
+class TestPrebuilt(unittest.TestCase):
+
+    def setUp(self):
+        # an API instance that has imported the definitions and nothing else
+        self.api = object.__new__(API)
+        self.api._lock = threading.RLock()
+        self.api._libraries = {}
+        self.api._providers = {'RAND_bytes': 'rand', 'RAND_status': 'rand'}
+        self.api._definitions = api._definitions
+        for kind in _build.KINDS:
+            setattr(self.api, kind, getattr(api, kind))
+        declarations = ['function RAND_bytes', 'function RAND_status']
+        self.api.ffi = mock.Mock(_parser=mock.Mock(_declarations=declarations))
+        self.library = mock.Mock()
+
+    def load(self, group):
+        self.api._libraries[group] = self.library
+        return True
+
+    def test_lazy_group(self):
+        with mock.patch.object(self.api, '_load') as load:
+            load.side_effect = self.load
+            with mock.patch.object(self.api, '_setup') as setup:
+                self.assertIs(self.api.RAND_status, self.library.RAND_status)
+                self.assertIs(self.api.RAND_bytes, self.library.RAND_bytes)
+        load.assert_called_once_with('rand')
+        setup.assert_called_once_with('rand')
+        self.assertEqual(self.api._providers, {})
+
+    def test_missing_group(self):
+        with mock.patch.object(self.api, '_load', return_value=False):
+            with self.assertRaises(ImportError):
+                self.api.RAND_status
+        self.assertEqual(self.api._providers['RAND_status'], 'rand')
+
+    def test_unknown_name(self):
+        with self.assertRaises(AttributeError):
+            self.api.RAND_unknown
+
+    def test_prebuilt(self):
+        with mock.patch('tls.c.find_spec', return_value=object()):
+            with mock.patch.object(self.api, '_load') as load:
+                load.return_value = True
+                self.assertTrue(self.api._prebuilt())
+        load.assert_called_once_with(_build.CORE)
+
+    def test_prebuilt_group_missing(self):
+        def find_spec(name):
+            return None if '._openssl_rand_' in name else object()
+        with mock.patch('tls.c.find_spec', side_effect=find_spec):
+            with mock.patch.object(self.api, '_load') as load:
+                self.assertFalse(self.api._prebuilt())
+        self.assertFalse(load.called)
+
+    def test_prebuilt_disabled(self):
+        with mock.patch.dict(os.environ, {'OPENTLS_PREBUILT': '0'}):
+            with mock.patch('tls.c.find_spec', return_value=object()):
+                with mock.patch.object(self.api, '_load') as load:
+                    self.assertFalse(self.api._prebuilt())
+        self.assertFalse(load.called)
+
+    def test_load_core(self):
+        module = mock.Mock()
+        module.lib.OPENSSL_VERSION_NUMBER = module.lib.SSLeay.return_value
+        name = self.api._module_name(_build.CORE)
+        with mock.patch.dict(sys.modules, {name: module}):
+            self.assertTrue(self.api._load(_build.CORE))
+        self.assertIs(self.api.ffi, module.ffi)
+        self.assertIs(self.api.openssl, module.lib)
+        self.assertIs(self.api._libraries[_build.CORE], module.lib)
+
+    def test_load_core_version(self):
+        module = mock.Mock()
+        module.lib.OPENSSL_VERSION_NUMBER = 0x1000200f
+        module.lib.SSLeay.return_value = 0x1000100f
+        name = self.api._module_name(_build.CORE)
+        with mock.patch.dict(sys.modules, {name: module}):
+            self.assertFalse(self.api._load(_build.CORE))
+        self.assertNotIn(_build.CORE, self.api._libraries)
+
+    def test_load_group(self):
+        module = mock.Mock()
+        name = self.api._module_name('rand')
+        with mock.patch.dict(sys.modules, {name: module}):
+            self.assertTrue(self.api._load('rand'))
+        self.assertIs(self.api._libraries['rand'], module.lib)
+        self.assertFalse(hasattr(self.api, 'openssl'))
+
+    def test_load_missing(self):
+        with mock.patch.object(self.api, '_module_name') as module_name:
+            module_name.return_value = 'tls.c._openssl_rand_missing'
+            self.assertFalse(self.api._load('rand'))
+        self.assertNotIn('rand', self.api._libraries)
+
+    def test_module_name(self):
+        name = self.api._module_name('rand')
+        self.assertTrue(name.startswith('tls.c._openssl_rand_'))
+        self.assertEqual(name, self.api._module_name('rand'))
+        self.assertNotEqual(name, self.api._module_name('digest'))
+
+
+class TestLoaded(unittest.TestCase):
+
+    def test_providers(self):
+        for name, group in api._providers.items():
+            self.assertNotIn(group, api._libraries)
+            self.assertNotIn(name, vars(api))
+
+    def test_prebuilt(self):
+        name = api._module_name(_build.CORE)
+        if name not in sys.modules:
+            self.skipTest('prebuilt bindings not in use')
+        self.assertIs(api.ffi, sys.modules[name].ffi)
+        self.assertIs(api.openssl, sys.modules[name].lib)
+
+    def test_core(self):
+        self.assertIn(_build.CORE, api._libraries)
+        self.assertIs(api._libraries[_build.CORE], api.openssl)
+
+
+class Dependant(object):
+    "A Python object that can be weakly referenced"
+
+
+class TestOwnership(unittest.TestCase):
+
+    def setUp(self):
+        self.ownership = Ownership()
+
+    def test_retained(self):
+        primary = api.new('char[]', 16)
+        dependant = Dependant()
+        reference = weakref.ref(dependant)
+        self.ownership.relate(primary, dependant, 'buffer')
+        del dependant
+        gc.collect()
+        self.assertIsNotNone(reference())
+        self.assertEqual(self.ownership.dependants(primary),
+                {'buffer': reference()})
+        self.assertEqual(len(self.ownership), 1)
+
+    def test_released(self):
+        primary = api.new('char[]', 16)
+        dependant = Dependant()
+        reference = weakref.ref(dependant)
+        self.ownership.relate(primary, dependant, 'buffer')
+        del primary, dependant
+        gc.collect()
+        self.assertIsNone(reference())
+        self.assertEqual(len(self.ownership), 0)
+
+    def test_replaced(self):
+        primary = api.new('char[]', 16)
+        first, second = Dependant(), Dependant()
+        reference = weakref.ref(first)
+        self.ownership.relate(primary, first, 'buffer')
+        self.ownership.relate(primary, second, 'buffer')
+        del first
+        gc.collect()
+        self.assertIsNone(reference())
+        self.assertEqual(self.ownership.dependants(primary),
+                {'buffer': second})
+
+    def test_names(self):
+        primary = api.new('char[]', 16)
+        key, data = Dependant(), Dependant()
+        self.ownership.relate(primary, key, 'key')
+        self.ownership.relate(primary, data, 'data')
+        self.assertEqual(self.ownership.dependants(primary),
+                {'key': key, 'data': data})
+        self.assertEqual(len(self.ownership), 1)
+
+    def test_primaries(self):
+        first, second = api.new('char[]', 16), api.new('char[]', 16)
+        self.ownership.relate(first, Dependant(), 'buffer')
+        self.ownership.relate(second, Dependant(), 'buffer')
+        self.assertEqual(len(self.ownership), 2)
+        del first
+        gc.collect()
+        self.assertEqual(len(self.ownership), 1)
+        self.assertIn('buffer', self.ownership.dependants(second))
+
+    def test_unrelated(self):
+        self.assertEqual(self.ownership.dependants(api.new('char[]', 16)), {})
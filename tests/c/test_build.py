@@ -0,0 +1,46 @@
+"""Test ahead of time build of the OpenSSL bindings"""
+from __future__ import absolute_import, division, print_function
+import re
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls.c import _build
+
+STRUCT = re.compile(r'struct\s+(\w+)\s*\{([^}]*)\}')
+
+
+class TestBuildFFI(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loaded = _build.load_groups()
+
+    def source(self, group):
+        "Return the C source compiled for a group"
+        ffi = _build.build_ffi(group, self.loaded)
+        return ffi._assigned_source[1]
+
+    def test_defined_types(self):
+        # structs declared with their fields are compiled by every group, so
+        # those not provided by OpenSSL must be defined by the INCLUDES
+        combined, _ = self.loaded
+        declared = set(name for typedef in combined.TYPES
+                       for name, fields in STRUCT.findall(typedef)
+                       if fields.strip() != '...;' and name.startswith('tls_'))
+        self.assertIn('tls_obj_name', declared)
+        for group, _ in _build.GROUPS:
+            source = self.source(group)
+            for name in declared:
+                self.assertTrue(re.search(r'struct\s+{0}\s*\{{'.format(name),
+                        source), '{0} lacks struct {1}'.format(group, name))
+
+    def test_libraries(self):
+        # groups using only libcrypto must still link it when the linker
+        # drops libraries not needed directly, as with --as-needed
+        for group, _ in _build.GROUPS:
+            kwds = _build.build_ffi(group, self.loaded)._assigned_source[3]
+            self.assertIn('ssl', kwds['libraries'])
+            self.assertIn('crypto', kwds['libraries'])
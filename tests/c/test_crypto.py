@@ -0,0 +1,58 @@
+"""Test OpenSSL thread support"""
+from __future__ import absolute_import, division, print_function
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls.c import api
+
+
+class TestThreadSetup(unittest.TestCase):
+
+    def test_num_locks(self):
+        self.assertGreater(api.CRYPTO_num_locks(), 0)
+
+    def test_locked(self):
+        self.assertTrue(api.tls_threads_locked())
+
+    def test_setup_idempotent(self):
+        self.assertTrue(api.tls_setup_threads())
+        self.assertTrue(api.tls_threads_locked())
+
+
+class TestConcurrentDigests(unittest.TestCase):
+
+    data = b'Nobody inspects the spammish repetition' * 1024
+    threads = 8
+    rounds = 50
+
+    def digest(self):
+        ctx = api.new('EVP_MD_CTX*')
+        buff = api.new('unsigned char[]', api.EVP_MAX_MD_SIZE)
+        size = api.new('unsigned int*')
+        data = api.new('char[]', self.data)
+        api.EVP_DigestInit_ex(ctx, api.EVP_sha256(), api.NULL)
+        api.EVP_DigestUpdate(ctx, data, len(self.data))
+        api.EVP_DigestFinal_ex(ctx, buff, size)
+        api.EVP_MD_CTX_cleanup(ctx)
+        return bytes(api.buffer(buff, size[0]))
+
+    def test_threads(self):
+        expected = self.digest()
+        results = []
+
+        def worker():
+            for _ in range(self.rounds):
+                results.append(self.digest())
+
+        workers = [threading.Thread(target=worker)
+                   for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(len(results), self.threads * self.rounds)
+        self.assertEqual(set(results), set([expected]))
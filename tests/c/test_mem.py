@@ -0,0 +1,61 @@
+"""Test OpenSSL memory accounting"""
+from __future__ import absolute_import, division, print_function
+import os
+import subprocess
+import sys
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls.c import memory
+from tls.c._memory import Usage, subsystem
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+SCRIPT = """
+from tls.c import api, memory
+before = memory.totals()
+context = api.new('EVP_MD_CTX*')
+api.EVP_DigestInit_ex(context, api.EVP_sha256(), api.NULL)
+after = memory.totals()
+print(memory.enabled, after.total > before.total, bool(memory.subsystems()))
+"""
+
+
+class TestSubsystem(unittest.TestCase):
+
+    def test_directory(self):
+        self.assertEqual(subsystem('crypto/evp/digest.c'), 'evp')
+        self.assertEqual(subsystem('../crypto/bio/bio_lib.c'), 'bio')
+
+    def test_filename(self):
+        self.assertEqual(subsystem('bio_lib.c'), 'bio')
+        self.assertEqual(subsystem('digest.c'), 'digest')
+
+
+class TestMemoryAccounting(unittest.TestCase):
+
+    def test_totals(self):
+        totals = memory.totals()
+        self.assertIsInstance(totals, Usage)
+        self.assertEqual(totals.source, 'total')
+        self.assertGreaterEqual(totals.peak, totals.live)
+
+    def test_sources(self):
+        for usage in memory.sources() + memory.subsystems():
+            self.assertNotEqual(usage.source, 'total')
+            self.assertGreater(usage.total, 0)
+
+    def test_reset_peak(self):
+        memory.reset_peak()
+        totals = memory.totals()
+        self.assertEqual(totals.peak, totals.live)
+
+    def test_enabled(self):
+        env = dict(os.environ, OPENTLS_MEMORY_ACCOUNTING='1')
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT],
+                cwd=ROOT, env=env)
+        self.assertEqual(output.decode().split(), ['True', 'True', 'True'])
@@ -0,0 +1,79 @@
+"""Test startup profiling"""
+from __future__ import absolute_import, division, print_function
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls.c import startup_report
+from tls.c._startup import StartupProfile
+
+
+class TestStartupReport(unittest.TestCase):
+
+    def test_api(self):
+        names = [phase.name for phase in startup_report()]
+        self.assertIn('tls.c.api', names)
+        self.assertIn('API._import', names)
+        self.assertIn('API._populate', names)
+        self.assertIn('API._initialise', names)
+
+    def test_registries(self):
+        import tls.hashlib
+        import tls.cipherlib
+        len(tls.hashlib.algorithms_available)
+        len(tls.cipherlib.algorithms_available)
+        names = [phase.name for phase in startup_report()]
+        self.assertIn('tls.registry.digests', names)
+        self.assertIn('tls.registry.ciphers', names)
+
+    def test_nested(self):
+        phases = dict((phase.name, phase) for phase in startup_report())
+        self.assertEqual(phases['tls.c.api'].depth, 0)
+        self.assertEqual(phases['API._import'].depth, 1)
+        self.assertGreaterEqual(phases['tls.c.api'].seconds,
+                phases['API._import'].seconds)
+
+
+class TestStartupProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = StartupProfile()
+
+    def test_phase(self):
+        with self.profile.phase('outer'):
+            with self.profile.phase('inner'):
+                pass
+        inner, outer = self.profile.report()
+        self.assertEqual(inner.name, 'inner')
+        self.assertEqual(inner.depth, 1)
+        self.assertEqual(outer.name, 'outer')
+        self.assertEqual(outer.depth, 0)
+        self.assertIsNone(outer.allocated)
+
+    def test_phase_exception(self):
+        def fail():
+            with self.profile.phase('fail'):
+                raise ValueError()
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(self.profile.report()[0].name, 'fail')
+
+    def test_measure(self):
+        func = self.profile.measure('func')(lambda value: value)
+        self.assertEqual(func(1), 1)
+        self.assertEqual(self.profile.report()[0].name, 'func')
+
+    def test_write(self):
+        with self.profile.phase('phase'):
+            pass
+        stream = StringIO()
+        self.profile.write(stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('phase'))
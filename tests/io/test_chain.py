@@ -148,5 +148,11 @@ class TestChainRead(ChainTest, unittest.TestCase):
     def test_readinto(self):
         self.assertRaises(IOError, self.fileobj.readinto, bytearray(1))
 
+    def test_copy_to(self):
+        with io.BIOMemBuffer() as other:
+            self.assertEqual(len(self.DATA),
+                    self.fileobj.copy_to(other, bufsize=5))
+            self.assertEqual(self.DATA, other.read(len(self.DATA)))
+
     def test_write(self):
         self.assertRaises(IOError, self.fileobj.write, b'a')
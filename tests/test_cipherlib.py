@@ -131,6 +131,14 @@ class CipherObject(object):
         self.cipher.finish()
         self.assertRaises(ValueError, self.cipher.plaintext)
 
+    def test_direct(self):
+        self.assertFalse(self.cipher.direct)
+        cipher = cipherlib.Cipher(self.ENCRYPT, self.ALGORITHM, self.DIGEST,
+                direct=True)
+        self.assertTrue(cipher.direct)
+        cipher.initialise(self.KEY, self.IVECTOR)
+        self.assertIsInstance(cipher.update(b'\x00' * self.LEN_BLOCK), bytes)
+
     def test_weakref_bio(self):
         BIO_free_all_cleanup = api.BIO_free_all
         with mock.patch('tls.c.api.BIO_free_all') as cleanup_mock:
@@ -195,6 +203,32 @@ class TestDesEncryptObject(CipherObject, unittest.TestCase):
         self.assertRaises(ValueError, change_key_len, 16)
 
 
+class TestUpdateInto(unittest.TestCase):
+
+    def setUp(self):
+        self.cipher = cipherlib.Cipher(True, b'AES-128-CBC', direct=True)
+        self.cipher.initialise(b'\x00' * 16, b'\x00' * 16)
+
+    def test_chain(self):
+        cipher = cipherlib.Cipher(True, b'AES-128-CBC')
+        cipher.initialise(b'\x00' * 16, b'\x00' * 16)
+        self.assertRaises(ValueError, cipher.update_into, b'', bytearray(16))
+        self.assertRaises(ValueError, cipher.finish_into, bytearray(64))
+
+    def test_read_only(self):
+        self.assertRaises(TypeError, self.cipher.update_into, b'', b'x' * 32)
+
+    def test_too_small(self):
+        self.assertRaises(ValueError, self.cipher.update_into, b'x' * 16,
+                bytearray(16))
+        self.assertRaises(ValueError, self.cipher.finish_into, bytearray(16))
+
+    def test_uninitialised(self):
+        self.cipher.finish()
+        self.assertRaises(ValueError, self.cipher.update_into, b'',
+                bytearray(16))
+
+
 class CipherTests(object):
 
     @staticmethod
@@ -226,6 +260,85 @@ class CipherTests(object):
         cipher.finish()
         return cipher.plaintext()
 
+    def _encrypt_direct(self, chunks):
+        cipher = cipherlib.Cipher(True, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        output = [cipher.update(chunk) for chunk in chunks]
+        output.append(cipher.finish())
+        self.assertEqual(cipher.ciphertext(), b'')
+        return b''.join(output)
+
+    def _decrypt_direct(self, data):
+        cipher = cipherlib.Cipher(False, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        output = [cipher.update(data[:5]), cipher.update(data[5:])]
+        output.append(cipher.finish())
+        return b''.join(output)
+
+    def test_direct_encrypt(self):
+        chunks = [self.plaintext[:3], b'', self.plaintext[3:]]
+        self.assertEqual(self._encrypt_direct(chunks), self._encrypt())
+
+    def test_direct_decrypt(self):
+        self.assertEqual(self._decrypt_direct(self._encrypt()), self.plaintext)
+
+    def test_direct_round_trip(self):
+        result = self._encrypt_direct([self.plaintext])
+        self.assertEqual(self._decrypt(result)[:len(self.plaintext)],
+                self.plaintext)
+        self.assertEqual(self._decrypt_direct(result), self.plaintext)
+
+    def test_direct_bitflip_hmac_decrypt(self):
+        result = self._encrypt()
+        pos = len(self.ciphertext)
+        result = (result[:pos]
+                + int2byte(ord(result[pos:pos+1]) ^ 0x80)
+                + result[pos+1:])
+        self.assertRaises(ValueError, self._decrypt_direct, result)
+
+    def test_direct_trunc_decrypt(self):
+        result = self._encrypt()
+        self.assertRaises(ValueError, self._decrypt_direct, result[:-1])
+
+    def test_update_into(self):
+        expected = self._encrypt()
+        cipher = cipherlib.Cipher(True, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        out = bytearray(len(self.plaintext) + cipher.digest_size
+                + 3 * cipher.block_size)
+        size = cipher.update_into(self.plaintext, out)
+        size += cipher.finish_into(memoryview(out)[size:])
+        self.assertEqual(bytes(out[:size]), expected)
+
+    def test_update_into_decrypt(self):
+        data = self._encrypt()
+        cipher = cipherlib.Cipher(False, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        out = bytearray(len(data) + 2 * cipher.block_size)
+        size = cipher.update_into(memoryview(data), out)
+        size += cipher.finish_into(memoryview(out)[size:])
+        self.assertEqual(bytes(out[:size]), self.plaintext)
+
+    def test_update_into_in_place(self):
+        expected = self._encrypt()
+        cipher = cipherlib.Cipher(True, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        page = bytearray(self.plaintext)
+        if cipher.block_size != 1:
+            self.assertRaises(ValueError, cipher.update_into, page, page)
+            return
+        self.assertEqual(cipher.update_into(page, page), len(page))
+        tail = bytearray(cipher.digest_size + 2 * cipher.block_size)
+        size = cipher.finish_into(tail)
+        self.assertEqual(bytes(page) + bytes(tail[:size]), expected)
+        cipher = cipherlib.Cipher(False, self.algorithm, direct=True)
+        cipher.initialise(self.key, self.iv)
+        page = bytearray(expected)
+        size = cipher.update_into(page, page)
+        tail_size = cipher.finish_into(tail)
+        self.assertEqual(bytes(page[:size]) + bytes(tail[:tail_size]),
+                self.plaintext)
+
     def test_encrypt_decrypt(self):
         result = self._encrypt()
         self.assertEqual(result[:len(self.ciphertext)], self.ciphertext)
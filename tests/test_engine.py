@@ -0,0 +1,80 @@
+"""Test OpenSSL engine selection"""
+from __future__ import absolute_import, division, print_function
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls import cipherlib, engine, hashlib, hmac, random
+from tls.c import api
+
+# the openssl engine is a reference implementation built in to OpenSSL
+REFERENCE = b'openssl'
+
+skip_without_reference = unittest.skipUnless(
+        REFERENCE in engine.engines_available(),
+        'reference engine unavailable')
+
+
+class TestEngines(unittest.TestCase):
+
+    def test_available(self):
+        available = engine.engines_available()
+        self.assertIsInstance(available, set)
+        for name in available:
+            self.assertIsInstance(name, bytes)
+
+    def test_unknown(self):
+        self.assertRaises(engine.EngineError, engine.Engine, b'nonexistent')
+
+    def test_resolve_none(self):
+        self.assertIsNone(engine.resolve(None))
+        self.assertEqual(engine.handle(None), api.NULL)
+
+    def test_unknown_digest_engine(self):
+        self.assertRaises(engine.EngineError, hashlib.new, b'SHA256',
+                engine=b'nonexistent')
+
+
+@skip_without_reference
+class TestReferenceEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = engine.Engine(REFERENCE)
+
+    def test_id(self):
+        self.assertEqual(self.engine.id, REFERENCE)
+        self.assertTrue(self.engine.name)
+
+    def test_resolve(self):
+        self.assertIs(engine.resolve(self.engine), self.engine)
+        self.assertEqual(engine.resolve(REFERENCE).id, REFERENCE)
+
+    def test_digest(self):
+        data = b'Nobody inspects the spammish repetition'
+        expected = hashlib.new(b'SHA256', data).digest()
+        digest = hashlib.new(b'SHA256', data, engine=self.engine)
+        self.assertEqual(digest.digest(), expected)
+        self.assertEqual(digest.copy().digest(), expected)
+
+    def test_hmac(self):
+        expected = hmac.new(b'key', b'data', b'SHA1').digest()
+        mac = hmac.new(b'key', b'data', b'SHA1', engine=self.engine)
+        self.assertEqual(mac.digest(), expected)
+
+    def test_cipher(self):
+        key = b'montypythonfunny'
+        ivector = b'\x00' * 16
+        ciphertexts = []
+        for engine_ in (None, self.engine):
+            cipher = cipherlib.Cipher(True, engine=engine_)
+            cipher.initialise(key, ivector)
+            cipher.update(b'Nobody expects the spanish inquisition')
+            cipher.finish()
+            ciphertexts.append(cipher.ciphertext())
+        self.assertEqual(ciphertexts[0], ciphertexts[1])
+
+    def test_random(self):
+        rng = random.Random(engine=self.engine)
+        self.assertLess(rng.random(), 1)
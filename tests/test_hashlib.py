@@ -1,7 +1,14 @@
 """Test Python hashlib API implementation using OpenSSL"""
 from __future__ import absolute_import, division, print_function
 from functools import partial
+import array
+import binascii
+import io
+import mmap
 import mock
+import os
+import struct
+import tempfile
 
 try:
     import unittest2 as unittest
@@ -10,6 +17,8 @@ except ImportError:
 
 from tls.c import api
 from tls import hashlib
+from tls import io as tls_io
+from tests import skip_after
 
 
 class MD5Tests(unittest.TestCase):
@@ -55,6 +64,52 @@ class MD5Tests(unittest.TestCase):
         self.digest.update(self.data_long[len(self.data_short):])
         self.assertEqual(self.digest_long, self.digest.digest())
 
+    def test_update_bytearray(self):
+        self.digest.update(bytearray(self.data_long))
+        self.assertEqual(self.digest_long, self.digest.digest())
+
+    def test_update_memoryview(self):
+        view = memoryview(b'xx' + self.data_long + b'xx')
+        self.digest.update(view[2:-2])
+        self.assertEqual(self.digest_long, self.digest.digest())
+
+    def test_update_array(self):
+        self.digest.update(array.array('B', self.data_long))
+        self.assertEqual(self.digest_long, self.digest.digest())
+
+    def test_update_mmap(self):
+        buff = mmap.mmap(-1, len(self.data_long))
+        buff.write(self.data_long)
+        self.digest.update(buff)
+        self.assertEqual(self.digest_long, self.digest.digest())
+
+    def test_update_unicode(self):
+        self.assertRaises(TypeError, self.digest.update, u'abc')
+
+    def test_digest_repeated(self):
+        self.digest.update(self.data_short)
+        self.assertEqual(self.digest_short, self.digest.digest())
+        self.digest.update(self.data_long[len(self.data_short):])
+        self.assertEqual(self.hexdigest_long, self.digest.hexdigest())
+        self.assertEqual(self.digest_long, self.digest.digest())
+
+    def test_digest_into(self):
+        self.digest.update(self.data_short)
+        buff = bytearray(self.digest.digest_size + 2)
+        size = self.digest.digest_into(memoryview(buff)[1:])
+        self.assertEqual(size, len(self.digest_short))
+        self.assertEqual(bytes(buff[1:-1]), self.digest_short)
+        self.assertEqual(buff[0], 0)
+        self.assertEqual(buff[-1], 0)
+
+    def test_digest_into_short(self):
+        buff = bytearray(self.digest.digest_size - 1)
+        self.assertRaises(ValueError, self.digest.digest_into, buff)
+
+    def test_digest_into_readonly(self):
+        buff = b'\x00' * self.digest.digest_size
+        self.assertRaises(TypeError, self.digest.digest_into, buff)
+
     def test_copy(self):
         self.digest.update(self.data_short)
         new = self.digest.copy()
@@ -62,6 +117,7 @@ class MD5Tests(unittest.TestCase):
         self.assertEqual(self.digest_long, new.digest())
         self.assertEqual(self.digest_short, self.digest.digest())
 
+    @mock.patch('tls.hashlib.CONTEXT_POOL_SIZE', 0)
     def test_weakref(self):
         EVP_MD_CTX_cleanup = api.EVP_MD_CTX_cleanup
         with mock.patch('tls.c.api.EVP_MD_CTX_cleanup') as cleanup_mock:
@@ -69,6 +125,343 @@ class MD5Tests(unittest.TestCase):
             del self.digest
             self.assertEqual(cleanup_mock.call_count, 1)
 
+    @mock.patch('tls.hashlib.CONTEXT_POOL_SIZE', 0)
+    def test_weakref_digest(self):
+        self.digest.digest()
+        EVP_MD_CTX_cleanup = api.EVP_MD_CTX_cleanup
+        with mock.patch('tls.c.api.EVP_MD_CTX_cleanup') as cleanup_mock:
+            cleanup_mock.side_effect = EVP_MD_CTX_cleanup
+            del self.digest
+            self.assertEqual(cleanup_mock.call_count, 2)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.digest, '__dict__'))
+        self.assertRaises(AttributeError, setattr, self.digest, 'other', 1)
+
+
+class TestDescriptor(unittest.TestCase):
+
+    def test_descriptor(self):
+        desc = hashlib.descriptor(b'SHA256')
+        self.assertEqual(desc.name, b'SHA256')
+        self.assertEqual(desc.nid, api.NID_sha256)
+        self.assertEqual(desc.digest_size, 32)
+        self.assertEqual(desc.block_size, 64)
+        self.assertEqual(desc.md, api.EVP_sha256())
+
+    def test_cached(self):
+        self.assertIs(hashlib.descriptor(b'SHA1'), hashlib.descriptor(b'SHA1'))
+
+    def test_unknown(self):
+        self.assertRaises(hashlib.DigestError, hashlib.descriptor,
+                b'nonexistent')
+        self.assertRaises(ValueError, hashlib.new, b'nonexistent')
+
+    def test_properties(self):
+        digest = hashlib.sha256()
+        self.assertEqual(digest.name, b'SHA256')
+        self.assertEqual(digest.digest_size, 32)
+        self.assertEqual(digest.block_size, 64)
+
+
+class TestContextPool(unittest.TestCase):
+
+    def setUp(self):
+        self.desc = hashlib.descriptor(b'SHA256')
+        hashlib._context_pools.pop(self.desc.md, None)
+
+    def test_reuse(self):
+        digest = hashlib.sha256(b'junk')
+        context = digest._context
+        del digest
+        digest = hashlib.sha256(b'abc')
+        self.assertIs(digest._context, context)
+        self.assertEqual(digest.hexdigest(),
+                b'ba7816bf8f01cfea414140de5dae2223'
+                b'b00361a396177a9cb410ff61f20015ad')
+
+    def test_wiped(self):
+        digest = hashlib.sha256(b'junk')
+        del digest
+        self.assertEqual(hashlib.sha256().digest(),
+                hashlib.new(b'SHA256').digest())
+
+    def test_scratch_reuse(self):
+        digest = hashlib.sha256(b'abc')
+        digest.digest()
+        scratch = digest._scratch[0]
+        del digest
+        self.assertIn(scratch, hashlib._context_pools[self.desc.md])
+
+    def test_per_algorithm(self):
+        digest = hashlib.sha256()
+        context = digest._context
+        del digest
+        self.assertIsNot(hashlib.sha1()._context, context)
+
+    @mock.patch('tls.hashlib.CONTEXT_POOL_SIZE', 2)
+    def test_bounded(self):
+        digests = [hashlib.sha256() for _ in range(4)]
+        EVP_MD_CTX_cleanup = api.EVP_MD_CTX_cleanup
+        with mock.patch('tls.c.api.EVP_MD_CTX_cleanup') as cleanup_mock:
+            cleanup_mock.side_effect = EVP_MD_CTX_cleanup
+            del digests[:]
+            self.assertEqual(cleanup_mock.call_count, 2)
+        self.assertEqual(len(hashlib._context_pools[self.desc.md]), 2)
+
+    def test_copy(self):
+        digest = hashlib.sha256(b'ab')
+        copied = digest.copy()
+        del digest
+        copied.update(b'c')
+        self.assertEqual(copied.digest(), hashlib.sha256(b'abc').digest())
+
+
+@skip_after(3, 0, 0, '', message='digest state is not accessible')
+class TestDigestState(unittest.TestCase):
+
+    names = (b'SHA1', b'SHA224', b'SHA256', b'SHA384', b'SHA512')
+    data = bytes(bytearray(range(256))) * 2
+
+    def test_resume(self):
+        for name in self.names:
+            for split in (0, 1, 55, 64, 111, 128, 300, len(self.data)):
+                digest = hashlib.new(name, self.data[:split])
+                resumed = hashlib.import_state(digest.export_state())
+                self.assertEqual(resumed.name, name)
+                resumed.update(self.data[split:])
+                self.assertEqual(resumed.digest(),
+                        hashlib.new(name, self.data).digest())
+
+    def test_compact(self):
+        state = hashlib.sha256(self.data[:70]).export_state()
+        self.assertEqual(len(state), 3 + 8 + 32 + 6)
+        self.assertEqual(state[0:1], b'\x01')
+
+    def test_unsupported(self):
+        self.assertRaises(hashlib.DigestError,
+                hashlib.new(b'MD5').export_state)
+
+    def test_invalid(self):
+        state = hashlib.sha1(b'abc').export_state()
+        self.assertRaises(ValueError, hashlib.import_state, state[:2])
+        self.assertRaises(ValueError, hashlib.import_state, state[:-1])
+        self.assertRaises(ValueError, hashlib.import_state,
+                b'\x02' + state[1:])
+
+    def test_algorithm_mismatch(self):
+        state = bytearray(hashlib.sha1(b'abc').export_state())
+        state[1:3] = struct.pack('>H', api.NID_md5)
+        self.assertRaises(ValueError, hashlib.import_state, state)
+
+
+class TestFileDigest(unittest.TestCase):
+
+    data = b'Nobody inspects the spammish repetition' * 100
+    bufsize = 7
+
+    def setUp(self):
+        self.expected = hashlib.sha256(self.data).digest()
+        fd, self.filename = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def file_digest(self, fileobj):
+        return hashlib.file_digest(fileobj, b'SHA256', self.bufsize).digest()
+
+    def test_filename(self):
+        self.assertEqual(self.file_digest(self.filename), self.expected)
+
+    def test_fd(self):
+        fd = os.open(self.filename, os.O_RDONLY)
+        try:
+            self.assertEqual(self.file_digest(fd), self.expected)
+        finally:
+            os.close(fd)
+
+    def test_missing(self):
+        self.assertRaises(OSError, self.file_digest, self.filename + 'x')
+
+    def test_fileobj(self):
+        with open(self.filename, 'rb') as fileobj:
+            self.assertEqual(self.file_digest(fileobj), self.expected)
+
+    def test_bytesio(self):
+        fileobj = io.BytesIO(b'xx' + self.data)
+        fileobj.read(2)
+        self.assertEqual(self.file_digest(fileobj), self.expected)
+        self.assertEqual(fileobj.read(), b'')
+
+    def test_bio_chain(self):
+        with tls_io.BIOMemBuffer(self.data) as chain:
+            self.assertEqual(self.file_digest(chain), self.expected)
+
+    def test_bio_file(self):
+        with tls_io.BIOFile(self.filename) as chain:
+            self.assertEqual(self.file_digest(chain), self.expected)
+
+    def test_default_bufsize(self):
+        digest = hashlib.file_digest(self.filename, b'SHA256')
+        self.assertEqual(digest.digest(), self.expected)
+
+
+class TestHashMany(unittest.TestCase):
+
+    messages = [b'', b'abc', b'Nobody inspects the spammish repetition' * 10]
+
+    def setUp(self):
+        self.expected = [hashlib.sha1(message).digest()
+                         for message in self.messages]
+
+    def test_list(self):
+        digests = hashlib.hash_many(b'SHA1', iter(self.messages))
+        self.assertEqual(digests, self.expected)
+
+    def test_packed(self):
+        digests = hashlib.hash_many(b'SHA1', self.messages, packed=True)
+        self.assertEqual(digests, b''.join(self.expected))
+
+    def test_empty(self):
+        self.assertEqual(hashlib.hash_many(b'SHA1', []), [])
+
+    def test_offsets(self):
+        data = bytearray(b''.join(self.messages))
+        offsets = [0, 0, 3, len(data)]
+        digests = hashlib.hash_many(b'SHA1', data, offsets)
+        self.assertEqual(digests, self.expected)
+
+    def test_offsets_array(self):
+        data = b''.join(self.messages)
+        typecode = 'L' if array.array('L').itemsize == 8 else 'Q'
+        offsets = array.array(typecode, [0, 0, 3, len(data)])
+        digests = hashlib.hash_many(b'SHA1', data, offsets)
+        self.assertEqual(digests, self.expected)
+
+    def test_offsets_invalid(self):
+        self.assertRaises(ValueError, hashlib.hash_many, b'SHA1', b'abc',
+                [0, 2, 1])
+        self.assertRaises(ValueError, hashlib.hash_many, b'SHA1', b'abc',
+                [0, 4])
+        self.assertRaises(ValueError, hashlib.hash_many, b'SHA1', b'abc', [])
+
+
+class TestMultiDigest(unittest.TestCase):
+
+    names = (b'MD5', b'SHA1', b'SHA256')
+    data = b'Nobody inspects the spammish repetition'
+
+    def expected(self, data):
+        return dict((name, hashlib.new(name, data).digest())
+                    for name in self.names)
+
+    def test_digests(self):
+        multi = hashlib.MultiDigest(self.names)
+        multi.update(self.data[:7])
+        multi.update(bytearray(self.data[7:]))
+        self.assertEqual(multi.digests(), self.expected(self.data))
+
+    def test_init(self):
+        multi = hashlib.MultiDigest(self.names, self.data)
+        self.assertEqual(multi.names, self.names)
+        self.assertEqual(multi.digests(), self.expected(self.data))
+
+    def test_hexdigests(self):
+        multi = hashlib.MultiDigest(self.names, self.data)
+        hexdigests = multi.hexdigests()
+        for name in self.names:
+            self.assertEqual(hexdigests[name],
+                    hashlib.new(name, self.data).hexdigest())
+
+    def test_getitem(self):
+        multi = hashlib.MultiDigest(self.names, self.data)
+        self.assertEqual(multi[b'SHA1'].name, b'SHA1')
+        self.assertRaises(KeyError, multi.__getitem__, b'SHA512')
+
+    def test_duplicate(self):
+        self.assertRaises(ValueError, hashlib.MultiDigest, [b'MD5', b'MD5'])
+
+    def test_file_digest(self):
+        expected = self.expected(self.data)
+        fileobj = io.BytesIO(self.data)
+        multi = hashlib.file_digest(fileobj, list(self.names))
+        self.assertEqual(multi.digests(), expected)
+        with tls_io.BIOMemBuffer(self.data) as chain:
+            multi = hashlib.file_digest(chain, self.names, 5)
+            self.assertEqual(multi.digests(), expected)
+
+
+def merkle_tree_hash(leaves):
+    "Reference RFC 6962 Merkle Tree Hash using SHA256"
+    if len(leaves) == 1:
+        return hashlib.sha256(b'\x00' + leaves[0]).digest()
+    split = 1
+    while split * 2 < len(leaves):
+        split *= 2
+    return hashlib.sha256(b'\x01' + merkle_tree_hash(leaves[:split]) +
+            merkle_tree_hash(leaves[split:])).digest()
+
+
+class TestTreeHash(unittest.TestCase):
+
+    leaf_size = 16
+    data = bytes(bytearray(range(256))) * 4
+
+    def reference(self, data):
+        leaves = [data[start:start + self.leaf_size]
+                  for start in range(0, len(data), self.leaf_size)]
+        return merkle_tree_hash(leaves or [b''])
+
+    def tree_hash(self, threads, chunks):
+        tree = hashlib.TreeHash(b'SHA256', leaf_size=self.leaf_size,
+                threads=threads)
+        for chunk in chunks:
+            tree.update(chunk)
+        return tree.digest()
+
+    def test_reference(self):
+        expected = self.reference(self.data)
+        self.assertEqual(self.tree_hash(1, [self.data]), expected)
+
+    def test_threads(self):
+        expected = self.reference(self.data)
+        chunks = [self.data[start:start + 37]
+                  for start in range(0, len(self.data), 37)]
+        for threads in (1, 2, 3, 8):
+            self.assertEqual(self.tree_hash(threads, chunks), expected)
+
+    def test_empty(self):
+        expected = hashlib.sha256(b'\x00').digest()
+        self.assertEqual(self.tree_hash(2, []), expected)
+
+    def test_single_leaf(self):
+        expected = hashlib.sha256(b'\x00abc').digest()
+        self.assertEqual(self.tree_hash(2, [b'abc']), expected)
+
+    def test_whole_leaves(self):
+        data = self.data[:self.leaf_size * 3]
+        self.assertEqual(self.tree_hash(2, [data]), self.reference(data))
+
+    def test_digest_repeated(self):
+        tree = hashlib.TreeHash(b'SHA256', self.data[:100],
+                leaf_size=self.leaf_size, threads=2)
+        self.assertEqual(tree.digest(), self.reference(self.data[:100]))
+        tree.update(memoryview(self.data)[100:])
+        self.assertEqual(tree.hexdigest(),
+                binascii.hexlify(self.reference(self.data)))
+
+    def test_properties(self):
+        tree = hashlib.TreeHash(b'SHA256', leaf_size=self.leaf_size)
+        self.assertEqual(tree.name, b'SHA256')
+        self.assertEqual(tree.digest_size, 32)
+        self.assertEqual(tree.leaf_size, self.leaf_size)
+
+    def test_leaf_size(self):
+        self.assertRaises(ValueError, hashlib.TreeHash, b'SHA256',
+                leaf_size=0)
+
 
 class TestAlgorithms(unittest.TestCase):
 
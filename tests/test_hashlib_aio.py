@@ -0,0 +1,108 @@
+"""Test asyncio hashing of streams and files"""
+from __future__ import absolute_import, division, print_function
+import os
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+try:
+    import asyncio
+    from tls.hashlib import aio
+except (ImportError, SyntaxError):
+    asyncio = aio = None
+
+from tls import hashlib
+
+skip_without_asyncio = unittest.skipIf(asyncio is None,
+        'asyncio requires Python 3.5 or later')
+
+
+class Chunks(object):
+    "Async iterator over a sequence of chunks"
+
+    def __init__(self, loop, chunks):
+        self.loop = loop
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = asyncio.Future(loop=self.loop)
+        try:
+            future.set_result(next(self.chunks))
+        except StopIteration:
+            future.set_exception(StopAsyncIteration())
+        return future
+
+
+@skip_without_asyncio
+class TestAsyncDigest(unittest.TestCase):
+
+    data = os.urandom(300000)
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def chunks(self, size):
+        return Chunks(self.loop, [self.data[start:start + size]
+                for start in range(0, len(self.data), size)])
+
+    def test_stream(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(self.data)
+        reader.feed_eof()
+        digest = self.run_coroutine(aio.stream_digest(reader, b'SHA256',
+                chunk_size=65536))
+        self.assertEqual(digest.digest(), hashlib.sha256(self.data).digest())
+
+    def test_stream_empty(self):
+        reader = asyncio.StreamReader()
+        reader.feed_eof()
+        digest = self.run_coroutine(aio.stream_digest(reader, b'SHA1'))
+        self.assertEqual(digest.digest(), hashlib.sha1().digest())
+
+    def test_iter_small_chunks(self):
+        digest = self.run_coroutine(aio.iter_digest(self.chunks(1000),
+                b'SHA256', chunk_size=65536))
+        self.assertEqual(digest.digest(), hashlib.sha256(self.data).digest())
+
+    def test_iter_large_chunks(self):
+        chunks = Chunks(self.loop, [self.data[:10], self.data[10:200010],
+                bytearray(self.data[200010:])])
+        digest = self.run_coroutine(aio.iter_digest(chunks, b'SHA256',
+                chunk_size=65536))
+        self.assertEqual(digest.digest(), hashlib.sha256(self.data).digest())
+
+    def test_iter_multi(self):
+        digest = self.run_coroutine(aio.iter_digest(self.chunks(7000),
+                [b'SHA1', b'MD5']))
+        self.assertEqual(digest.digests(), {
+            b'SHA1': hashlib.sha1(self.data).digest(),
+            b'MD5': hashlib.md5(self.data).digest()})
+
+    def test_chunk_size(self):
+        self.assertRaises(ValueError, self.run_coroutine,
+                aio.iter_digest(self.chunks(1000), b'SHA1', chunk_size=0))
+
+    def test_file(self):
+        with tempfile.NamedTemporaryFile() as fileobj:
+            fileobj.write(self.data)
+            fileobj.flush()
+            digest = self.run_coroutine(aio.file_digest(fileobj.name,
+                    b'SHA512'))
+        self.assertEqual(digest.digest(), hashlib.sha512(self.data).digest())
+
+    def test_default_executor(self):
+        self.assertIs(aio.default_executor(), aio.default_executor())
@@ -1,8 +1,14 @@
 """Test Python hmac API implementation using OpenSSL"""
 from __future__ import absolute_import, division, print_function
+import binascii
 import hashlib
+import io
 import mock
 import numbers
+import os
+import subprocess
+import sys
+import tempfile
 
 try:
     import unittest2 as unittest
@@ -12,9 +18,28 @@ except ImportError:
 from .c.test_hmac import Vector001, Vector002, Vector003
 
 from tls.c import api
-from tls.hmac import new, HMAC
+from tls import io as tls_io
+from tls.hmac import (compare_digest, digest, file_hmac, new, sign_many,
+        verify_many, HMAC, HMACFilter, HMACKey, HMACKeyCache)
 import tls.hashlib
 
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FILTER_SCRIPT = """
+from tls.c import api, memory
+from tls import io
+from tls.hmac import HMACFilter
+chain = io.BIOMemBuffer(b'data' * 1000)
+mac = HMACFilter(chain, b'key', b'sha256')
+chain.read(4000)
+mac.digest()
+before = memory.totals()
+for _ in range(100):
+    mac.digest()
+after = memory.totals()
+print(memory.enabled, after.live - before.live)
+"""
+
 
 class TestHMAC(unittest.TestCase):
 
@@ -43,6 +68,360 @@ class TestHMAC(unittest.TestCase):
             del hmac
             self.assertEqual(cleanup_mock.call_count, 1)
 
+    def test_weakref_copy(self):
+        hmac = HMAC(b'')
+        HMAC_CTX_cleanup = api.HMAC_CTX_cleanup
+        with mock.patch('tls.c.api.HMAC_CTX_cleanup') as cleanup_mock:
+            cleanup_mock.side_effect = HMAC_CTX_cleanup
+            other = hmac.copy()
+            del other
+            self.assertEqual(cleanup_mock.call_count, 1)
+
+    def test_copy_closed(self):
+        hmac = HMAC(b'')
+        hmac.digest()
+        self.assertRaises(ValueError, hmac.copy)
+
+    def test_reset_reopens(self):
+        hmac = HMAC(b'')
+        hmac.digest()
+        hmac.reset()
+        hmac.update(b'')
+
+
+class TestDigest(unittest.TestCase):
+
+    def test_digestmod(self):
+        expected = new(b'key', b'message', b'sha1').digest()
+        self.assertEqual(digest(b'key', b'message', hashlib.sha1), expected)
+        self.assertEqual(digest(b'key', b'message', tls.hashlib.sha1),
+                expected)
+
+    def test_cached(self):
+        digest(b'key', b'message', b'sha256')
+        with mock.patch('tls.c.api.EVP_get_digestbyname') as lookup_mock:
+            digest(b'key', b'message', b'sha256')
+            self.assertFalse(lookup_mock.called)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, digest, b'key', b'message',
+                b'nonexistent')
+
+    def test_unicode(self):
+        self.assertRaises(TypeError, digest, b'key', u'message', b'sha1')
+
+
+class TestHMACKey(unittest.TestCase):
+
+    def test_digest_size(self):
+        self.assertEqual(HMACKey(b'', b'sha256').digest_size, 32)
+
+    def test_template_unchanged(self):
+        key = HMACKey(b'key', b'sha1')
+        key.new(b'first').digest()
+        self.assertEqual(key.new(b'second').digest(),
+                new(b'key', b'second', b'sha1').digest())
+
+    def test_key_setup_once(self):
+        key = HMACKey(b'key', b'sha1')
+        HMAC_Init_ex = api.HMAC_Init_ex
+        with mock.patch('tls.c.api.HMAC_Init_ex') as init_mock:
+            init_mock.side_effect = HMAC_Init_ex
+            key.new(b'message').digest()
+            self.assertEqual(init_mock.call_count, 0)
+
+
+class TestHMACKeyWipe(unittest.TestCase):
+
+    def test_wipe(self):
+        key = HMACKey(b'key', b'sha1')
+        hmac = key.new(b'message')
+        key.wipe()
+        self.assertRaises(ValueError, key.new)
+        self.assertEqual(hmac.digest(),
+                new(b'key', b'message', b'sha1').digest())
+
+    def test_wipe_key(self):
+        key = HMACKey(b'key', b'sha1')
+        buff = key._template._key
+        key.wipe()
+        self.assertEqual(bytes(api.buffer(buff)), b'\x00' * len(buff))
+        key.wipe()
+
+
+class TestHMACKeyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.loaded = []
+        self.now = 0
+        self.clock = mock.patch('tls.hmac._clock', lambda: self.now)
+        self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+
+    def load(self, key_id):
+        self.loaded.append(key_id)
+        return b'key-' + key_id
+
+    def test_new(self):
+        cache = HMACKeyCache(self.load, digestmod=b'sha256')
+        self.assertEqual(cache.new(b'a', b'message').digest(),
+                new(b'key-a', b'message', b'sha256').digest())
+
+    def test_hit(self):
+        cache = HMACKeyCache(self.load)
+        self.assertIs(cache.get(b'a'), cache.get(b'a'))
+        HMAC_Init_ex = api.HMAC_Init_ex
+        with mock.patch('tls.c.api.HMAC_Init_ex') as init_mock:
+            init_mock.side_effect = HMAC_Init_ex
+            cache.new(b'a', b'message').digest()
+            self.assertEqual(init_mock.call_count, 0)
+        self.assertEqual(self.loaded, [b'a'])
+        self.assertEqual(cache.info(), (2, 1, 0, 1024, 1))
+
+    def test_lru(self):
+        cache = HMACKeyCache(self.load, maxsize=2)
+        first = cache.get(b'a')
+        cache.get(b'b')
+        cache.get(b'a')
+        cache.get(b'c')
+        self.assertIn(b'a', cache)
+        self.assertNotIn(b'b', cache)
+        self.assertEqual(cache.info().evictions, 1)
+        self.assertIsNotNone(first._template)
+
+    def test_evict_wipes(self):
+        cache = HMACKeyCache(self.load, maxsize=1)
+        first = cache.get(b'a')
+        cache.get(b'b')
+        self.assertRaises(ValueError, first.new)
+
+    def test_ttl(self):
+        cache = HMACKeyCache(self.load, ttl=10)
+        first = cache.get(b'a')
+        self.now = 10
+        self.assertNotIn(b'a', cache)
+        self.assertIsNot(cache.get(b'a'), first)
+        self.assertEqual(self.loaded, [b'a', b'a'])
+        self.assertEqual(cache.info(), (0, 2, 1, 1024, 1))
+
+    def test_expire(self):
+        cache = HMACKeyCache(self.load, ttl=10)
+        cache.get(b'a')
+        self.now = 5
+        cache.get(b'b')
+        self.now = 10
+        cache.expire()
+        self.assertEqual(len(cache), 1)
+        self.assertIn(b'b', cache)
+
+    def test_put(self):
+        cache = HMACKeyCache()
+        old = cache.put(b'a', b'old')
+        cache.put(b'a', b'new')
+        self.assertRaises(ValueError, old.new)
+        self.assertEqual(cache.new(b'a', b'message').digest(),
+                new(b'new', b'message').digest())
+
+    def test_no_load(self):
+        self.assertRaises(KeyError, HMACKeyCache().get, b'a')
+
+    def test_discard_clear(self):
+        cache = HMACKeyCache(self.load)
+        first = cache.get(b'a')
+        cache.get(b'b')
+        cache.discard(b'a')
+        self.assertRaises(ValueError, first.new)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_maxsize(self):
+        self.assertRaises(ValueError, HMACKeyCache, maxsize=0)
+
+    def test_ttl_positive(self):
+        self.assertRaises(ValueError, HMACKeyCache, ttl=0)
+        self.assertRaises(ValueError, HMACKeyCache, ttl=-1)
+        cache = HMACKeyCache(self.load, ttl=0.5)
+        cache.get(b'a')
+        self.assertIn(b'a', cache)
+
+
+class TestFileHMAC(unittest.TestCase):
+
+    data = b'Nobody inspects the spammish repetition' * 100
+    bufsize = 7
+
+    def setUp(self):
+        self.expected = new(b'key', self.data, b'sha256').digest()
+        fd, self.filename = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def file_hmac(self, fileobj):
+        return file_hmac(b'key', fileobj, b'sha256', self.bufsize).digest()
+
+    def test_filename(self):
+        self.assertEqual(self.file_hmac(self.filename), self.expected)
+
+    def test_fd(self):
+        fd = os.open(self.filename, os.O_RDONLY)
+        try:
+            self.assertEqual(self.file_hmac(fd), self.expected)
+        finally:
+            os.close(fd)
+
+    def test_missing(self):
+        self.assertRaises(OSError, self.file_hmac, self.filename + 'x')
+
+    def test_fileobj(self):
+        with open(self.filename, 'rb') as fileobj:
+            self.assertEqual(self.file_hmac(fileobj), self.expected)
+
+    def test_bytesio(self):
+        self.assertEqual(self.file_hmac(io.BytesIO(self.data)), self.expected)
+
+    def test_bio_file(self):
+        with tls_io.BIOFile(self.filename) as chain:
+            self.assertEqual(self.file_hmac(chain), self.expected)
+
+    def test_key(self):
+        key = HMACKey(b'key', b'sha256')
+        self.assertEqual(file_hmac(key, self.filename).digest(),
+                self.expected)
+
+
+class TestHMACFilter(unittest.TestCase):
+
+    data = b'Nobody inspects the spammish repetition' * 100
+
+    def setUp(self):
+        self.expected = new(b'key', self.data, b'sha256').digest()
+
+    def test_read(self):
+        with tls_io.BIOMemBuffer(self.data) as chain:
+            mac = HMACFilter(chain, b'key', b'sha256')
+            self.assertEqual(chain.readall(), self.data)
+            self.assertEqual(mac.digest(), self.expected)
+            self.assertEqual(mac.digest(), self.expected)
+
+    def test_write(self):
+        with tls_io.BIOMemBuffer() as chain:
+            mac = HMACFilter(chain, HMACKey(b'key', b'sha256'))
+            api.BIO_write(chain.c_bio, self.data[:10], 10)
+            api.BIO_write(chain.c_bio, self.data[10:], len(self.data) - 10)
+            self.assertEqual(mac.hexdigest(), binascii.hexlify(
+                self.expected).decode())
+
+    def test_copy(self):
+        with tls_io.BIOMemBuffer(self.data) as source:
+            with tls_io.BIOMemBuffer() as destination:
+                mac = HMACFilter(source, b'key', b'sha256')
+                source.copy_to(destination, bufsize=64)
+                self.assertEqual(mac.digest(), self.expected)
+                self.assertEqual(destination.read(len(self.data)), self.data)
+
+    def test_reset(self):
+        with tls_io.BIOMemBuffer() as chain:
+            mac = HMACFilter(chain, b'key', b'sha256')
+            api.BIO_write(chain.c_bio, b'discarded', 9)
+            api.BIO_ctrl(chain.c_bio, api.BIO_CTRL_RESET, 0, api.NULL)
+            api.BIO_write(chain.c_bio, self.data, len(self.data))
+            self.assertEqual(mac.digest(), self.expected)
+
+    def test_closed(self):
+        chain = tls_io.BIOMemBuffer(self.data)
+        mac = HMACFilter(chain, b'key', b'sha256')
+        chain.close()
+        self.assertRaises(ValueError, mac.digest)
+
+    def test_digest_released(self):
+        env = dict(os.environ, OPENTLS_MEMORY_ACCOUNTING='1')
+        output = subprocess.check_output([sys.executable, '-c',
+                FILTER_SCRIPT], cwd=ROOT, env=env)
+        self.assertEqual(output.decode().split(), ['True', '0'])
+
+
+class TestCompareDigest(unittest.TestCase):
+
+    def test_equal(self):
+        self.assertTrue(compare_digest(b'abc', bytearray(b'abc')))
+
+    def test_different(self):
+        self.assertFalse(compare_digest(b'abc', b'abd'))
+
+    def test_length(self):
+        self.assertFalse(compare_digest(b'abc', b'ab'))
+
+
+class TestMany(unittest.TestCase):
+
+    messages = [b'', b'a', b'message' * 100, b'last']
+
+    def expected(self):
+        return [new(b'key', msg, b'sha1').digest() for msg in self.messages]
+
+    def test_sign(self):
+        self.assertEqual(sign_many(b'key', self.messages, b'sha1'),
+                self.expected())
+
+    def test_sign_packed(self):
+        self.assertEqual(sign_many(b'key', self.messages, b'sha1',
+                packed=True), b''.join(self.expected()))
+
+    def test_sign_offsets(self):
+        offsets = [0, 0, 1, 701, 705]
+        self.assertEqual(sign_many(b'key', b''.join(self.messages), b'sha1',
+                offsets=offsets), self.expected())
+
+    def test_sign_key(self):
+        key = HMACKey(b'key', b'sha1')
+        self.assertEqual(sign_many(key, self.messages), self.expected())
+        self.assertEqual(key.new(b'a').digest(), self.expected()[1])
+
+    def test_sign_empty(self):
+        self.assertEqual(sign_many(b'key', [], b'sha1'), [])
+
+    def test_sign_invalid_offsets(self):
+        self.assertRaises(ValueError, sign_many, b'key', b'abc', b'sha1',
+                offsets=[0, 4])
+        self.assertRaises(ValueError, sign_many, b'key', b'abc', b'sha1',
+                offsets=[2, 1])
+
+    def test_verify(self):
+        tags = self.expected()
+        tags[2] = tags[1]
+        self.assertEqual(verify_many(b'key', self.messages, tags, b'sha1'),
+                bytearray([0x0b]))
+
+    def test_verify_packed(self):
+        tags = sign_many(b'key', self.messages, b'sha1', packed=True)
+        self.assertEqual(verify_many(b'key', self.messages, tags, b'sha1'),
+                bytearray([0x0f]))
+        self.assertRaises(ValueError, verify_many, b'key', self.messages,
+                tags[:-1], b'sha1')
+
+    def test_verify_tag_length(self):
+        tags = self.expected()
+        tags[0] = tags[0][:10]
+        tags[3] = tags[3] + b'\x00'
+        self.assertEqual(verify_many(b'key', self.messages, tags, b'sha1'),
+                bytearray([0x06]))
+
+    def test_verify_tag_count(self):
+        self.assertRaises(ValueError, verify_many, b'key', self.messages,
+                self.expected()[1:], b'sha1')
+
+    def test_verify_bitmap(self):
+        messages = [str(i).encode() for i in range(20)]
+        tags = sign_many(b'key', messages, b'sha1')
+        tags[9] = tags[8]
+        self.assertEqual(verify_many(b'key', messages, tags, b'sha1'),
+                bytearray([0xff, 0xfd, 0x0f]))
+
 
 class HMACTests(object):
 
@@ -62,6 +441,42 @@ class HMACTests(object):
             hmac.update(ch)
         self.assertEqual(self.digest, hmac.digest())
 
+    def test_one_shot(self):
+        self.assertEqual(self.digest,
+                digest(self.key, self.data, self.md or b'md5'))
+
+    def test_one_shot_buffers(self):
+        self.assertEqual(self.digest, digest(bytearray(self.key),
+                memoryview(self.data), self.md or b'md5'))
+
+    def test_many(self):
+        self.assertEqual([self.digest],
+                sign_many(self.key, [self.data], self.md))
+        self.assertEqual(bytearray([1]),
+                verify_many(self.key, [self.data], [self.digest], self.md))
+
+    def test_key_new(self):
+        key = HMACKey(self.key, self.md)
+        self.assertEqual(self.digest, key.new(self.data).digest())
+
+    def test_copy(self):
+        half = len(self.data) // 2
+        hmac = new(self.key, self.data[:half], self.md)
+        other = hmac.copy()
+        other.update(self.data[half:])
+        self.assertEqual(self.digest, other.digest())
+        hmac.update(self.data[half:])
+        self.assertEqual(self.digest, hmac.digest())
+
+    def test_reset(self):
+        hmac = new(self.key, b'discarded', self.md)
+        hmac.reset()
+        hmac.update(self.data)
+        self.assertEqual(self.digest, hmac.digest())
+        hmac.reset()
+        hmac.update(self.data)
+        self.assertEqual(self.digest, hmac.digest())
+
     def test_hexdigest(self):
         hmac = new(self.key, self.data, self.md)
         hexdigest = hmac.hexdigest()
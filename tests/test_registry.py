@@ -0,0 +1,128 @@
+"""Test registries of OpenSSL algorithms"""
+from __future__ import absolute_import, division, print_function
+import mock
+import os
+import shutil
+import tempfile
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tls import cipherlib, hashlib, registry
+from tls.c import api
+
+
+class TestDigests(unittest.TestCase):
+
+    def test_shared(self):
+        self.assertIs(hashlib.algorithms_available, registry.digests)
+
+    def test_canonical(self):
+        self.assertIn(b'SHA256', registry.digests)
+        self.assertNotIn(b'sha256', registry.digests)
+
+    def test_info(self):
+        info = registry.digests.info(b'SHA256')
+        self.assertEqual(info.name, b'SHA256')
+        self.assertEqual(info.nid, api.NID_sha256)
+        self.assertIn(b'sha256', info.aliases)
+        self.assertEqual(info.digest_size, 32)
+        self.assertEqual(info.block_size, 64)
+
+    def test_alias(self):
+        self.assertIs(registry.digests.info(b'sha256'),
+                registry.digests.info(b'SHA256'))
+
+    def test_unknown(self):
+        self.assertRaises(KeyError, registry.digests.info, b'nonexistent')
+
+
+class TestCiphers(unittest.TestCase):
+
+    def test_shared(self):
+        self.assertIs(cipherlib.algorithms_available, registry.ciphers)
+
+    def test_info(self):
+        info = registry.ciphers.info(b'aes-128-cbc')
+        self.assertEqual(info.name, b'AES-128-CBC')
+        self.assertEqual(info.key_length, 16)
+        self.assertEqual(info.iv_length, 16)
+        self.assertEqual(info.block_size, 16)
+        self.assertEqual(info.mode, api.EVP_CIPH_CBC_MODE)
+
+
+class TestSetOperations(unittest.TestCase):
+
+    names = set([b'MD5', b'SHA256', b'nonexistent'])
+
+    def test_operators(self):
+        digests = registry.digests
+        self.assertEqual(digests & self.names, set([b'MD5', b'SHA256']))
+        self.assertEqual(digests | self.names, set(digests) | self.names)
+        self.assertEqual(digests - self.names, set(digests) - self.names)
+        self.assertEqual(digests ^ self.names, set(digests) ^ self.names)
+        self.assertIsInstance(digests & self.names, set)
+
+    def test_comparisons(self):
+        digests = registry.digests
+        self.assertTrue(set([b'MD5']) <= digests)
+        self.assertFalse(self.names <= digests)
+        self.assertEqual(digests, set(digests))
+
+    def test_methods(self):
+        digests = registry.digests
+        self.assertEqual(digests.copy(), set(digests))
+        self.assertEqual(digests.intersection([b'MD5', b'nonexistent']),
+                set([b'MD5']))
+        self.assertEqual(digests.union(self.names), set(digests) | self.names)
+        self.assertEqual(digests.difference(self.names),
+                set(digests) - self.names)
+        self.assertEqual(digests.symmetric_difference(self.names),
+                set(digests) ^ self.names)
+        self.assertTrue(digests.issuperset([b'MD5', b'SHA256']))
+        self.assertTrue(digests.issubset(set(digests) | self.names))
+        self.assertTrue(digests.isdisjoint([b'nonexistent']))
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ,
+                {'OPENTLS_REGISTRY_CACHE': self.directory})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def registry(self):
+        return registry.Registry('digests', api.OBJ_NAME_TYPE_MD_METH,
+                registry._describe_digest, registry.DigestInfo)
+
+    def test_lazy(self):
+        digests = self.registry()
+        self.assertIsNone(digests._algorithms)
+        self.assertIn(b'MD5', digests)
+        self.assertIsNotNone(digests._algorithms)
+
+    def test_set(self):
+        self.assertEqual(set(self.registry()), set(registry.digests))
+
+    def test_persisted(self):
+        with self.environ:
+            built = self.registry()
+            self.assertIn(b'SHA1', built)
+            self.assertEqual(len(os.listdir(self.directory)), 1)
+            with mock.patch('tls.c.api.tls_obj_names') as names_mock:
+                loaded = self.registry()
+                self.assertEqual(set(loaded), set(built))
+                self.assertEqual(loaded.info(b'sha1'), built.info(b'sha1'))
+                self.assertFalse(names_mock.called)
+
+    def test_persisted_invalid(self):
+        with self.environ:
+            path = self.registry()._path()
+            with open(path, 'w') as saved:
+                saved.write('[[')
+            self.assertIn(b'SHA1', self.registry())
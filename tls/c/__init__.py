@@ -1,121 +1,96 @@
 from __future__ import absolute_import, division, print_function
 from collections import namedtuple
 import atexit
-import types
+import os
+import threading
 import weakref
 
 from cffi import FFI
 
-__all__ = ['api']
+try:
+    from importlib.util import find_spec
+except ImportError:
+    from pkgutil import find_loader as find_spec
 
+from tls.c import _build
+from tls.c._memory import MemoryAccounting
+from tls.c._startup import startup
 
-class CdataOwner(object):
-    """CData wrapper that adds coownership of cdata objects.
+__all__ = ['api', 'memory', 'startup', 'startup_report']
 
-    A reference to any object assigned to an attribute of the wrapped cdata
-    object is retained for as long as this object is alive. This is implemented
-    using a WeakKeyDictionary.
 
-    Any cdata attributes access through this wrapper will themselves be wrapped
-    before being returned.
+class Ownership(object):
+    """Registry retaining Python objects on behalf of cdata objects.
 
-    NOTE: CDataOwner objects can not be passed directly to cffi foreign
-    functions. To access the wrapped cdata object, call the '__unwrap__()'
-    function.
-    """
-
-    __REFS__ = weakref.WeakKeyDictionary()
-
-    @staticmethod
-    def _add_coownership(ffi):
-        """Add coownership to a cffi.FFI instance.
-
-        Coownership can be enabled by passing the new 'coown' keyword argument
-        to cffi.FFI().new().
-
-        Once initialisation is complete, the wrapping can be discarded by
-        calling '__unwrap__' on the wrapper object. This is safe to do because
-        coownership is referenced using the cdata object, not the wrapper.
-        """
-        orig_new = ffi.new
+    relate(primary, dependant, name) keeps dependant alive for as long as the
+    primary cdata object is alive. Relating another dependant with the same
+    name to the same primary replaces the previous dependant.
 
-        def new(ffi, cdecl, init=None, coown=False):
-            obj = orig_new(cdecl, init)
-            if coown:
-                obj = CdataOwner(obj)
-            return obj
+    Each primary is tracked by a single weak reference that also holds its
+    dependants. The weak reference's callback removes it from the registry
+    when the primary is garbage collected, releasing the dependants.
+    """
 
-        try:
-            ffi.new = types.MethodType(new, ffi, FFI)
-        except TypeError:
-            ffi.new = types.MethodType(new, ffi)
+    __slots__ = ('_owners', '_release')
 
-    @classmethod
-    def _relate(cls, primary, dependant, name):
-        refs = cls.__REFS__.setdefault(primary, {})
-        refs[name] = dependant
+    class _Owner(weakref.ref):
+        "Weak reference to a primary cdata object holding its dependants"
 
-    def __init__(self, this, root=None):
-        root = this if root is None else root
-        self.__dict__['__this__'] = this
-        self.__dict__['__root__'] = root
-        self.__dict__['__refs__'] = self.__REFS__.setdefault(root, {})
+        __slots__ = ('key', 'dependants')
 
-    def __getattr__(self, name):
-        cdata = getattr(self.__this__, name)
-        return CdataOwner(cdata, root=self.__root__)
+        def __new__(cls, primary, callback, key):
+            return weakref.ref.__new__(cls, primary, callback)
 
-    def __setattr__(self, name, value):
-        setattr(self.__this__, name, value)
-        self.__refs__[name] = value
+        def __init__(self, primary, callback, key):
+            super(Ownership._Owner, self).__init__(primary, callback)
+            self.key = key
+            self.dependants = {}
 
-    def __call__(self, *args):
-        return self.__this__.__call__(*args)
-
-    def __getitem__(self, key):
-        return self.__this__.__getitem__(key)
+    def __init__(self):
+        owners = self._owners = {}
 
-    def __repr__(self):
-        return self.__this__.__repr__()
+        def release(owner):
+            if owners.get(owner.key) is owner:
+                del owners[owner.key]
 
-    def __setitem__(self, key, value):
-        return self.__this__.__setitem__(key, value)
+        self._release = release
 
-    def __str__(self):
-        return self.__this__.__str__()
+    def __len__(self):
+        return len(self._owners)
 
-    def __unicode__(self):
-        return self.__this__.__unicode__()
+    def relate(self, primary, dependant, name):
+        "Retain dependant for as long as primary is alive"
+        key = id(primary)
+        owner = self._owners.get(key)
+        if owner is None or owner() is not primary:
+            owner = self._Owner(primary, self._release, key)
+            self._owners[key] = owner
+        owner.dependants[name] = dependant
 
-    def _unwrap(self):
-        return self.__this__
+    def dependants(self, primary):
+        "Return a dictionary of the dependants retained for primary"
+        owner = self._owners.get(id(primary))
+        if owner is None or owner() is not primary:
+            return {}
+        return dict(owner.dependants)
 
 
 class API(object):
-    """OpenSSL API wrapper."""
+    """OpenSSL API wrapper.
+
+    The bindings are split into groups of related definitions (core, digest,
+    cipher, bio, rand, engine and ssl). When the out-of-line extension
+    modules built by tls.c._build are available for every group, matching
+    both the definitions and the OpenSSL library, the core group is loaded
+    immediately and every other group is loaded the first time one of its
+    functions is accessed. Otherwise the definitions of all groups are parsed
+    and compiled together using ffi.verify(). Setting the OPENTLS_PREBUILT
+    environment variable to 0 forces the use of ffi.verify().
+    """
 
     SSLVersion = namedtuple('SSLVersion', 'major minor fix patch status')
 
-    _modules = [
-        'asn1',
-        'bio',
-        'bio_filter',
-        'bio_sink',
-        'err',
-        'evp',
-        'evp_md',
-        'evp_cipher',
-        'evp_cipher_listing',
-        'hmac',
-        'obj',
-        'openssl',
-        'nid',
-        'pkcs5',
-        'rand',
-        'ssl',
-        'ssleay',
-        'stdio',
-    ]
+    _groups = _build.GROUPS
 
     __instance = None
 
@@ -126,34 +101,82 @@ class API(object):
 
     def __init__(self):
         self.ffi = FFI()
-        self.INCLUDES = []
-        self.TYPES = []
-        self.FUNCTIONS = []
-        self.SETUP = []
-        self.TEARDOWN = []
+        self._lock = threading.RLock()
+        self._libraries = {}
+        self._providers = {}
         self._import()
-        self._define()
-        self._verify()
+        if not self._prebuilt():
+            self._define()
+            self._verify()
         self._populate()
         self._initialise()
 
+    def __getattr__(self, name):
+        "load the group of bindings providing name when first accessed"
+        providers = self.__dict__.get('_providers', {})
+        if name not in providers:
+            raise AttributeError(name)
+        with self._lock:
+            group = providers.get(name)
+            if group is not None:
+                self._load_group(group)
+        return getattr(self, name)
+
+    @startup.measure('API._import')
     def _import(self):
         "import all library definitions"
-        for name in self._modules:
-            module = __import__(__name__ + '.' + name, fromlist=['*'])
-            self._import_definitions(module, 'INCLUDES')
-            self._import_definitions(module, 'TYPES')
-            self._import_definitions(module, 'FUNCTIONS')
-            self._import_definitions(module, 'SETUP')
-            self._import_definitions(module, 'TEARDOWN')
-
-    def _import_definitions(self, module, name):
-        "import defintions named defintions from module"
-        container = getattr(self, name)
-        for definition in getattr(module, name, ()):
-            if definition not in container:
-                container.append(definition)
-
+        combined, self._definitions = _build.load_groups(self._import_module)
+        for kind in _build.KINDS:
+            setattr(self, kind, getattr(combined, kind))
+
+    def _import_module(self, name):
+        "import definition module by name"
+        return __import__(__name__ + '.' + name, fromlist=['*'])
+
+    def _module_name(self, group):
+        "Return the qualified name of the prebuilt module for group"
+        return __name__ + '.' + _build.module_name(self, self._definitions,
+                group)
+
+    @startup.measure('API._prebuilt')
+    def _prebuilt(self):
+        "load prebuilt core bindings, if those of every group are available"
+        if os.environ.get('OPENTLS_PREBUILT', '1') == '0':
+            return False
+        for group, _ in self._groups:
+            if find_spec(self._module_name(group)) is None:
+                return False
+        return self._load(_build.CORE)
+
+    @startup.measure('API._load')
+    def _load(self, group):
+        "load prebuilt bindings for group, if available and up to date"
+        try:
+            module = __import__(self._module_name(group),
+                    fromlist=['ffi', 'lib'])
+        except ImportError:
+            return False
+        if group == _build.CORE:
+            if module.lib.OPENSSL_VERSION_NUMBER != module.lib.SSLeay():
+                return False
+            self.ffi = module.ffi
+            self.openssl = module.lib
+        self._libraries[group] = module.lib
+        return True
+
+    def _load_group(self, group):
+        "load, attach and initialise prebuilt bindings for group"
+        with startup.phase('API._load_group({0})'.format(group)):
+            if not self._load(group):
+                msg = "Prebuilt OpenSSL bindings for '{0}' are missing"
+                raise ImportError(msg.format(group))
+            for name, provider in list(self._providers.items()):
+                if provider == group:
+                    del self._providers[name]
+            self._attach(self._libraries[group])
+            self._setup(group)
+
+    @startup.measure('API._define')
     def _define(self):
         "parse function definitions"
         for typedef in self.TYPES:
@@ -161,36 +184,65 @@ class API(object):
         for function in self.FUNCTIONS:
             self.ffi.cdef(function)
 
+    @startup.measure('API._verify')
     def _verify(self):
         "load openssl, create function attributes"
-        includes = "\n".join(self.INCLUDES)
+        includes = "\n".join(self.INCLUDES + self.CUSTOMIZATIONS)
         self.openssl = self.ffi.verify(includes,
-                extra_compile_args=[
-                    '-Wno-deprecated-declarations',
-                ],
-                libraries=['ssl'])
+                extra_compile_args=_build.COMPILE_ARGS,
+                libraries=_build.LIBRARIES)
+        for group, _ in self._groups:
+            self._libraries[group] = self.openssl
+
+    def _declarations(self, library):
+        "Return names of the functions and constants in library"
+        parser = getattr(self.ffi, '_parser', None)
+        if parser is None:
+            return dir(library)
+        names = []
+        for decl in parser._declarations:
+            if not decl.startswith(('function ', 'constant ')):
+                continue
+            names.append(decl.split(None, 1)[1])
+        return names
+
+    def _attach(self, library):
+        "Attach function definitions from library to self"
+        for name in self._declarations(library):
+            setattr(self, name, getattr(library, name))
 
+    @startup.measure('API._populate')
     def _populate(self):
-        "Attach function definitions to self"
-        for decl in self.ffi._parser._declarations:
-            if not decl.startswith(('function ', 'constant ')):
+        "Attach function definitions to self, index those not yet loaded"
+        self._attach(self.openssl)
+        for group, _ in self._groups:
+            if group in self._libraries:
                 continue
-            name = decl.split(None, 1)[1]
-            setattr(self, name, getattr(self.openssl, name))
+            for name in _build.function_names(self._definitions[group]):
+                self._providers[name] = group
         self.NULL = self.ffi.NULL
         self.buffer = self.ffi.buffer
         self.callback = self.ffi.callback
         self.cast = self.ffi.cast
+        self.from_buffer = self.ffi.from_buffer
         self.new = self.ffi.new
         self.string = self.ffi.string
-        self.relate = CdataOwner._relate
-        CdataOwner._add_coownership(self)
+        self.ownership = Ownership()
+        self.relate = self.ownership.relate
 
+    @startup.measure('API._initialise')
     def _initialise(self):
         "initialise openssl, schedule cleanup at exit"
-        for function in self.SETUP:
+        for group, _ in self._groups:
+            if group in self._libraries:
+                self._setup(group)
+
+    def _setup(self, group):
+        "initialise a group of bindings, schedule cleanup at exit"
+        definitions = self._definitions[group]
+        for function in definitions.SETUP:
             getattr(self, function)()
-        for function in self.TEARDOWN:
+        for function in definitions.TEARDOWN:
             atexit.register(getattr(self, function))
 
     def version_info(self):
@@ -217,4 +269,8 @@ class API(object):
         buff = self.SSLeay_version(detail)
         return api.string(buff)
 
-api = API()
+with startup.phase('tls.c.api'):
+    api = API()
+
+memory = MemoryAccounting(api)
+startup_report = startup.report
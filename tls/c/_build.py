@@ -0,0 +1,179 @@
+"""Ahead of time build of the OpenSSL bindings.
+
+Parsing the binding definitions and compiling them with ffi.verify() is the
+most expensive part of importing tls. This module builds the same bindings as
+out-of-line cffi extension modules which tls.c.api loads in preference to
+calling ffi.verify().
+
+The definitions are split into groups that are built as separate extension
+modules, so that a process only loads the groups it uses. The core group
+declares the types of every group and is included by the other groups, so
+cdata objects can be passed between them. Extension modules are named after a
+fingerprint of their definitions, so a stale build is never loaded after the
+definitions change.
+
+setup.py builds the extension modules using the cffi_modules keyword. They
+can also be built in place from a source checkout:
+
+    $ python tls/c/_build.py
+
+setuptools executes this file outside of the tls package, so it may only
+depend on the standard library and cffi.
+"""
+from __future__ import absolute_import, division, print_function
+import functools
+import hashlib
+import os
+import re
+import types
+
+from cffi import FFI
+
+__all__ = ['CORE', 'GROUPS', 'MODULES', 'Definitions', 'build_ffi',
+           'fingerprint', 'function_names', 'load_groups', 'merge',
+           'module_name']
+
+PACKAGE = 'tls.c'
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+CORE = 'core'
+
+GROUPS = [
+    (CORE, ['mem', 'crypto', 'asn1', 'err', 'evp', 'nid', 'obj', 'openssl',
+            'ssleay', 'stdio']),
+    ('digest', ['evp_md', 'hmac']),
+    ('cipher', ['evp_cipher', 'evp_cipher_listing', 'pkcs5']),
+    ('bio', ['bio', 'bio_filter', 'bio_sink']),
+    ('rand', ['rand']),
+    ('engine', ['engine']),
+    ('ssl', ['ssl']),
+]
+
+MODULES = [module for _, modules in GROUPS for module in modules]
+
+KINDS = ('INCLUDES', 'CUSTOMIZATIONS', 'TYPES', 'FUNCTIONS', 'SETUP',
+         'TEARDOWN')
+
+COMPILE_ARGS = ['-Wno-deprecated-declarations']
+LIBRARIES = ['ssl', 'crypto']
+
+
+def merge(container, definitions):
+    "append definitions to container, skipping those already present"
+    for definition in definitions:
+        if definition not in container:
+            container.append(definition)
+
+
+def load_module(name):
+    "load a definition module from source without importing tls.c"
+    filename = os.path.join(DIRECTORY, name + '.py')
+    module = types.ModuleType(name)
+    with open(filename) as source:
+        code = compile(source.read(), filename, 'exec')
+    exec(code, module.__dict__)
+    return module
+
+
+class Definitions(object):
+    """Library definitions with the same INCLUDES, CUSTOMIZATIONS, TYPES,
+    FUNCTIONS, SETUP and TEARDOWN attributes as tls.c.API.
+
+    CUSTOMIZATIONS are C source code compiled after the INCLUDES, which
+    implement helper functions declared in FUNCTIONS.
+    """
+
+    def __init__(self):
+        for kind in KINDS:
+            setattr(self, kind, [])
+
+    def update(self, module):
+        "add the definitions from a definition module"
+        for kind in KINDS:
+            merge(getattr(self, kind), getattr(module, kind, ()))
+
+
+def load_groups(loader=load_module):
+    """Return the combined definitions and a dictionary of the definitions of
+    each group. The loader is called with the name of each definition module.
+    """
+    combined = Definitions()
+    groups = {}
+    for group, modules in GROUPS:
+        definitions = groups[group] = Definitions()
+        for name in modules:
+            module = loader(name)
+            combined.update(module)
+            definitions.update(module)
+    return combined, groups
+
+
+FUNCTION_NAME = re.compile(r'(\w+)\s*\(')
+
+
+def function_names(definitions):
+    "Return the names of the functions declared by definitions"
+    names = []
+    for declaration in ''.join(definitions.FUNCTIONS).split(';'):
+        match = FUNCTION_NAME.search(declaration)
+        if match:
+            names.append(match.group(1))
+    return names
+
+
+def fingerprint(combined, groups, group):
+    "Return a hex digest identifying a group's definitions and build options"
+    digest = hashlib.sha1(group.encode('utf-8'))
+    sections = (combined.INCLUDES, groups[group].CUSTOMIZATIONS,
+                combined.TYPES, groups[group].FUNCTIONS, COMPILE_ARGS,
+                LIBRARIES)
+    for section in sections:
+        for text in section:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\n')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def module_name(combined, groups, group):
+    "Return the extension module name for a group"
+    return '_openssl_{0}_{1}'.format(group,
+            fingerprint(combined, groups, group)[:16])
+
+
+def build_ffi(group=CORE, loaded=None):
+    """Return a cffi.FFI instance ready to compile a group's extension module.
+
+    The loaded argument is the result of load_groups(), which is called if
+    not provided.
+    """
+    combined, groups = loaded if loaded is not None else load_groups()
+    ffi = FFI()
+    if group == CORE:
+        for typedef in combined.TYPES:
+            ffi.cdef(typedef)
+    else:
+        ffi.include(build_ffi(CORE, (combined, groups)))
+    for function in groups[group].FUNCTIONS:
+        ffi.cdef(function)
+    ffi.set_source(PACKAGE + '.' + module_name(combined, groups, group),
+            "\n".join(combined.INCLUDES + groups[group].CUSTOMIZATIONS),
+            extra_compile_args=COMPILE_ARGS,
+            libraries=LIBRARIES)
+    return ffi
+
+
+build_core = functools.partial(build_ffi, CORE)
+build_digest = functools.partial(build_ffi, 'digest')
+build_cipher = functools.partial(build_ffi, 'cipher')
+build_bio = functools.partial(build_ffi, 'bio')
+build_rand = functools.partial(build_ffi, 'rand')
+build_engine = functools.partial(build_ffi, 'engine')
+build_ssl = functools.partial(build_ffi, 'ssl')
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.dirname(DIRECTORY))
+    loaded = load_groups()
+    for group, _ in GROUPS:
+        print(build_ffi(group, loaded).compile(tmpdir=root))
@@ -0,0 +1,103 @@
+"""Accounting of the native memory allocated by OpenSSL.
+
+When the OPENTLS_MEMORY_ACCOUNTING environment variable is set before tls.c
+is imported, OpenSSL's malloc, realloc and free are replaced by functions
+counting the allocations made from each OpenSSL source file. The hooks can
+only be installed before OpenSSL's first allocation, so accounting is not
+enabled if another module using the same OpenSSL library, such as Python's
+ssl or hashlib, allocated memory first.
+
+    $ OPENTLS_MEMORY_ACCOUNTING=1 python
+    >>> from tls.c import memory
+    >>> memory.enabled
+    True
+    >>> for usage in memory.subsystems():
+    ...     print(usage.source, usage.live)
+
+Each Usage counts the allocations that are live, the bytes they hold, the
+high water mark of those bytes and the total number of allocations made. The
+source of a Usage is the OpenSSL source file that made the allocations.
+Source files are grouped into subsystems by their directory, such as evp or
+bio. OpenSSL before 1.1.0 records only the file name, so the subsystem is the
+file name up to the first underscore.
+"""
+from __future__ import absolute_import, division, print_function
+from collections import namedtuple
+import os
+
+__all__ = ['MemoryAccounting', 'Usage', 'subsystem']
+
+COUNTERS = 4
+TOTAL = 0
+UNKNOWN = 1
+
+Usage = namedtuple('Usage', 'source allocations live peak total')
+
+
+def subsystem(source):
+    "Return the name of the OpenSSL subsystem containing a source file"
+    directory, filename = os.path.split(source.replace('\\', '/'))
+    if directory:
+        return os.path.basename(directory)
+    return os.path.splitext(filename)[0].split('_')[0]
+
+
+class MemoryAccounting(object):
+    "Counters of the native memory allocated by OpenSSL"
+
+    def __init__(self, api):
+        self._api = api
+
+    @property
+    def enabled(self):
+        return bool(self._api.tls_mem_enabled())
+
+    def _snapshot(self):
+        "Generate the Usage of each slot in use, starting with the totals"
+        slots = self._api.tls_mem_slot_count()
+        counters = self._api.new('size_t[]', COUNTERS * slots)
+        self._api.tls_mem_snapshot(counters)
+        for index in range(slots):
+            if index == TOTAL:
+                source = 'total'
+            elif index == UNKNOWN:
+                source = 'unknown'
+            else:
+                name = self._api.tls_mem_source(index)
+                if name == self._api.NULL:
+                    continue
+                source = self._api.string(name).decode('utf-8', 'replace')
+            start = COUNTERS * index
+            yield Usage(source, *counters[start:start + COUNTERS])
+
+    def totals(self):
+        "Return the Usage of all allocations"
+        for usage in self._snapshot():
+            return usage
+
+    def sources(self):
+        "Return a list of the Usage of each source file, largest first"
+        usages = [usage for usage in self._snapshot()
+                  if usage.source != 'total' and usage.total]
+        return sorted(usages, key=lambda usage: usage.live, reverse=True)
+
+    def subsystems(self):
+        """Return a list of the Usage of each subsystem, largest first.
+
+        The peak of a subsystem is the sum of the peaks of its source files,
+        an upper bound of the subsystem's high water mark.
+        """
+        combined = {}
+        for usage in self.sources():
+            name = usage.source
+            if name != 'unknown':
+                name = subsystem(name)
+            previous = combined.get(name, Usage(name, 0, 0, 0, 0))
+            combined[name] = Usage(name, *(a + b for a, b in
+                    zip(previous[1:], usage[1:])))
+        return sorted(combined.values(), key=lambda usage: usage.live,
+                reverse=True)
+
+    def reset_peak(self):
+        "Reset the high water marks to the currently live bytes"
+        self._api.tls_mem_reset_peak()
@@ -0,0 +1,107 @@
+"""Startup profiling for the OpenSSL bindings.
+
+The duration of each phase of loading the bindings, and of initialisers
+such as building the algorithm registries, is always recorded. The
+memory allocated by Python during each phase is also recorded when the
+OPENTLS_STARTUP_PROFILE environment variable is set, using tracemalloc where
+available. The environment variable also prints the report to stderr when the
+interpreter exits.
+
+    $ OPENTLS_STARTUP_PROFILE=1 python -c 'import tls.hashlib'
+
+Or from Python:
+
+    >>> from tls.c import startup_report
+    >>> for phase in startup_report():
+    ...     print(phase.name, phase.seconds)
+"""
+from __future__ import absolute_import, division, print_function
+from collections import namedtuple
+from timeit import default_timer
+import atexit
+import contextlib
+import functools
+import os
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__all__ = ['Phase', 'StartupProfile', 'startup']
+
+
+Phase = namedtuple('Phase', 'name depth seconds allocated')
+
+
+class StartupProfile(object):
+    """Records the wall clock time and allocations of startup phases.
+
+    Phases are recorded in the order they complete. Nested phases have a
+    greater depth than the phase containing them. The allocated attribute of
+    each phase is the net number of bytes allocated by Python, or None when
+    allocations are not being traced.
+    """
+
+    def __init__(self, trace=False):
+        self._phases = []
+        self._depth = 0
+        self.tracing = bool(trace) and tracemalloc is not None
+        if self.tracing and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        "Context manager recording a named phase"
+        allocated = self._allocated()
+        start = default_timer()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            seconds = default_timer() - start
+            if allocated is not None:
+                allocated = self._allocated() - allocated
+            self._phases.append(Phase(name, self._depth, seconds, allocated))
+
+    def measure(self, name):
+        "Decorate a function to record each call as a named phase"
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self):
+        "Return a list of Phase tuples recorded so far"
+        return list(self._phases)
+
+    def write(self, stream=None):
+        "Write a human readable report to stream, defaulting to stderr"
+        stream = sys.stderr if stream is None else stream
+        stream.write('{0:<48} {1:>10} {2:>12}\n'.format(
+            'phase', 'ms', 'KiB'))
+        for phase in self._phases:
+            name = '  ' * phase.depth + phase.name
+            if phase.allocated is None:
+                allocated = '-'
+            else:
+                allocated = '{0:.1f}'.format(phase.allocated / 1024)
+            stream.write('{0:<48} {1:>10.3f} {2:>12}\n'.format(
+                name, 1000 * phase.seconds, allocated))
+
+    def _allocated(self):
+        if not self.tracing:
+            return None
+        current, _ = tracemalloc.get_traced_memory()
+        return current
+
+
+startup = StartupProfile(trace=os.environ.get('OPENTLS_STARTUP_PROFILE'))
+
+if os.environ.get('OPENTLS_STARTUP_PROFILE'):
+    atexit.register(startup.write)
@@ -2,6 +2,35 @@ INCLUDES = [
     '#include <openssl/bio.h>',
 ]
 
+CUSTOMIZATIONS = [
+    # Copy the remaining data read from src to dst in a single call, reusing
+    # one buffer of size bytes and adding the bytes copied to copied. Return
+    # 1 at the end of src, -1 on a read error and -2 on a write error.
+    '''
+    static int tls_bio_copy(BIO *src, BIO *dst, unsigned char *buf, int size,
+                            unsigned long long *copied)
+    {
+        int count, offset, written;
+        for (;;) {
+            count = BIO_read(src, buf, size);
+            if (count <= 0) {
+                if (count == 0 || BIO_should_retry(src) || BIO_eof(src)) {
+                    return 1;
+                }
+                return -1;
+            }
+            for (offset = 0; offset < count; offset += written) {
+                written = BIO_write(dst, buf + offset, count - offset);
+                if (written <= 0) {
+                    return -2;
+                }
+            }
+            *copied += (unsigned long long)count;
+        }
+    }
+    ''',
+]
+
 TYPES = [
     # BIO ctrl constants
     'static const int BIO_CTRL_RESET;',
@@ -109,6 +138,8 @@ FUNCTIONS = [
     'int BIO_gets(BIO *b, char *buf, int size);',
     'int BIO_write(BIO *b, const void *buf, int len);',
     'int BIO_puts(BIO *b, const char *buf);',
+    'int tls_bio_copy(BIO *src, BIO *dst, unsigned char *buf, int size,'
+        'unsigned long long *copied);',
     # BIO should functions
     'int BIO_should_read(BIO *b);',
     'int BIO_should_write(BIO *b);',
@@ -0,0 +1,85 @@
+INCLUDES = [
+    '#include <openssl/crypto.h>',
+    '#include <pthread.h>',
+    '#include <stdlib.h>',
+]
+
+CUSTOMIZATIONS = [
+    # OpenSSL before 1.1.0 requires locking and thread id callbacks to be
+    # used from multiple threads. These are implemented in C so that OpenSSL
+    # never needs to acquire the GIL that cffi releases during calls.
+    '''
+    #if OPENSSL_VERSION_NUMBER < 0x10100000L
+    static pthread_mutex_t *tls_locks = NULL;
+
+    static void tls_locking_callback(int mode, int n, const char *file,
+                                     int line)
+    {
+        if (mode & CRYPTO_LOCK) {
+            pthread_mutex_lock(&tls_locks[n]);
+        } else {
+            pthread_mutex_unlock(&tls_locks[n]);
+        }
+    }
+
+    #if OPENSSL_VERSION_NUMBER >= 0x10000000L
+    static void tls_threadid_callback(CRYPTO_THREADID *id)
+    {
+        CRYPTO_THREADID_set_numeric(id, (unsigned long)pthread_self());
+    }
+    #else
+    static unsigned long tls_id_callback(void)
+    {
+        return (unsigned long)pthread_self();
+    }
+    #endif
+    #endif
+
+    static int tls_setup_threads(void)
+    {
+    #if OPENSSL_VERSION_NUMBER < 0x10100000L
+        int i;
+        int count;
+        if (CRYPTO_get_locking_callback() != NULL) {
+            return 1;
+        }
+        count = CRYPTO_num_locks();
+        tls_locks = malloc(count * sizeof(pthread_mutex_t));
+        if (tls_locks == NULL) {
+            return 0;
+        }
+        for (i = 0; i < count; i++) {
+            pthread_mutex_init(&tls_locks[i], NULL);
+        }
+    #if OPENSSL_VERSION_NUMBER >= 0x10000000L
+        CRYPTO_THREADID_set_callback(tls_threadid_callback);
+    #else
+        CRYPTO_set_id_callback(tls_id_callback);
+    #endif
+        CRYPTO_set_locking_callback(tls_locking_callback);
+    #endif
+        return 1;
+    }
+
+    static int tls_threads_locked(void)
+    {
+    #if OPENSSL_VERSION_NUMBER < 0x10100000L
+        return CRYPTO_get_locking_callback() != NULL;
+    #else
+        return 1;
+    #endif
+    }
+    ''',
+]
+
+SETUP = [
+    'tls_setup_threads',
+]
+
+FUNCTIONS = [
+    'int CRYPTO_num_locks(void);',
+    'int CRYPTO_memcmp(const void *a, const void *b, size_t len);',
+    'void OPENSSL_cleanse(void *ptr, size_t len);',
+    'int tls_setup_threads(void);',
+    'int tls_threads_locked(void);',
+]
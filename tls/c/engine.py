@@ -0,0 +1,38 @@
+INCLUDES = [
+    '#include <openssl/engine.h>',
+]
+
+SETUP = [
+    'ENGINE_load_builtin_engines',
+]
+
+TEARDOWN = [
+    'ENGINE_cleanup',
+]
+
+TYPES = [
+    'static const unsigned int ENGINE_METHOD_RSA;',
+    'static const unsigned int ENGINE_METHOD_DSA;',
+    'static const unsigned int ENGINE_METHOD_DH;',
+    'static const unsigned int ENGINE_METHOD_RAND;',
+    'static const unsigned int ENGINE_METHOD_CIPHERS;',
+    'static const unsigned int ENGINE_METHOD_DIGESTS;',
+    'static const unsigned int ENGINE_METHOD_ALL;',
+    'static const unsigned int ENGINE_METHOD_NONE;',
+]
+
+FUNCTIONS = [
+    'void ENGINE_load_builtin_engines(void);',
+    'void ENGINE_cleanup(void);',
+    'ENGINE *ENGINE_get_first(void);',
+    'ENGINE *ENGINE_get_next(ENGINE *e);',
+    'ENGINE *ENGINE_by_id(const char *id);',
+    'int ENGINE_init(ENGINE *e);',
+    'int ENGINE_finish(ENGINE *e);',
+    'int ENGINE_free(ENGINE *e);',
+    'int ENGINE_set_default(ENGINE *e, unsigned int flags);',
+    'const char *ENGINE_get_id(const ENGINE *e);',
+    'const char *ENGINE_get_name(const ENGINE *e);',
+    'int ENGINE_ctrl_cmd_string(ENGINE *e, const char *cmd_name,'
+        'const char *arg, int cmd_optional);',
+]
@@ -9,3 +9,7 @@ TEARDOWN = [
 TYPES = [
     'typedef ... ENGINE;',
 ]
+
+FUNCTIONS = [
+    'void EVP_cleanup(void);',
+]
@@ -1,5 +1,302 @@
 INCLUDES = [
+    '#include "openssl/crypto.h"',
     '#include "openssl/evp.h"',
+    '#include "openssl/sha.h"',
+    '#include <errno.h>',
+    '#include <string.h>',
+    '#include <unistd.h>',
+]
+
+CUSTOMIZATIONS = [
+    # Update several digest contexts with the same data in a single call,
+    # and loops doing so for a whole file descriptor or BIO, so the GIL is
+    # released for the duration. The loops return 1 on success, 0 if a
+    # digest failed and -1 if reading failed.
+    '''
+    static int tls_digest_update_all(EVP_MD_CTX **ctxs, size_t ctx_count,
+                                     const void *data, size_t length)
+    {
+        size_t i;
+        for (i = 0; i < ctx_count; i++) {
+            if (!EVP_DigestUpdate(ctxs[i], data, length)) {
+                return 0;
+            }
+        }
+        return 1;
+    }
+
+    static int tls_digest_fd(EVP_MD_CTX **ctxs, size_t ctx_count, int fd,
+                             unsigned char *buf, size_t size)
+    {
+        ssize_t count;
+        for (;;) {
+            count = read(fd, buf, size);
+            if (count == 0) {
+                return 1;
+            }
+            if (count < 0) {
+                if (errno == EINTR) {
+                    continue;
+                }
+                return -1;
+            }
+            if (!tls_digest_update_all(ctxs, ctx_count, buf, (size_t)count)) {
+                return 0;
+            }
+        }
+    }
+
+    static int tls_digest_bio(EVP_MD_CTX **ctxs, size_t ctx_count, BIO *bio,
+                              unsigned char *buf, int size)
+    {
+        int count;
+        for (;;) {
+            count = BIO_read(bio, buf, size);
+            if (count <= 0) {
+                if (count == 0 || BIO_should_retry(bio) || BIO_eof(bio)) {
+                    return 1;
+                }
+                return -1;
+            }
+            if (!tls_digest_update_all(ctxs, ctx_count, buf, (size_t)count)) {
+                return 0;
+            }
+        }
+    }
+    ''',
+    # Digest count messages from one buffer in a single call, reusing one
+    # context. Message i is data[offsets[i]:offsets[i + 1]] and its digest
+    # is written to out[i * slot]. Returns 1 on success, 0 if a digest
+    # failed and -1 if the offsets are not ascending within length.
+    '''
+    static int tls_digest_many(EVP_MD_CTX *ctx, const EVP_MD *md,
+                               ENGINE *impl, const unsigned char *data,
+                               size_t length, const size_t *offsets,
+                               size_t count, unsigned char *out, size_t slot)
+    {
+        size_t i;
+        for (i = 0; i < count; i++) {
+            if (offsets[i] > offsets[i + 1] || offsets[i + 1] > length) {
+                return -1;
+            }
+        }
+        for (i = 0; i < count; i++) {
+            if (!EVP_DigestInit_ex(ctx, md, impl)
+                    || !EVP_DigestUpdate(ctx, data + offsets[i],
+                                         offsets[i + 1] - offsets[i])
+                    || !EVP_DigestFinal_ex(ctx, out + i * slot, NULL)) {
+                return 0;
+            }
+        }
+        return 1;
+    }
+    ''',
+    # Wipe the state of a digest context by finalising it, keeping the
+    # algorithm's data allocated so the context can be reinitialised for the
+    # same algorithm without reallocating it. Returns 1 on success and 0 if
+    # the context was never initialised or could not be finalised.
+    '''
+    static int tls_digest_wipe(EVP_MD_CTX *ctx)
+    {
+        unsigned char md[EVP_MAX_MD_SIZE];
+        int result;
+        if (EVP_MD_CTX_md(ctx) == NULL) {
+            return 0;
+        }
+        result = EVP_DigestFinal_ex(ctx, md, NULL);
+        OPENSSL_cleanse(md, sizeof(md));
+        return result;
+    }
+    ''',
+    # Serialise and restore the state of SHA-1 and SHA-2 digest contexts
+    # using the default implementation. The state is the count of bytes
+    # hashed, as 8 big endian bytes, followed by the chaining values, big
+    # endian, and the bytes hashed that do not yet fill a block, at most 199
+    # bytes. Export returns the size written to out, or 0 if the context's
+    # state is not accessible or out is too small. Import expects a
+    # context initialised for the same digest and returns 1 on success and 0
+    # if the state is invalid.
+    '''
+    #if OPENSSL_VERSION_NUMBER >= 0x10100000L
+    #define TLS_MD_DATA(ctx) EVP_MD_CTX_md_data(ctx)
+    #else
+    #define TLS_MD_DATA(ctx) ((ctx)->md_data)
+    #endif
+
+    static void tls_put_be(unsigned char *out, unsigned long long value,
+                           size_t size)
+    {
+        while (size--) {
+            out[size] = (unsigned char)value;
+            value >>= 8;
+        }
+    }
+
+    static unsigned long long tls_get_be(const unsigned char *in, size_t size)
+    {
+        unsigned long long value = 0;
+        while (size--) {
+            value = (value << 8) | *in++;
+        }
+        return value;
+    }
+
+    static size_t tls_digest_export(EVP_MD_CTX *ctx, unsigned char *out,
+                                    size_t size)
+    {
+        const EVP_MD *md = EVP_MD_CTX_md(ctx);
+        void *data = TLS_MD_DATA(ctx);
+        size_t i;
+        if (md == NULL || data == NULL || size < 72 + SHA512_CBLOCK) {
+            return 0;
+        }
+        if (md == EVP_sha1()) {
+            SHA_CTX *c = data;
+            SHA_LONG h[5];
+            h[0] = c->h0, h[1] = c->h1, h[2] = c->h2, h[3] = c->h3;
+            h[4] = c->h4;
+            tls_put_be(out, ((unsigned long long)c->Nh << 29) | (c->Nl >> 3),
+                       8);
+            for (i = 0; i < 5; i++) {
+                tls_put_be(out + 8 + 4 * i, h[i], 4);
+            }
+            memcpy(out + 28, c->data, c->num);
+            return 28 + c->num;
+        }
+        if (md == EVP_sha224() || md == EVP_sha256()) {
+            SHA256_CTX *c = data;
+            tls_put_be(out, ((unsigned long long)c->Nh << 29) | (c->Nl >> 3),
+                       8);
+            for (i = 0; i < 8; i++) {
+                tls_put_be(out + 8 + 4 * i, c->h[i], 4);
+            }
+            memcpy(out + 40, c->data, c->num);
+            return 40 + c->num;
+        }
+        if (md == EVP_sha384() || md == EVP_sha512()) {
+            SHA512_CTX *c = data;
+            tls_put_be(out, (c->Nh << 61) | (c->Nl >> 3), 8);
+            for (i = 0; i < 8; i++) {
+                tls_put_be(out + 8 + 8 * i, c->h[i], 8);
+            }
+            memcpy(out + 72, c->u.p, c->num);
+            return 72 + c->num;
+        }
+        return 0;
+    }
+
+    static int tls_digest_import(EVP_MD_CTX *ctx, const unsigned char *in,
+                                 size_t size)
+    {
+        const EVP_MD *md = EVP_MD_CTX_md(ctx);
+        void *data = TLS_MD_DATA(ctx);
+        unsigned long long count;
+        size_t num;
+        size_t i;
+        if (md == NULL || data == NULL || size < 8) {
+            return 0;
+        }
+        count = tls_get_be(in, 8);
+        if (md == EVP_sha1()) {
+            SHA_CTX *c = data;
+            num = count % SHA_CBLOCK;
+            if (size != 28 + num) {
+                return 0;
+            }
+            c->h0 = (SHA_LONG)tls_get_be(in + 8, 4);
+            c->h1 = (SHA_LONG)tls_get_be(in + 12, 4);
+            c->h2 = (SHA_LONG)tls_get_be(in + 16, 4);
+            c->h3 = (SHA_LONG)tls_get_be(in + 20, 4);
+            c->h4 = (SHA_LONG)tls_get_be(in + 24, 4);
+            c->Nl = (SHA_LONG)(count << 3);
+            c->Nh = (SHA_LONG)(count >> 29);
+            memcpy(c->data, in + 28, num);
+            c->num = (unsigned int)num;
+            return 1;
+        }
+        if (md == EVP_sha224() || md == EVP_sha256()) {
+            SHA256_CTX *c = data;
+            num = count % SHA256_CBLOCK;
+            if (size != 40 + num) {
+                return 0;
+            }
+            for (i = 0; i < 8; i++) {
+                c->h[i] = (SHA_LONG)tls_get_be(in + 8 + 4 * i, 4);
+            }
+            c->Nl = (SHA_LONG)(count << 3);
+            c->Nh = (SHA_LONG)(count >> 29);
+            memcpy(c->data, in + 40, num);
+            c->num = (unsigned int)num;
+            return 1;
+        }
+        if (md == EVP_sha384() || md == EVP_sha512()) {
+            SHA512_CTX *c = data;
+            num = count % SHA512_CBLOCK;
+            if (size != 72 + num) {
+                return 0;
+            }
+            for (i = 0; i < 8; i++) {
+                c->h[i] = tls_get_be(in + 8 + 8 * i, 8);
+            }
+            c->Nl = count << 3;
+            c->Nh = count >> 61;
+            memcpy(c->u.p, in + 72, num);
+            c->num = (unsigned int)num;
+            return 1;
+        }
+        return 0;
+    }
+    ''',
+    # Tree hashing as specified by RFC 6962 section 2.1. Leaves are hashed
+    # with a 0x00 prefix and interior nodes with a 0x01 prefix.
+    '''
+    static const unsigned char tls_tree_leaf = 0x00;
+    static const unsigned char tls_tree_node = 0x01;
+
+    static int tls_digest_leaves(EVP_MD_CTX *ctx, const EVP_MD *md,
+                                 ENGINE *impl, const unsigned char *data,
+                                 size_t length, size_t leaf_size,
+                                 unsigned char *out, size_t slot)
+    {
+        size_t offset = 0;
+        size_t size;
+        do {
+            size = length - offset < leaf_size ? length - offset : leaf_size;
+            if (!EVP_DigestInit_ex(ctx, md, impl)
+                    || !EVP_DigestUpdate(ctx, &tls_tree_leaf, 1)
+                    || !EVP_DigestUpdate(ctx, data + offset, size)
+                    || !EVP_DigestFinal_ex(ctx, out, NULL)) {
+                return 0;
+            }
+            offset += size;
+            out += slot;
+        } while (offset < length);
+        return 1;
+    }
+
+    static int tls_digest_tree(EVP_MD_CTX *ctx, const EVP_MD *md,
+                               ENGINE *impl, unsigned char *nodes,
+                               size_t count, size_t slot)
+    {
+        size_t i;
+        while (count > 1) {
+            for (i = 0; i < count / 2; i++) {
+                if (!EVP_DigestInit_ex(ctx, md, impl)
+                        || !EVP_DigestUpdate(ctx, &tls_tree_node, 1)
+                        || !EVP_DigestUpdate(ctx, nodes + 2 * i * slot,
+                                             2 * slot)
+                        || !EVP_DigestFinal_ex(ctx, nodes + i * slot, NULL)) {
+                    return 0;
+                }
+            }
+            if (count % 2) {
+                memmove(nodes + i * slot, nodes + (count - 1) * slot, slot);
+            }
+            count = (count + 1) / 2;
+        }
+        return 1;
+    }
+    ''',
 ]
 
 TYPES = [
@@ -13,7 +310,6 @@ TYPES = [
 ]
 
 FUNCTIONS = [
-    'void EVP_cleanup(void);',
     'void EVP_MD_CTX_init(EVP_MD_CTX *ctx);',
     'EVP_MD_CTX *EVP_MD_CTX_create(void);',
     'int EVP_DigestInit_ex(EVP_MD_CTX *ctx, const EVP_MD *type, ENGINE *impl);',
@@ -53,4 +349,23 @@ FUNCTIONS = [
     'int EVP_MD_CTX_size(const EVP_MD_CTX *ctx);',
     'int EVP_MD_CTX_block_size(const EVP_MD_CTX *ctx);',
     'int EVP_MD_CTX_type(const EVP_MD_CTX *ctx);',
+    'int tls_digest_update_all(EVP_MD_CTX **ctxs, size_t ctx_count,'
+        'const void *data, size_t length);',
+    'int tls_digest_fd(EVP_MD_CTX **ctxs, size_t ctx_count, int fd,'
+        'unsigned char *buf, size_t size);',
+    'int tls_digest_bio(EVP_MD_CTX **ctxs, size_t ctx_count, BIO *bio,'
+        'unsigned char *buf, int size);',
+    'int tls_digest_many(EVP_MD_CTX *ctx, const EVP_MD *md, ENGINE *impl,'
+        'const unsigned char *data, size_t length, const size_t *offsets,'
+        'size_t count, unsigned char *out, size_t slot);',
+    'int tls_digest_wipe(EVP_MD_CTX *ctx);',
+    'size_t tls_digest_export(EVP_MD_CTX *ctx, unsigned char *out,'
+        'size_t size);',
+    'int tls_digest_import(EVP_MD_CTX *ctx, const unsigned char *in,'
+        'size_t size);',
+    'int tls_digest_leaves(EVP_MD_CTX *ctx, const EVP_MD *md, ENGINE *impl,'
+        'const unsigned char *data, size_t length, size_t leaf_size,'
+        'unsigned char *out, size_t slot);',
+    'int tls_digest_tree(EVP_MD_CTX *ctx, const EVP_MD *md, ENGINE *impl,'
+        'unsigned char *nodes, size_t count, size_t slot);',
 ]
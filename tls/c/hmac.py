@@ -1,5 +1,312 @@
 INCLUDES = [
+    '#include <openssl/bio.h>',
+    '#include <openssl/crypto.h>',
     '#include <openssl/hmac.h>',
+    '#include <errno.h>',
+    '#include <limits.h>',
+    '#include <string.h>',
+    '#include <unistd.h>',
+]
+
+CUSTOMIZATIONS = [
+    # Calculate or verify the HMACs of count messages from one buffer in a
+    # single call, resetting one keyed context for each message. Message i
+    # is data[offsets[i]:offsets[i + 1]]. Signing writes its HMAC to
+    # out[i * slot]. Verifying compares it with tags[i * tag_size] in
+    # constant time, setting bit i % 8 of bitmap[i / 8] if they match.
+    # Returns 1 on success, 0 if an HMAC failed and -1 if the offsets are not
+    # ascending within length or a message is longer than INT_MAX.
+    '''
+    static int tls_hmac_offsets(size_t length, const size_t *offsets,
+                                size_t count)
+    {
+        size_t i;
+        for (i = 0; i < count; i++) {
+            if (offsets[i] > offsets[i + 1] || offsets[i + 1] > length
+                    || offsets[i + 1] - offsets[i] > INT_MAX) {
+                return 0;
+            }
+        }
+        return 1;
+    }
+
+    static int tls_hmac_one(HMAC_CTX *ctx, const unsigned char *data,
+                            const size_t *offsets, size_t i,
+                            unsigned char *out, unsigned int *size)
+    {
+        return HMAC_Init_ex(ctx, NULL, 0, NULL, NULL)
+                && HMAC_Update(ctx, data + offsets[i],
+                               (int)(offsets[i + 1] - offsets[i]))
+                && HMAC_Final(ctx, out, size);
+    }
+
+    static int tls_hmac_many(HMAC_CTX *ctx, const unsigned char *data,
+                             size_t length, const size_t *offsets,
+                             size_t count, unsigned char *out, size_t slot)
+    {
+        size_t i;
+        unsigned int size;
+        if (!tls_hmac_offsets(length, offsets, count)) {
+            return -1;
+        }
+        for (i = 0; i < count; i++) {
+            if (!tls_hmac_one(ctx, data, offsets, i, out + i * slot, &size)) {
+                return 0;
+            }
+        }
+        return 1;
+    }
+
+    static int tls_hmac_verify_many(HMAC_CTX *ctx, const unsigned char *data,
+                                    size_t length, const size_t *offsets,
+                                    size_t count, const unsigned char *tags,
+                                    size_t tag_size, unsigned char *bitmap)
+    {
+        unsigned char md[EVP_MAX_MD_SIZE];
+        unsigned int size;
+        size_t i;
+        int result = 1;
+        if (!tls_hmac_offsets(length, offsets, count)) {
+            return -1;
+        }
+        memset(bitmap, 0, (count + 7) / 8);
+        for (i = 0; i < count; i++) {
+            if (!tls_hmac_one(ctx, data, offsets, i, md, &size)) {
+                result = 0;
+                break;
+            }
+            if (size >= tag_size
+                    && CRYPTO_memcmp(md, tags + i * tag_size, tag_size) == 0) {
+                bitmap[i / 8] |= (unsigned char)(1 << (i % 8));
+            }
+        }
+        OPENSSL_cleanse(md, sizeof(md));
+        return result;
+    }
+    ''',
+    # Update an HMAC with the remaining contents of a file descriptor or BIO
+    # in a single call, reusing one buffer of size bytes. Return 1 at the
+    # end of the input, 0 if the HMAC failed and -1 on a read error.
+    '''
+    static int tls_hmac_fd(HMAC_CTX *ctx, int fd, unsigned char *buf,
+                           int size)
+    {
+        ssize_t count;
+        for (;;) {
+            count = read(fd, buf, (size_t)size);
+            if (count == 0) {
+                return 1;
+            }
+            if (count < 0) {
+                if (errno == EINTR) {
+                    continue;
+                }
+                return -1;
+            }
+            if (!HMAC_Update(ctx, buf, (int)count)) {
+                return 0;
+            }
+        }
+    }
+
+    static int tls_hmac_bio(HMAC_CTX *ctx, BIO *bio, unsigned char *buf,
+                            int size)
+    {
+        int count;
+        for (;;) {
+            count = BIO_read(bio, buf, size);
+            if (count <= 0) {
+                if (count == 0 || BIO_should_retry(bio) || BIO_eof(bio)) {
+                    return 1;
+                }
+                return -1;
+            }
+            if (!HMAC_Update(ctx, buf, count)) {
+                return 0;
+            }
+        }
+    }
+    ''',
+    # A filter BIO updating an HMAC with the data read or written through
+    # it, passing the data on unchanged. The BIO owns a copy of the keyed
+    # context given to tls_bio_set_hmac() and tls_bio_get_hmac() copies its
+    # current state. A BIO_CTRL_RESET restarts the HMAC with the same key.
+    '''
+    #define TLS_BIO_TYPE_HMAC (100 | BIO_TYPE_FILTER)
+
+    #if OPENSSL_VERSION_NUMBER < 0x10100000L
+    #define TLS_BIO_DATA(b) ((HMAC_CTX *)(b)->ptr)
+    #define TLS_BIO_SET_DATA(b, data) ((b)->ptr = (data))
+    #define TLS_BIO_SET_INIT(b, value) ((b)->init = (value))
+
+    static HMAC_CTX *tls_hmac_ctx_new(void)
+    {
+        HMAC_CTX *ctx = OPENSSL_malloc(sizeof(HMAC_CTX));
+        if (ctx != NULL) {
+            HMAC_CTX_init(ctx);
+        }
+        return ctx;
+    }
+
+    static void tls_hmac_ctx_free(HMAC_CTX *ctx)
+    {
+        HMAC_CTX_cleanup(ctx);
+        OPENSSL_free(ctx);
+    }
+    #else
+    #define TLS_BIO_DATA(b) ((HMAC_CTX *)BIO_get_data(b))
+    #define TLS_BIO_SET_DATA(b, data) BIO_set_data((b), (data))
+    #define TLS_BIO_SET_INIT(b, value) BIO_set_init((b), (value))
+    #define tls_hmac_ctx_new HMAC_CTX_new
+    #define tls_hmac_ctx_free HMAC_CTX_free
+    #endif
+
+    static int tls_bio_hmac_write(BIO *b, const char *in, int inl)
+    {
+        HMAC_CTX *ctx = TLS_BIO_DATA(b);
+        BIO *next = BIO_next(b);
+        int ret;
+        if (ctx == NULL || next == NULL || in == NULL || inl <= 0) {
+            return 0;
+        }
+        ret = BIO_write(next, in, inl);
+        BIO_clear_retry_flags(b);
+        BIO_copy_next_retry(b);
+        if (ret > 0 && !HMAC_Update(ctx, (const unsigned char *)in, ret)) {
+            return -1;
+        }
+        return ret;
+    }
+
+    static int tls_bio_hmac_read(BIO *b, char *out, int outl)
+    {
+        HMAC_CTX *ctx = TLS_BIO_DATA(b);
+        BIO *next = BIO_next(b);
+        int ret;
+        if (ctx == NULL || next == NULL || out == NULL || outl <= 0) {
+            return 0;
+        }
+        ret = BIO_read(next, out, outl);
+        BIO_clear_retry_flags(b);
+        BIO_copy_next_retry(b);
+        if (ret > 0 && !HMAC_Update(ctx, (unsigned char *)out, ret)) {
+            return -1;
+        }
+        return ret;
+    }
+
+    static long tls_bio_hmac_ctrl(BIO *b, int cmd, long num, void *ptr)
+    {
+        HMAC_CTX *ctx = TLS_BIO_DATA(b);
+        BIO *next = BIO_next(b);
+        if (cmd == BIO_CTRL_RESET && ctx != NULL
+                && !HMAC_Init_ex(ctx, NULL, 0, NULL, NULL)) {
+            return 0;
+        }
+        if (next == NULL) {
+            return 0;
+        }
+        return BIO_ctrl(next, cmd, num, ptr);
+    }
+
+    static long tls_bio_hmac_callback_ctrl(BIO *b, int cmd,
+                                           bio_info_cb *fp)
+    {
+        BIO *next = BIO_next(b);
+        if (next == NULL) {
+            return 0;
+        }
+        return BIO_callback_ctrl(next, cmd, fp);
+    }
+
+    static int tls_bio_hmac_create(BIO *b)
+    {
+        TLS_BIO_SET_DATA(b, NULL);
+        TLS_BIO_SET_INIT(b, 1);
+        return 1;
+    }
+
+    static int tls_bio_hmac_destroy(BIO *b)
+    {
+        HMAC_CTX *ctx;
+        if (b == NULL) {
+            return 0;
+        }
+        ctx = TLS_BIO_DATA(b);
+        if (ctx != NULL) {
+            tls_hmac_ctx_free(ctx);
+        }
+        TLS_BIO_SET_DATA(b, NULL);
+        TLS_BIO_SET_INIT(b, 0);
+        return 1;
+    }
+
+    #if OPENSSL_VERSION_NUMBER < 0x10100000L
+    static BIO_METHOD tls_bio_hmac_method = {
+        TLS_BIO_TYPE_HMAC,
+        "HMAC",
+        tls_bio_hmac_write,
+        tls_bio_hmac_read,
+        NULL,
+        NULL,
+        tls_bio_hmac_ctrl,
+        tls_bio_hmac_create,
+        tls_bio_hmac_destroy,
+        tls_bio_hmac_callback_ctrl,
+    };
+
+    static BIO_METHOD *tls_bio_f_hmac(void)
+    {
+        return &tls_bio_hmac_method;
+    }
+    #else
+    static BIO_METHOD *tls_bio_hmac_method = NULL;
+
+    static BIO_METHOD *tls_bio_f_hmac(void)
+    {
+        BIO_METHOD *method;
+        if (tls_bio_hmac_method != NULL) {
+            return tls_bio_hmac_method;
+        }
+        method = BIO_meth_new(TLS_BIO_TYPE_HMAC, "HMAC");
+        if (method == NULL
+                || !BIO_meth_set_write(method, tls_bio_hmac_write)
+                || !BIO_meth_set_read(method, tls_bio_hmac_read)
+                || !BIO_meth_set_ctrl(method, tls_bio_hmac_ctrl)
+                || !BIO_meth_set_callback_ctrl(method,
+                                               tls_bio_hmac_callback_ctrl)
+                || !BIO_meth_set_create(method, tls_bio_hmac_create)
+                || !BIO_meth_set_destroy(method, tls_bio_hmac_destroy)) {
+            BIO_meth_free(method);
+            return NULL;
+        }
+        tls_bio_hmac_method = method;
+        return method;
+    }
+    #endif
+
+    static int tls_bio_set_hmac(BIO *b, HMAC_CTX *src)
+    {
+        HMAC_CTX *ctx = tls_hmac_ctx_new();
+        if (ctx == NULL || !HMAC_CTX_copy(ctx, src)) {
+            if (ctx != NULL) {
+                tls_hmac_ctx_free(ctx);
+            }
+            return 0;
+        }
+        if (TLS_BIO_DATA(b) != NULL) {
+            tls_hmac_ctx_free(TLS_BIO_DATA(b));
+        }
+        TLS_BIO_SET_DATA(b, ctx);
+        return 1;
+    }
+
+    static int tls_bio_get_hmac(BIO *b, HMAC_CTX *dst)
+    {
+        HMAC_CTX *ctx = TLS_BIO_DATA(b);
+        return ctx != NULL && HMAC_CTX_copy(dst, ctx);
+    }
+    ''',
 ]
 
 TYPES = [
@@ -17,5 +324,18 @@ FUNCTIONS = [
     'void HMAC_Update(HMAC_CTX *ctx, const unsigned char *data, int len);',
     'void HMAC_Final(HMAC_CTX *ctx, unsigned char *md, unsigned int *len);',
     'void HMAC_CTX_cleanup(HMAC_CTX *ctx);',
+    'int HMAC_CTX_copy(HMAC_CTX *dctx, HMAC_CTX *sctx);',
+    'int tls_hmac_many(HMAC_CTX *ctx, const unsigned char *data,'
+        'size_t length, const size_t *offsets, size_t count,'
+        'unsigned char *out, size_t slot);',
+    'int tls_hmac_verify_many(HMAC_CTX *ctx, const unsigned char *data,'
+        'size_t length, const size_t *offsets, size_t count,'
+        'const unsigned char *tags, size_t tag_size, unsigned char *bitmap);',
+    'int tls_hmac_fd(HMAC_CTX *ctx, int fd, unsigned char *buf, int size);',
+    'int tls_hmac_bio(HMAC_CTX *ctx, BIO *bio, unsigned char *buf,'
+        'int size);',
+    'BIO_METHOD *tls_bio_f_hmac(void);',
+    'int tls_bio_set_hmac(BIO *b, HMAC_CTX *src);',
+    'int tls_bio_get_hmac(BIO *b, HMAC_CTX *dst);',
     'void HMAC_cleanup(HMAC_CTX *ctx);',
 ]
@@ -0,0 +1,203 @@
+INCLUDES = [
+    '#include <openssl/crypto.h>',
+    '#include <pthread.h>',
+    '#include <stdlib.h>',
+    '#include <string.h>',
+]
+
+CUSTOMIZATIONS = [
+    # Memory accounting replaces OpenSSL's malloc, realloc and free with
+    # functions that prefix each allocation with its size and source, and
+    # count the allocations made from each source file. It is enabled by the
+    # OPENTLS_MEMORY_ACCOUNTING environment variable, and must be installed
+    # before OpenSSL makes its first allocation.
+    '''
+    #define TLS_MEM_SLOTS 256
+    #define TLS_MEM_HEADER 16
+    #define TLS_MEM_COUNTERS 4
+
+    struct tls_mem_slot {
+        const char *file;
+        size_t count;
+        size_t live;
+        size_t peak;
+        size_t total;
+    };
+
+    /* slot 0 holds the totals, slot 1 allocations of unknown source */
+    static struct tls_mem_slot tls_mem_slots[TLS_MEM_SLOTS];
+    static pthread_mutex_t tls_mem_lock = PTHREAD_MUTEX_INITIALIZER;
+    static int tls_mem_installed = 0;
+
+    static size_t tls_mem_find(const char *file)
+    {
+        size_t index;
+        size_t probe;
+        if (file == NULL) {
+            return 1;
+        }
+        index = ((size_t)file >> 3) % (TLS_MEM_SLOTS - 2);
+        for (probe = 0; probe < TLS_MEM_SLOTS - 2; probe++) {
+            struct tls_mem_slot *slot = &tls_mem_slots[2 + index];
+            if (slot->file == file) {
+                return 2 + index;
+            }
+            if (slot->file == NULL) {
+                slot->file = file;
+                return 2 + index;
+            }
+            index = (index + 1) % (TLS_MEM_SLOTS - 2);
+        }
+        return 1;
+    }
+
+    static void tls_mem_count(struct tls_mem_slot *slot, size_t size, int add)
+    {
+        if (add) {
+            slot->count++;
+            slot->total++;
+            slot->live += size;
+            if (slot->live > slot->peak) {
+                slot->peak = slot->live;
+            }
+        } else {
+            slot->count--;
+            slot->live -= size;
+        }
+    }
+
+    static void tls_mem_account(size_t *header, size_t size, int add)
+    {
+        tls_mem_count(&tls_mem_slots[0], size, add);
+        tls_mem_count(&tls_mem_slots[header[1]], size, add);
+    }
+
+    static void *tls_mem_malloc(size_t num, const char *file, int line)
+    {
+        size_t *header = malloc(TLS_MEM_HEADER + num);
+        if (header == NULL) {
+            return NULL;
+        }
+        pthread_mutex_lock(&tls_mem_lock);
+        header[0] = num;
+        header[1] = tls_mem_find(file);
+        tls_mem_account(header, num, 1);
+        pthread_mutex_unlock(&tls_mem_lock);
+        return (char *)header + TLS_MEM_HEADER;
+    }
+
+    static void *tls_mem_realloc(void *ptr, size_t num, const char *file,
+                                 int line)
+    {
+        size_t *header;
+        size_t *resized;
+        if (ptr == NULL) {
+            return tls_mem_malloc(num, file, line);
+        }
+        header = (size_t *)((char *)ptr - TLS_MEM_HEADER);
+        pthread_mutex_lock(&tls_mem_lock);
+        tls_mem_account(header, header[0], 0);
+        resized = realloc(header, TLS_MEM_HEADER + num);
+        if (resized == NULL) {
+            tls_mem_account(header, header[0], 1);
+            pthread_mutex_unlock(&tls_mem_lock);
+            return NULL;
+        }
+        resized[0] = num;
+        tls_mem_account(resized, num, 1);
+        pthread_mutex_unlock(&tls_mem_lock);
+        return (char *)resized + TLS_MEM_HEADER;
+    }
+
+    static void tls_mem_release(void *ptr)
+    {
+        size_t *header;
+        if (ptr == NULL) {
+            return;
+        }
+        header = (size_t *)((char *)ptr - TLS_MEM_HEADER);
+        pthread_mutex_lock(&tls_mem_lock);
+        tls_mem_account(header, header[0], 0);
+        pthread_mutex_unlock(&tls_mem_lock);
+        free(header);
+    }
+
+    #if OPENSSL_VERSION_NUMBER >= 0x10100000L
+    static void tls_mem_free(void *ptr, const char *file, int line)
+    {
+        tls_mem_release(ptr);
+    }
+    #endif
+
+    static int tls_mem_setup(void)
+    {
+        const char *enabled = getenv("OPENTLS_MEMORY_ACCOUNTING");
+        if (enabled == NULL || *enabled == '\\0' || strcmp(enabled, "0") == 0) {
+            return 1;
+        }
+    #if OPENSSL_VERSION_NUMBER >= 0x10100000L
+        tls_mem_installed = CRYPTO_set_mem_functions(tls_mem_malloc,
+                tls_mem_realloc, tls_mem_free);
+    #else
+        tls_mem_installed = CRYPTO_set_mem_ex_functions(tls_mem_malloc,
+                tls_mem_realloc, tls_mem_release);
+    #endif
+        return tls_mem_installed;
+    }
+
+    static int tls_mem_enabled(void)
+    {
+        return tls_mem_installed;
+    }
+
+    static int tls_mem_slot_count(void)
+    {
+        return TLS_MEM_SLOTS;
+    }
+
+    static const char *tls_mem_source(int index)
+    {
+        if (index < 2 || index >= TLS_MEM_SLOTS) {
+            return NULL;
+        }
+        return tls_mem_slots[index].file;
+    }
+
+    static void tls_mem_snapshot(size_t *counters)
+    {
+        int index;
+        pthread_mutex_lock(&tls_mem_lock);
+        for (index = 0; index < TLS_MEM_SLOTS; index++) {
+            struct tls_mem_slot *slot = &tls_mem_slots[index];
+            counters[TLS_MEM_COUNTERS * index + 0] = slot->count;
+            counters[TLS_MEM_COUNTERS * index + 1] = slot->live;
+            counters[TLS_MEM_COUNTERS * index + 2] = slot->peak;
+            counters[TLS_MEM_COUNTERS * index + 3] = slot->total;
+        }
+        pthread_mutex_unlock(&tls_mem_lock);
+    }
+
+    static void tls_mem_reset_peak(void)
+    {
+        int index;
+        pthread_mutex_lock(&tls_mem_lock);
+        for (index = 0; index < TLS_MEM_SLOTS; index++) {
+            tls_mem_slots[index].peak = tls_mem_slots[index].live;
+        }
+        pthread_mutex_unlock(&tls_mem_lock);
+    }
+    ''',
+]
+
+SETUP = [
+    'tls_mem_setup',
+]
+
+FUNCTIONS = [
+    'int tls_mem_setup(void);',
+    'int tls_mem_enabled(void);',
+    'int tls_mem_slot_count(void);',
+    'const char *tls_mem_source(int index);',
+    'void tls_mem_snapshot(size_t *counters);',
+    'void tls_mem_reset_peak(void);',
+]
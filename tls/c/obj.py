@@ -1,5 +1,59 @@
 INCLUDES = [
     '#include <openssl/objects.h>',
+    # The entries written by tls_obj_names(). Defined with the includes
+    # because TYPES declares the struct to every group of bindings.
+    '''
+    struct tls_obj_name {
+        const char *name;
+        const char *target;
+        int nid;
+    };''',
+]
+
+CUSTOMIZATIONS = [
+    # List the names of an OBJ_NAME type in a single call, without a Python
+    # callback for each name. The NID of each name is looked up by short
+    # then long name, and the target of each alias is its data. Returns the
+    # number of names, of which at most size are written to out.
+    '''
+    struct tls_obj_names {
+        struct tls_obj_name *out;
+        size_t size;
+        size_t count;
+    };
+
+    static void tls_obj_name_add(const OBJ_NAME *obj, void *arg)
+    {
+        struct tls_obj_names *names = arg;
+        struct tls_obj_name *entry;
+        if (names->count < names->size) {
+            entry = &names->out[names->count];
+            entry->name = obj->name;
+            if (obj->alias) {
+                entry->target = obj->data;
+                entry->nid = NID_undef;
+            } else {
+                entry->target = NULL;
+                entry->nid = OBJ_sn2nid(obj->name);
+                if (entry->nid == NID_undef) {
+                    entry->nid = OBJ_ln2nid(obj->name);
+                }
+            }
+        }
+        names->count++;
+    }
+
+    static size_t tls_obj_names(int type, struct tls_obj_name *out,
+                                size_t size)
+    {
+        struct tls_obj_names names;
+        names.out = out;
+        names.size = size;
+        names.count = 0;
+        OBJ_NAME_do_all(type, tls_obj_name_add, &names);
+        return names.count;
+    }
+    ''',
 ]
 
 TYPES = [
@@ -11,6 +65,7 @@ TYPES = [
     'static const int OBJ_NAME_TYPE_NUM;',
     'struct obj_name_st { int type; int alias; const char *name; const char *data; ...; };',
     'typedef struct obj_name_st OBJ_NAME;',
+    'struct tls_obj_name { const char *name; const char *target; int nid; };',
 ]
 
 FUNCTIONS = [
@@ -30,4 +85,5 @@ FUNCTIONS = [
     'int OBJ_NAME_init(void);',
     'void OBJ_NAME_do_all(int type,void (*fn)(const OBJ_NAME *,void *arg), void *arg);',
     'void OBJ_NAME_do_all_sorted(int type,void (*fn)(const OBJ_NAME *,void *arg), void *arg);',
+    'size_t tls_obj_names(int type, struct tls_obj_name *out, size_t size);',
 ]
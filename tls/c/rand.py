@@ -15,4 +15,5 @@ FUNCTIONS = [
     'void RAND_cleanup(void);',
     'int RAND_bytes(unsigned char *buf, int num);',
     'int RAND_pseudo_bytes(unsigned char *buf, int num);',
+    'int RAND_set_rand_engine(ENGINE *engine);',
 ]
@@ -3,6 +3,7 @@ INCLUDES = [
 ]
 
 TYPES = [
+    'static const long OPENSSL_VERSION_NUMBER;',
     'static const int SSLEAY_VERSION;',
     'static const int SSLEAY_CFLAGS;',
     'static const int SSLEAY_BUILT_ON;',
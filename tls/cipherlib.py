@@ -15,6 +15,10 @@ Cipher objects have these methods:
                              initialised again for further use.
  - ciphertext():             Retrieve the encrypted cipher text.
  - plaintext():              Retrieve the decrypted plain text.
+ - update_into(data, out):   Like update() for a direct cipher, writing the
+                             output to the buffer out.
+ - finish_into(out):         Like finish() for a direct cipher, writing the
+                             remaining output to the buffer out.
 
 For example, to encrypt 'Nobody expects the spanish inquisition' using 128 bit
 AES in CBC mode. The key used will be b'montypythonfunny' and the ivector will
@@ -34,12 +38,12 @@ be changed by passing a different digest name as digest to the construction.
 The HMAC can be disabled by passing None.
 """
 from __future__ import absolute_import, division, print_function
-import numbers
 import weakref
 
+from tls import engine as _engine
 from tls import err, hmac
+from tls import registry as _registry
 from tls.c import api
-from tls.util import all_obj_type_names as __available_algorithms
 
 __all__ = [
     'algorithms_available',
@@ -55,7 +59,7 @@ __all__ = [
 
 # there are no guarantees with openssl
 algorithms_guaranteed = set()
-algorithms_available = __available_algorithms(api.OBJ_NAME_TYPE_CIPHER_METH)
+algorithms_available = _registry.ciphers
 
 
 # cipher modes
@@ -76,19 +80,37 @@ class Cipher(object):
     The default cipher object will be authenticated used a SHA1 HMAC. The
     message digest used for the HMAC may be changed by passing a valid digest
     name as the digest paramter. To disable the HMAC, pass None instead.
+
+    The cipher and HMAC are implemented by engine, a tls.engine.Engine or
+    engine id, if provided.
+
+    By default data is passed through a chain of cipher, buffer and memory
+    BIOs, and retrieved by ciphertext() or plaintext(). If direct is True the
+    cipher context is used directly instead: update() and finish() return
+    the output as soon as it is available, without copying it through the
+    BIOs. The output is the same in both modes. When decrypting directly,
+    the last digest_size bytes of plaintext are held back until finish(),
+    which verifies the HMAC. Plaintext returned before then is not yet
+    authenticated. update_into() and finish_into() write the output of a
+    direct cipher to a buffer provided by the caller instead.
     """
 
-    def __init__(self, encrypt=True, algorithm=b'AES-128-CBC', digest=b'SHA1'):
+    def __init__(self, encrypt=True, algorithm=b'AES-128-CBC', digest=b'SHA1',
+            engine=None, direct=False):
         self._algorithm = algorithm
         self._digest = digest
+        self._engine = _engine.resolve(engine)
         # initialise attributes to empty
         self._encrypting = bool(encrypt)
         self._initialised = False
+        self._direct = bool(direct)
         self._bio = api.NULL
         self._cipher = api.NULL
         self._ctx = api.NULL
         self._sink = api.NULL
         self._hmac = None
+        self._held = b''
+        self._output = None
         self._weakrefs = []
         # create cipher object from cipher name
         cipher = api.EVP_get_cipherbyname(algorithm)
@@ -96,20 +118,29 @@ class Cipher(object):
             msg = "Unknown cipher name '{0}'".format(algorithm)
             raise ValueError(msg)
         self._cipher = cipher
-        # allocate cipher context pointer
-        self._ctxptr = api.new('EVP_CIPHER_CTX*[]', 1)
-        # create bio chain (cipher, buffer, mem)
-        self._sink = api.BIO_new(api.BIO_s_mem())
-        bio = api.BIO_push(api.BIO_new(api.BIO_f_buffer()), self._sink)
-        bio = api.BIO_push(api.BIO_new(api.BIO_f_cipher()), bio)
-        cleanup = lambda _: api.BIO_free_all(bio)
-        self._weakrefs.append(weakref.ref(self, cleanup))
-        self._bio = bio
+        if self._direct:
+            # allocate a cipher context of our own
+            ctx = api.new('EVP_CIPHER_CTX*')
+            api.EVP_CIPHER_CTX_init(ctx)
+            cleanup = lambda _: api.EVP_CIPHER_CTX_cleanup(ctx)
+            self._weakrefs.append(weakref.ref(self, cleanup))
+            self._ctx = ctx
+        else:
+            # allocate cipher context pointer
+            self._ctxptr = api.new('EVP_CIPHER_CTX*[]', 1)
+            # create bio chain (cipher, buffer, mem)
+            self._sink = api.BIO_new(api.BIO_s_mem())
+            bio = api.BIO_push(api.BIO_new(api.BIO_f_buffer()), self._sink)
+            bio = api.BIO_push(api.BIO_new(api.BIO_f_cipher()), bio)
+            cleanup = lambda _: api.BIO_free_all(bio)
+            self._weakrefs.append(weakref.ref(self, cleanup))
+            self._bio = bio
+            api.BIO_get_cipher_ctx(bio, self._ctxptr)
+            self._ctx = self._ctxptr[0]
         # initialise cipher context
-        api.BIO_get_cipher_ctx(bio, self._ctxptr)
-        self._ctx = self._ctxptr[0]
-        if not api.EVP_CipherInit_ex(self._ctx,
-                cipher, api.NULL, api.NULL, api.NULL, 1 if encrypt else 0):
+        if not api.EVP_CipherInit_ex(self._ctx, cipher,
+                _engine.handle(self._engine), api.NULL, api.NULL,
+                1 if encrypt else 0):
             raise ValueError("Unable to initialise cipher")
 
     @property
@@ -156,6 +187,10 @@ class Cipher(object):
             messages = err.log_errors(level=None)
             raise ValueError(messages[0])
 
+    @property
+    def direct(self):
+        return self._direct
+
     @property
     def decrypting(self):
         return not self._encrypting
@@ -204,19 +239,24 @@ class Cipher(object):
                 api.NULL, api.NULL, c_key, c_iv, -1):
             raise ValueError("Unable to initialise cipher")
         if self.digest is not None:
-            self._hmac = hmac.HMAC(key, digestmod=self.digest)
+            self._hmac = hmac.HMAC(key, digestmod=self.digest,
+                    engine=self._engine)
+        self._held = b''
         self._initialised = True
 
     def update(self, data):
         """Add data to the cipher for encryption or decryption.
 
         The data may not be immediately available until a complete block has
-        been written or the cipher object is closed by calling finish().
+        been written or the cipher object is closed by calling finish(). In
+        direct mode the output available is returned.
         """
         if self._ctx == api.NULL:
             raise ValueError("Cipher object failed to be initialised")
         if not self.is_initialised:
             raise ValueError("Must call initialise() before update()")
+        if self._direct:
+            return self._update_direct(data)
         c_data = api.new('char[]', data)
         written = api.BIO_write(self._bio, c_data, len(data))
         if written <= 0 and not api.BIO_should_retry(self._bio):
@@ -233,11 +273,16 @@ class Cipher(object):
 
         No more data may be encrypted or decrypted by this cipher object. The
         cipher may however be reused by calling initialise() again.
+
+        In direct mode the remaining output is returned, and when decrypting
+        the HMAC is verified, raising ValueError if invalid.
         """
         if self._ctx == api.NULL:
             raise ValueError("Cipher object failed to be initialised")
         if not self.is_initialised:
             raise ValueError("Must call initialise() before finish()")
+        if self._direct:
+            return self._finish_direct()
         if self.encrypting and self._hmac is not None:
             digest = self._hmac.digest()
             self._hmac = None
@@ -251,10 +296,12 @@ class Cipher(object):
         Cipher text may not be available until a complete block of data has
         been encrypted or finish() has been called.
         """
-        if self._bio == api.NULL:
+        if self._bio == api.NULL and not self._direct:
             raise ValueError("Cipher object failed to be initialised")
         if not self.encrypting:
             raise ValueError("Cipher does not encyrpt")
+        if self._direct:
+            return b''
         size = api.BIO_pending(self._sink)
         c_data = api.new('unsigned char[]', size)
         read = api.BIO_read(self._sink, c_data, size)
@@ -268,10 +315,12 @@ class Cipher(object):
         decrypted or finish() has been called. If finish() has been called the
         HMAC will be verified (if required) when plaintext() is called.
         """
-        if self._bio == api.NULL:
+        if self._bio == api.NULL and not self._direct:
             raise ValueError("Cipher object failed to be initialised")
         if not self.decrypting:
             raise ValueError("Cipher does not decrypt")
+        if self._direct:
+            return b''
         size = api.BIO_pending(self._sink)
         c_data = api.new('unsigned char[]', size)
         if size > 0:
@@ -287,14 +336,151 @@ class Cipher(object):
             digest = bytes(api.buffer(c_data + data_len, hmac_len))
             self._hmac.update(data)
             auth = self._hmac.digest()
-            valid = 0 if api.BIO_get_cipher_status(self._bio) else 1
-            for x, y in zip(auth, digest):
-                if not isinstance(x, numbers.Integral):
-                    x = ord(x)
-                if not isinstance(y, numbers.Integral):
-                    y = ord(y)
-                valid |= x ^ y
-            if valid != 0:
+            valid = hmac.compare_digest(auth, digest)
+            if not api.BIO_get_cipher_status(self._bio) or not valid:
                 raise ValueError("Invalid decrypt")
             self._hmac = None
             return data
+
+    def update_into(self, data, out):
+        """Add data to a direct cipher, writing the output available to out.
+
+        data and out may be any objects supporting the buffer protocol with
+        contiguous memory, out being writable, and are passed to OpenSSL
+        without being copied. Returns the number of bytes written to out.
+        out needs room for len(data) plus block_size bytes, or len(data) if
+        the block size is one. For stream modes, such as CTR, CFB and OFB,
+        out may be data itself to encrypt or decrypt in place.
+        """
+        if self._ctx == api.NULL:
+            raise ValueError("Cipher object failed to be initialised")
+        if not self._direct:
+            raise ValueError("update_into() requires a direct cipher")
+        if not self.is_initialised:
+            raise ValueError("Must call initialise() before update_into()")
+        c_data = api.from_buffer(data)
+        c_out = self._writable(out)
+        block_size = self.block_size
+        if (api.cast('unsigned char*', c_out)
+                == api.cast('unsigned char*', c_data) and block_size != 1):
+            raise ValueError("In place updates require a stream mode")
+        needed = len(c_data) + (block_size if block_size != 1 else 0)
+        if len(c_out) < needed:
+            msg = "Output buffer must be at least {0} bytes. Received {1}"
+            raise ValueError(msg.format(needed, len(c_out)))
+        return self._update_into(data, c_data,
+                api.cast('unsigned char*', c_out))
+
+    def finish_into(self, out):
+        """Complete a direct cipher, writing the remaining output to out.
+
+        out needs room for digest_size plus twice block_size bytes. Returns
+        the number of bytes written to out. When decrypting the HMAC is
+        verified, raising ValueError if invalid.
+        """
+        if self._ctx == api.NULL:
+            raise ValueError("Cipher object failed to be initialised")
+        if not self._direct:
+            raise ValueError("finish_into() requires a direct cipher")
+        if not self.is_initialised:
+            raise ValueError("Must call initialise() before finish_into()")
+        c_out = self._writable(out)
+        needed = self.digest_size + 2 * self.block_size
+        if len(c_out) < needed:
+            msg = "Output buffer must be at least {0} bytes. Received {1}"
+            raise ValueError(msg.format(needed, len(c_out)))
+        return self._finish_into(api.cast('unsigned char*', c_out))
+
+    def _writable(self, out):
+        "Return a cdata buffer for out, raising TypeError if read only"
+        if memoryview(out).readonly:
+            raise TypeError("Output buffer must be writable")
+        return api.from_buffer(out)
+
+    def _buffer(self, size):
+        "Return an output buffer of at least size bytes, reused between calls"
+        if self._output is None or len(self._output) < size:
+            self._output = api.new('unsigned char[]', size)
+        return self._output
+
+    def _update_direct(self, data):
+        "Pass data to the cipher context, returning the output available"
+        c_data = api.from_buffer(data)
+        output = self._buffer(len(c_data) + self.block_size)
+        size = self._update_into(data, c_data, output)
+        return bytes(api.buffer(output, size))
+
+    def _finish_direct(self):
+        "Complete the cipher context, returning the remaining output"
+        output = self._buffer(self.digest_size + 2 * self.block_size)
+        size = self._finish_into(output)
+        return bytes(api.buffer(output, size))
+
+    def _update_into(self, data, c_data, c_out):
+        "Pass data to the cipher context, returning the bytes written"
+        # authenticate the plaintext before it may be overwritten in place
+        if self.encrypting and self._hmac is not None:
+            self._hmac.update(data)
+        size = api.new('int*')
+        if not api.EVP_CipherUpdate(self._ctx, c_out, size,
+                api.cast('unsigned char*', c_data), len(c_data)):
+            if self.encrypting:
+                msg = 'Unable to encrypt data'
+            else:
+                msg = 'Unable to decrypt data'
+            raise IOError(msg)
+        return self._release(c_out, size[0])
+
+    def _finish_into(self, c_out):
+        "Complete the cipher context, returning the bytes written"
+        written = 0
+        if self.encrypting and self._hmac is not None:
+            digest = self._hmac.digest()
+            self._hmac = None
+            written = self._update_into(digest, api.from_buffer(digest),
+                    c_out)
+        size = api.new('int*')
+        valid = api.EVP_CipherFinal_ex(self._ctx, c_out + written, size)
+        self._initialised = False
+        if self.encrypting:
+            if not valid:
+                raise IOError('Unable to encrypt data')
+            return written + size[0]
+        if not valid:
+            self._hmac = None
+            self._held = b''
+            raise ValueError("Invalid decrypt")
+        if self._hmac is None:
+            return size[0]
+        written = self._release(c_out, size[0])
+        digest, self._held = self._held, b''
+        auth = self._hmac.digest()
+        self._hmac = None
+        if (len(digest) != len(auth)
+                or not hmac.compare_digest(auth, digest)):
+            raise ValueError("Invalid decrypt")
+        return written
+
+    def _release(self, c_out, size):
+        """Return the bytes of output that may be released, holding back the
+        plaintext that may be the HMAC when decrypting.
+
+        The plaintext held back by the previous call is moved to the start of
+        c_out, followed by the plaintext released from this call, and the last
+        digest_size bytes are held back in its place.
+        """
+        if self.encrypting or self._hmac is None:
+            return size
+        held = self._held
+        total = len(held) + size
+        release = max(0, total - self._hmac.digest_size)
+        if release >= len(held):
+            self._held = bytes(api.buffer(c_out + release - len(held),
+                    total - release))
+            api.ffi.memmove(c_out + len(held), c_out, release - len(held))
+            api.buffer(c_out, len(held))[:] = held
+        else:
+            self._held = held[release:] + bytes(api.buffer(c_out, size))
+            api.buffer(c_out, release)[:] = held[:release]
+        self._hmac.update(api.buffer(c_out, release))
+        return release
@@ -0,0 +1,123 @@
+"""OpenSSL ENGINE selection for alternative implementations of primitives.
+
+Engines provide alternative implementations of OpenSSL's digests, ciphers and
+random number generators, such as the rdrand engine using Intel's RDRAND
+instruction or dynamic engines loaded from a shared library. The engines
+built in to OpenSSL are listed by engines_available().
+
+An Engine may be passed to hashlib.new(), hmac.new(), cipherlib.Cipher() and
+random.Random() to use its implementation for that object only, or installed
+as the process wide default for some methods with set_default():
+
+    >>> from tls import engine, random
+    >>> rdrand = engine.Engine(b'rdrand')
+    >>> rdrand.set_default(engine.ENGINE_METHOD_RAND)
+    >>> rng = random.Random(engine=b'rdrand')
+
+The engine argument of these functions may also be an engine id, which is
+passed to Engine().
+"""
+from __future__ import absolute_import, division, print_function
+import weakref
+
+from tls.c import api
+
+__all__ = [
+    'Engine',
+    'EngineError',
+    'engines_available',
+    'handle',
+    'resolve',
+    'ENGINE_METHOD_ALL',
+    'ENGINE_METHOD_CIPHERS',
+    'ENGINE_METHOD_DIGESTS',
+    'ENGINE_METHOD_NONE',
+    'ENGINE_METHOD_RAND',
+]
+
+# engine methods
+ENGINE_METHOD_ALL = api.ENGINE_METHOD_ALL
+ENGINE_METHOD_CIPHERS = api.ENGINE_METHOD_CIPHERS
+ENGINE_METHOD_DIGESTS = api.ENGINE_METHOD_DIGESTS
+ENGINE_METHOD_NONE = api.ENGINE_METHOD_NONE
+ENGINE_METHOD_RAND = api.ENGINE_METHOD_RAND
+
+
+class EngineError(EnvironmentError):
+    "An error occurred loading or using an engine"
+
+
+class Engine(object):
+    """A functional reference to an OpenSSL engine.
+
+    The engine is initialised when created and finished when the Engine
+    object is garbage collected. Objects using the engine keep a reference to
+    the Engine, so it is not finished while still in use.
+    """
+
+    def __init__(self, engine_id):
+        engine = api.ENGINE_by_id(engine_id)
+        if engine == api.NULL:
+            msg = "Unknown engine '{0}'".format(engine_id)
+            raise EngineError(msg)
+        if not api.ENGINE_init(engine):
+            api.ENGINE_free(engine)
+            msg = "Unable to initialise engine '{0}'".format(engine_id)
+            raise EngineError(msg)
+        def cleanup(_):
+            api.ENGINE_finish(engine)
+            api.ENGINE_free(engine)
+        self.handle = engine
+        self._weakref = weakref.ref(self, cleanup)
+
+    @property
+    def id(self):
+        return api.string(api.ENGINE_get_id(self.handle))
+
+    @property
+    def name(self):
+        return api.string(api.ENGINE_get_name(self.handle))
+
+    def command(self, name, value=None, optional=False):
+        """Send a control command to the engine.
+
+        Dynamic engines are configured using commands, such as SO_PATH and
+        LOAD. Unsupported commands are ignored when optional is True.
+        """
+        value = api.NULL if value is None else value
+        if not api.ENGINE_ctrl_cmd_string(self.handle, name, value,
+                1 if optional else 0):
+            msg = "Engine command '{0}' failed".format(name)
+            raise EngineError(msg)
+
+    def set_default(self, methods=ENGINE_METHOD_ALL):
+        """Use this engine by default for methods.
+
+        The methods argument is a bitwise or of ENGINE_METHOD constants. This
+        affects every object in the process that was not given an engine.
+        """
+        if not api.ENGINE_set_default(self.handle, methods):
+            msg = "Unable to set engine '{0}' as default".format(self.id)
+            raise EngineError(msg)
+
+
+def engines_available():
+    "Return the set of ids of the engines available to OpenSSL"
+    names = set()
+    engine = api.ENGINE_get_first()
+    while engine != api.NULL:
+        names.add(api.string(api.ENGINE_get_id(engine)))
+        engine = api.ENGINE_get_next(engine)
+    return names
+
+
+def resolve(engine):
+    "Return an Engine for an Engine, an engine id or None"
+    if engine is None or isinstance(engine, Engine):
+        return engine
+    return Engine(engine)
+
+
+def handle(engine):
+    "Return the ENGINE pointer of an Engine, or NULL for None"
+    return api.NULL if engine is None else engine.handle
@@ -0,0 +1,638 @@
+"""hashlib - hashlib module - A common interface to many hash functions.
+
+new(name, data=b'') - returns a new hash object implementing the
+                      given hash function; initializing the hash
+                      using the given binary data.
+
+file_digest(fileobj, name) - returns a new hash object implementing the
+                      given hash function, updated with the contents of a
+                      file.
+
+hash_many(name, messages) - returns the digests of many messages using the
+                      given hash function.
+
+import_state(state) - returns a new hash object resuming from a state
+                      returned by the export_state() method.
+
+MultiDigest(names, data=b'') - returns a new object calculating several
+                      hash functions of the same data in a single pass.
+
+TreeHash(name, data=b'') - returns a new tree hash object, hashing large
+                      inputs on many threads.
+
+Named constructor functions are also available, these are faster
+than using new(name):
+
+md5(), sha1(), sha224(), sha256(), sha384(), and sha512()
+
+More algorithms may be available on your platform but the above are guaranteed
+to exist.  See the algorithms_guaranteed and algorithms_available attributes
+to find out what algorithm names can be passed to new().
+
+NOTE: If you want the adler32 or crc32 hash functions they are available in
+the zlib module.
+
+Choose your hash function wisely.  Some have known collision weaknesses.
+sha384 and sha512 will be slow on 32 bit platforms.
+
+Hash objects have these methods:
+ - update(arg): Update the hash object with the bytes in arg, which may be
+                any contiguous buffer. Repeated calls are equivalent to a
+                single call with the concatenation of all the arguments.
+ - digest():    Return the digest of the bytes passed to the update() method
+                so far.
+ - hexdigest(): Like digest() except the digest is returned as a unicode
+                object of double length, containing only hexadecimal digits.
+ - digest_into(buffer): Like digest() except the digest is written into a
+                writable buffer, returning the number of bytes written.
+ - copy():      Return a copy (clone) of the hash object. This can be used to
+                efficiently compute the digests of strings that share a common
+                initial substring.
+ - export_state(): Return the state of a SHA-1 or SHA-2 hash object as bytes,
+                which import_state() resumes in this or another process.
+
+For example, to obtain the digest of the string 'Nobody inspects the
+spammish repetition':
+
+    >>> import hashlib
+    >>> m = hashlib.md5()
+    >>> m.update(b"Nobody inspects")
+    >>> m.update(b" the spammish repetition")
+    >>> m.digest()
+    b'\xbbd\x9c\x83\xdd\x1e\xa5\xc9\xd9\xde\xc9\xa1\x8d\xf0\xff\xe9'
+
+More condensed:
+
+    >>> hashlib.sha224(b"Nobody inspects the spammish repetition").hexdigest()
+    'a4337bc45a8fc544c03f52dc550cd6e1e87021bc896588bd79e901e2
+"""
+from __future__ import absolute_import, division, print_function
+from collections import namedtuple
+import binascii
+import functools
+import multiprocessing.pool
+import numbers
+import os
+import struct
+import threading
+import weakref
+
+from tls import engine as _engine
+from tls import registry as _registry
+from tls.c import api
+from tls.util import pack_messages
+
+__all__ = ['algorithms_available', 'algorithms_guaranteed', 'descriptor',
+           'file_digest', 'hash_many', 'import_state', 'new', 'MultiDigest',
+           'TreeHash']
+
+# size of the buffer used by file_digest()
+BUFSIZE = 1024 * 1024
+
+# default size of the leaves of a TreeHash, and the leaves hashed per task
+LEAF_SIZE = 1024 * 1024
+LEAVES_PER_TASK = 8
+
+# digest contexts retained for reuse by each message digest algorithm
+CONTEXT_POOL_SIZE = 64
+
+# version of the format written by MessageDigest.export_state(), followed by
+# the NID of the algorithm
+STATE_VERSION = 1
+_STATE_HEADER = struct.Struct('>BH')
+_STATE_SIZE = 256
+
+
+# there are no guarantees with openssl
+algorithms_guaranteed = set()
+algorithms_available = _registry.digests
+
+
+class DigestError(ValueError):
+    "Error occred when creating message digest"
+
+
+Descriptor = namedtuple('Descriptor', 'md name nid digest_size block_size')
+
+_descriptors = {}
+
+
+def descriptor(name):
+    """Return the Descriptor of the named message digest algorithm.
+
+    Descriptors hold the algorithm's EVP_MD, canonical name, NID, digest
+    size and block size. They are looked up once and cached by name for the
+    life of the process.
+    """
+    try:
+        return _descriptors[name]
+    except KeyError:
+        pass
+    md = api.EVP_get_digestbyname(name)
+    if md == api.NULL:
+        msg = "Unknown message digest '{0}'".format(name)
+        raise DigestError(msg)
+    nid = api.EVP_MD_type(md)
+    short_name = api.OBJ_nid2sn(nid)
+    if short_name == api.NULL:
+        raise DigestError('Failed to get digest name')
+    desc = Descriptor(md, api.string(short_name), nid, api.EVP_MD_size(md),
+            api.EVP_MD_block_size(md))
+    _descriptors[name] = desc
+    return desc
+
+
+_context_pools = {}
+
+
+class _ContextRef(weakref.ref):
+    "Weak reference to a hash object releasing one of its digest contexts"
+
+    __slots__ = ('context', 'pool')
+
+    def __new__(cls, owner, context, pool):
+        return weakref.ref.__new__(cls, owner, _release_context)
+
+    def __init__(self, owner, context, pool):
+        super(_ContextRef, self).__init__(owner, _release_context)
+        self.context = context
+        self.pool = pool
+
+
+def _acquire_context(owner, md, engine):
+    """Return a digest context for md and a weak reference to owner that
+    releases the context when owner is garbage collected.
+
+    Contexts for the default implementation of md are taken from its free
+    list when possible. Contexts for an engine are always new.
+    """
+    if engine is not None:
+        context = api.new('EVP_MD_CTX*')
+        return context, _ContextRef(owner, context, None)
+    pool = _context_pools.get(md)
+    if pool is None:
+        pool = _context_pools.setdefault(md, [])
+    try:
+        context = pool.pop()
+    except IndexError:
+        context = api.new('EVP_MD_CTX*')
+    return context, _ContextRef(owner, context, pool)
+
+
+def _release_context(ref):
+    """Wipe a context and return it to its free list, or clean it up if the
+    free list is full. The bound is checked without a lock, so concurrent
+    releases may briefly exceed it by a few contexts."""
+    pool = ref.pool
+    if (pool is not None and len(pool) < CONTEXT_POOL_SIZE
+            and api.tls_digest_wipe(ref.context)):
+        pool.append(ref.context)
+    else:
+        api.EVP_MD_CTX_cleanup(ref.context)
+
+
+class MessageDigest(object):
+    """A hash represents the object used to calculate a checksum of a string
+    of information.
+
+    Hash objects have no instance dictionary. Their digest contexts are
+    taken from and returned to a bounded free list for each algorithm,
+    holding at most CONTEXT_POOL_SIZE wiped contexts.
+    """
+
+    __slots__ = ('_context', '_descriptor', '_engine', '_scratch',
+                 '_scratch_weakref', '_weakref', '__weakref__')
+
+    def __init__(self, descriptor, data=None, engine=None):
+        context, ref = _acquire_context(self, descriptor.md, engine)
+        self._context = context
+        self._descriptor = descriptor
+        self._engine = engine
+        self._scratch = None
+        if api.EVP_DigestInit_ex(context, descriptor.md,
+                _engine.handle(engine)):
+            self._weakref = ref
+        else:
+            ref.pool = None
+            raise DigestError('Failed to initialise message digest')
+        if data:
+            self.update(data)
+
+    @property
+    def _md(self):
+        return self._descriptor.md
+
+    @property
+    def name(self):
+        return self._descriptor.name
+
+    @property
+    def digest_size(self):
+        return self._descriptor.digest_size
+
+    @property
+    def block_size(self):
+        return self._descriptor.block_size
+
+    def update(self, data):
+        """Update this hash object's state with the provided data.
+
+        The data may be bytes or any object supporting the buffer protocol
+        with contiguous memory, such as bytearray, memoryview, mmap or array,
+        and is passed to OpenSSL without being copied.
+        """
+        buff = api.from_buffer(data)
+        if not api.EVP_DigestUpdate(self._context, buff, len(buff)):
+            raise DigestError('Error updating message digest')
+
+    def digest(self):
+        "Return the digest value as a string of binary data."
+        size = self._digest()
+        return bytes(api.buffer(self._scratch[1], size))
+
+    def hexdigest(self):
+        "Return the digest value as a string of hexadecimal digits."
+        return binascii.hexlify(self.digest())
+
+    def digest_into(self, buffer):
+        """Write the digest value into a writable buffer.
+
+        The buffer must support the buffer protocol and be at least
+        digest_size bytes long. Returns the number of bytes written.
+        """
+        if memoryview(buffer).readonly:
+            raise TypeError('digest_into() requires a writable buffer')
+        output = api.from_buffer(buffer)
+        if len(output) < self.digest_size:
+            msg = "Buffer must be at least {0} bytes. Received {1}".format(
+                    self.digest_size, len(output))
+            raise ValueError(msg)
+        return self._digest(api.cast('unsigned char*', output))
+
+    def copy(self):
+        "Return a copy of the hash object."
+        new = MessageDigest(self._descriptor, engine=self._engine)
+        if not api.EVP_MD_CTX_copy_ex(new._context, self._context):
+            raise DigestError('Failed to copy message digest')
+        return new
+
+    def export_state(self):
+        """Return the state of this hash object as bytes.
+
+        import_state() resumes hashing from the state in this or another
+        process. Only the SHA-1 and SHA-2 algorithms are supported, using
+        OpenSSL's default implementation of a version exposing digest state,
+        before 3.0. The state includes the trailing bytes passed to update()
+        that do not fill a block, so is as sensitive as the data hashed.
+        """
+        buff = api.new('unsigned char[]', _STATE_SIZE)
+        size = api.tls_digest_export(self._context, buff, _STATE_SIZE)
+        if not size:
+            msg = "Unable to export the state of '{0}'".format(self.name)
+            raise DigestError(msg)
+        return (_STATE_HEADER.pack(STATE_VERSION, self._descriptor.nid)
+                + bytes(api.buffer(buff, size)))
+
+    def _digest(self, output=None):
+        """Finalise a copy of this hash object's state, return its size.
+
+        The digest is written to output, or to the scratch buffer if output
+        is None. The scratch context, buffer and size are allocated by the
+        first call and reused by every later call.
+        """
+        if self._scratch is None:
+            context, ref = _acquire_context(self, self._descriptor.md,
+                    self._engine)
+            buff = api.new('unsigned char[]', api.EVP_MAX_MD_SIZE)
+            size = api.new('unsigned int*')
+            self._scratch = (context, buff, size)
+            self._scratch_weakref = ref
+        context, buff, size = self._scratch
+        if not api.EVP_MD_CTX_copy_ex(context, self._context):
+            raise DigestError('Failed to copy message digest')
+        if not api.EVP_DigestFinal_ex(context,
+                buff if output is None else output, size):
+            raise DigestError('Failed to retrieve digest value')
+        return size[0]
+
+
+def new(name, data=None, engine=None):
+    """new(name, data=b'', engine=None)
+
+    Return a new hashing object using the named algorithm;
+    optionally initialized with data (which must be bytes). The digest is
+    calculated by engine, a tls.engine.Engine or engine id, if provided.
+    """
+    return MessageDigest(descriptor(name), data, _engine.resolve(engine))
+
+
+def import_state(state):
+    """import_state(state)
+
+    Return a new hashing object resuming from a state returned by the
+    export_state() method of a hash object. Raises ValueError if the state
+    is malformed or from an unknown version or algorithm.
+    """
+    state = bytes(state)
+    if len(state) < _STATE_HEADER.size:
+        raise ValueError('Digest state is truncated')
+    version, nid = _STATE_HEADER.unpack_from(state)
+    if version != STATE_VERSION:
+        msg = "Unsupported digest state version {0}".format(version)
+        raise ValueError(msg)
+    short_name = api.OBJ_nid2sn(nid)
+    if short_name == api.NULL:
+        raise ValueError('Unknown digest state algorithm')
+    digest = MessageDigest(descriptor(api.string(short_name)))
+    body = state[_STATE_HEADER.size:]
+    if not api.tls_digest_import(digest._context, body, len(body)):
+        raise ValueError('Invalid digest state')
+    return digest
+
+
+def file_digest(fileobj, name, bufsize=BUFSIZE, engine=None):
+    """file_digest(fileobj, name, bufsize=BUFSIZE, engine=None)
+
+    Return a new hashing object using the named algorithm, updated with the
+    remaining contents of fileobj. If name is a list or tuple of algorithm
+    names a MultiDigest is returned instead.
+
+    fileobj may be a file name, a file descriptor, a tls.io.BIOChain or a
+    file like object opened for reading in binary mode. File names, file
+    descriptors and BIOChains are read and hashed by a single call to
+    OpenSSL that releases the GIL until the end of the file, reusing one
+    buffer of bufsize bytes.
+    """
+    if isinstance(name, (list, tuple)):
+        digest = MultiDigest(name, engine=engine)
+        contexts = digest._contexts
+    else:
+        digest = new(name, engine=engine)
+        contexts = api.new('EVP_MD_CTX*[]', [digest._context])
+    buff = api.new('unsigned char[]', bufsize)
+    if hasattr(fileobj, 'c_bio'):
+        result = api.tls_digest_bio(contexts, len(contexts), fileobj.c_bio,
+                buff, bufsize)
+        if result < 0:
+            raise IOError('Error reading from BIO')
+        if result == 0:
+            raise DigestError('Error updating message digest')
+    elif isinstance(fileobj, numbers.Integral):
+        _digest_fd(contexts, fileobj, buff)
+    elif hasattr(fileobj, 'getbuffer'):
+        position = fileobj.tell()
+        digest.update(fileobj.getbuffer()[position:])
+        fileobj.seek(0, os.SEEK_END)
+    elif hasattr(fileobj, 'readinto'):
+        view = memoryview(api.buffer(buff))
+        size = fileobj.readinto(view)
+        while size:
+            digest.update(view[:size])
+            size = fileobj.readinto(view)
+    elif hasattr(fileobj, 'read'):
+        data = fileobj.read(bufsize)
+        while data:
+            digest.update(data)
+            data = fileobj.read(bufsize)
+    else:
+        fd = os.open(fileobj, os.O_RDONLY)
+        try:
+            _digest_fd(contexts, fd, buff)
+        finally:
+            os.close(fd)
+    return digest
+
+
+def hash_many(name, messages, offsets=None, packed=False, engine=None):
+    """hash_many(name, messages, offsets=None, packed=False, engine=None)
+
+    Return the digests of many messages using the named algorithm.
+
+    messages is an iterable of bytes objects, or a single buffer if offsets
+    is provided. offsets is then a sequence of ascending positions in the
+    buffer, one more than the number of messages, message i being
+    messages[offsets[i]:offsets[i + 1]]. An array.array of offsets whose
+    items are the size of a size_t is used without being converted.
+
+    All of the messages are hashed by a single call to OpenSSL reusing one
+    digest context. The digests are returned as a list of bytes, or if
+    packed is True as a single bytes object of digest_size slots.
+    """
+    desc = descriptor(name)
+    engine = _engine.resolve(engine)
+    data, c_offsets, count = pack_messages(messages, offsets)
+    slot = desc.digest_size
+    output = api.new('unsigned char[]', count * slot)
+    context = api.new('EVP_MD_CTX*')
+    try:
+        result = api.tls_digest_many(context, desc.md, _engine.handle(engine),
+                api.cast('unsigned char*', data), len(data), c_offsets, count,
+                output, slot)
+    finally:
+        api.EVP_MD_CTX_cleanup(context)
+    if result < 0:
+        raise ValueError('offsets must ascend within the messages buffer')
+    if result == 0:
+        raise DigestError('Error calculating message digests')
+    digests = bytes(api.buffer(output))
+    if packed:
+        return digests
+    return [digests[start:start + slot]
+            for start in range(0, len(digests), slot)]
+
+
+class MultiDigest(object):
+    """Calculates the digests of several algorithms in a single pass.
+
+    Each call to update() passes the data to every algorithm with a single
+    call to OpenSSL. The hash object of each algorithm is available by
+    indexing with its name.
+    """
+
+    def __init__(self, names, data=None, engine=None):
+        engine = _engine.resolve(engine)
+        self._names = tuple(names)
+        if len(set(self._names)) != len(self._names):
+            raise ValueError('Algorithm names must be unique')
+        self._digests = dict((name, MessageDigest(descriptor(name),
+                engine=engine)) for name in self._names)
+        self._contexts = api.new('EVP_MD_CTX*[]',
+                [self._digests[name]._context for name in self._names])
+        if data:
+            self.update(data)
+
+    def __getitem__(self, name):
+        return self._digests[name]
+
+    @property
+    def names(self):
+        return self._names
+
+    def update(self, data):
+        "Update the state of every algorithm with the provided data."
+        buff = api.from_buffer(data)
+        if not api.tls_digest_update_all(self._contexts, len(self._contexts),
+                buff, len(buff)):
+            raise DigestError('Error updating message digest')
+
+    def digests(self):
+        "Return a dictionary of the digest of each algorithm by name."
+        return dict((name, self._digests[name].digest())
+                    for name in self._names)
+
+    def hexdigests(self):
+        "Return a dictionary of the hexdigest of each algorithm by name."
+        return dict((name, self._digests[name].hexdigest())
+                    for name in self._names)
+
+
+class TreeHash(object):
+    """A hash object hashing fixed size leaves of its input concurrently.
+
+    The input is split into leaves of leaf_size bytes, the last leaf holding
+    the remainder. Leaves are hashed by a pool of threads, releasing the GIL
+    while OpenSSL runs. The digests of the leaves are combined into a root
+    digest using the Merkle Tree Hash of RFC 6962 section 2.1:
+
+     - a leaf's digest is H(0x00 || leaf),
+     - an interior node's digest is H(0x01 || left || right), where the left
+       subtree holds the largest power of two leaves less than the number of
+       leaves under the node,
+     - the input is a single empty leaf when no data has been added.
+
+    The digest depends on the algorithm and leaf_size, but not the number of
+    threads or how the data was passed to update(). It is not equal to the
+    digest of the same input from new().
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, name, data=None, leaf_size=LEAF_SIZE, threads=None,
+            engine=None):
+        if leaf_size <= 0:
+            raise ValueError('leaf_size must be positive')
+        self._descriptor = descriptor(name)
+        self._engine = _engine.resolve(engine)
+        self._leaf_size = leaf_size
+        self._threads = threads or multiprocessing.cpu_count()
+        self._task_size = leaf_size * LEAVES_PER_TASK
+        self._pending = bytearray()
+        self._leaves = []
+        self._tasks = []
+        if data:
+            self.update(data)
+
+    @property
+    def name(self):
+        return self._descriptor.name
+
+    @property
+    def digest_size(self):
+        return self._descriptor.digest_size
+
+    @property
+    def block_size(self):
+        return self._descriptor.block_size
+
+    @property
+    def leaf_size(self):
+        return self._leaf_size
+
+    def update(self, data):
+        """Update this hash object's state with the provided data.
+
+        Whole tasks of leaves are copied from data and queued for hashing,
+        so that large buffers are not held in memory.
+        """
+        view = memoryview(data)
+        if view.itemsize != 1:
+            view = view.cast('B')
+        offset = 0
+        if self._pending:
+            offset = min(len(view), self._task_size - len(self._pending))
+            self._pending += view[:offset].tobytes()
+            if len(self._pending) < self._task_size:
+                return
+            self._submit(bytes(self._pending))
+            self._pending = bytearray()
+        end = len(view) - (len(view) - offset) % self._task_size
+        for start in range(offset, end, self._task_size):
+            self._submit(view[start:start + self._task_size].tobytes())
+        self._pending += view[end:].tobytes()
+
+    def digest(self):
+        "Return the root digest value as a string of binary data."
+        leaves = self._leaves + [task.get() for task in self._tasks]
+        if self._pending or not leaves:
+            leaves.append(self._hash_leaves(bytes(self._pending)))
+        nodes = bytearray(b''.join(leaves))
+        self._call(api.tls_digest_tree,
+                api.cast('unsigned char*', api.from_buffer(nodes)),
+                len(nodes) // self.digest_size, self.digest_size)
+        return bytes(nodes[:self.digest_size])
+
+    def hexdigest(self):
+        "Return the root digest value as a string of hexadecimal digits."
+        return binascii.hexlify(self.digest())
+
+    def _submit(self, data):
+        "Hash the leaves of data on the thread pool"
+        if self._threads == 1:
+            self._leaves.append(self._hash_leaves(data))
+            return
+        # collect completed tasks in order, limiting the data queued to a
+        # few tasks for each thread
+        tasks = self._tasks
+        while tasks and (tasks[0].ready() or len(tasks) >= 2 * self._threads):
+            self._leaves.append(tasks.pop(0).get())
+        pool = self._pool(self._threads)
+        tasks.append(pool.apply_async(self._hash_leaves, (data,)))
+
+    def _hash_leaves(self, data):
+        "Return the concatenated digests of the leaves of data"
+        slot = self.digest_size
+        count = max(1, -(-len(data) // self._leaf_size))
+        output = api.new('unsigned char[]', count * slot)
+        self._call(api.tls_digest_leaves,
+                api.cast('unsigned char*', api.from_buffer(data)), len(data),
+                self._leaf_size, output, slot)
+        return bytes(api.buffer(output))
+
+    def _call(self, function, *args):
+        "Call a tree hashing function with a new digest context"
+        context = api.new('EVP_MD_CTX*')
+        try:
+            result = function(context, self._descriptor.md,
+                    _engine.handle(self._engine), *args)
+        finally:
+            api.EVP_MD_CTX_cleanup(context)
+        if not result:
+            raise DigestError('Error calculating tree hash')
+
+    @classmethod
+    def _pool(cls, threads):
+        "Return the thread pool shared by tree hashes with the same threads"
+        with cls._pools_lock:
+            pool = cls._pools.get(threads)
+            if pool is None:
+                pool = cls._pools[threads] = multiprocessing.pool.ThreadPool(
+                        threads)
+            return pool
+
+
+def _digest_fd(contexts, fd, buff):
+    "Update digest contexts with the remaining contents of a file descriptor"
+    result = api.tls_digest_fd(contexts, len(contexts), fd, buff, len(buff))
+    if result < 0:
+        errno = api.ffi.errno
+        raise OSError(errno, os.strerror(errno))
+    if result == 0:
+        raise DigestError('Error updating message digest')
+
+md5 = functools.partial(new, b'MD5')
+sha1 = functools.partial(new, b'SHA1')
+sha224 = functools.partial(new, b'SHA224')
+sha256 = functools.partial(new, b'SHA256')
+sha384 = functools.partial(new, b'SHA384')
+sha512 = functools.partial(new, b'SHA512')
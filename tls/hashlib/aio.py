@@ -0,0 +1,160 @@
+"""Hashing of streams and files without blocking the asyncio event loop.
+
+Requires Python 3.5 or later.
+
+stream_digest(reader, name) - returns a new hash object updated with the
+                      remaining contents of an asyncio.StreamReader.
+
+iter_digest(chunks, name) - returns a new hash object updated with the
+                      chunks of bytes from an async iterator.
+
+file_digest(path, name) - returns a new hash object updated with the
+                      contents of a file.
+
+These are coroutines. Small chunks are coalesced into chunks of at least
+chunk_size bytes, which are passed to the hash object's update() method on
+an executor, while OpenSSL releases the GIL. Each hash object has a single
+chunk being hashed while the next is read, so a stream that is read faster
+than it is hashed waits for the executor. As with hashlib.file_digest(),
+name may also be a list or tuple of algorithm names, returning a
+MultiDigest.
+
+    >>> from tls.hashlib import aio
+    >>> reader, writer = await asyncio.open_connection(host, port)
+    >>> digest = await aio.stream_digest(reader, b'SHA256')
+
+The executor defaults to a thread pool shared by all coroutines, of
+MAX_WORKERS threads.
+"""
+from __future__ import absolute_import, division, print_function
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import threading
+
+from tls import hashlib
+
+__all__ = ['default_executor', 'file_digest', 'iter_digest', 'stream_digest']
+
+# size of the chunks passed to a hash object's update() method
+CHUNK_SIZE = 1024 * 1024
+
+# threads of the default executor
+MAX_WORKERS = multiprocessing.cpu_count()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_executor():
+    "Return the executor shared by coroutines not given an executor"
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(MAX_WORKERS)
+        return _executor
+
+
+class _Pipeline(object):
+    """Passes coalesced chunks to a hash object's update() on an executor.
+
+    The next chunk is coalesced while the previous chunk is hashed. Feeding
+    a chunk waits for the previous chunk to be hashed, so at most one chunk
+    per hash object is queued on the executor.
+    """
+
+    __slots__ = ('digest', '_chunk_size', '_executor', '_loop', '_buffer',
+                 '_pending')
+
+    def __init__(self, name, chunk_size, executor, engine):
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        if isinstance(name, (list, tuple)):
+            self.digest = hashlib.MultiDigest(name, engine=engine)
+        else:
+            self.digest = hashlib.new(name, engine=engine)
+        self._chunk_size = chunk_size
+        self._executor = executor or default_executor()
+        self._loop = asyncio.get_event_loop()
+        self._buffer = bytearray()
+        self._pending = None
+
+    async def feed(self, data):
+        """Hash data, coalescing it with small chunks.
+
+        bytes of at least chunk_size are hashed without being copied. Other
+        buffers are copied, so may be reused once this returns.
+        """
+        if isinstance(data, bytes) and len(data) >= self._chunk_size:
+            if self._buffer:
+                await self._flush()
+            await self._submit(data)
+            return
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            await self._flush()
+
+    async def close(self):
+        "Hash the remaining data, return the hash object"
+        if self._buffer:
+            await self._flush()
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        return self.digest
+
+    async def _flush(self):
+        buff, self._buffer = self._buffer, bytearray()
+        await self._submit(buff)
+
+    async def _submit(self, data):
+        if self._pending is not None:
+            await self._pending
+        self._pending = self._loop.run_in_executor(self._executor,
+                self.digest.update, data)
+
+
+async def stream_digest(reader, name, chunk_size=CHUNK_SIZE, executor=None,
+        engine=None):
+    """stream_digest(reader, name, chunk_size=CHUNK_SIZE, executor=None,
+                     engine=None)
+
+    Return a new hashing object using the named algorithm, updated with the
+    remaining contents of reader, an asyncio.StreamReader.
+    """
+    pipeline = _Pipeline(name, chunk_size, executor, engine)
+    data = await reader.read(chunk_size)
+    while data:
+        await pipeline.feed(data)
+        data = await reader.read(chunk_size)
+    return await pipeline.close()
+
+
+async def iter_digest(chunks, name, chunk_size=CHUNK_SIZE, executor=None,
+        engine=None):
+    """iter_digest(chunks, name, chunk_size=CHUNK_SIZE, executor=None,
+                   engine=None)
+
+    Return a new hashing object using the named algorithm, updated with
+    each bytes like object from chunks, an async iterator. Chunks that are
+    not bytes may be modified by the iterator once it resumes.
+    """
+    pipeline = _Pipeline(name, chunk_size, executor, engine)
+    async for data in chunks:
+        await pipeline.feed(data)
+    return await pipeline.close()
+
+
+async def file_digest(path, name, bufsize=hashlib.BUFSIZE, executor=None,
+        engine=None):
+    """file_digest(path, name, bufsize=BUFSIZE, executor=None, engine=None)
+
+    Return a new hashing object using the named algorithm, updated with the
+    contents of the file at path. The file is read and hashed by
+    hashlib.file_digest() in a single call on the executor.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor or default_executor(),
+            functools.partial(hashlib.file_digest, path, name, bufsize,
+                engine))
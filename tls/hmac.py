@@ -1,27 +1,97 @@
 """HMAC (Keyed-Hashing for Message Authentication) Python module.
 
 Implements the HMAC algorithm as described by RFC 2104.
+
+sign_many() and verify_many() sign or verify a batch of messages with a
+single call to OpenSSL, and compare_digest() compares two HMACs in constant
+time.
+
+file_hmac() calculates the HMAC of a file or BIOChain, and HMACFilter the HMAC
+of the data passing through a BIOChain, without handling the data in Python.
+
+HMACKeyCache keeps the prepared keys of many key ids, such as the keys of
+many tenants, evicting the least recently used and expired keys.
 """
 from __future__ import absolute_import, division, print_function
+from collections import namedtuple, OrderedDict
 import numbers
+import os
+import threading
+import time
 import weakref
 
+from tls import engine as _engine
 from tls.c import api
+from tls.util import pack_messages
+
+# default size of the buffer used to read files by file_hmac()
+BUFSIZE = 1024 * 1024
+
+# EVP_MD and digest size by digestmod
+_digests = {}
+
+_clock = getattr(time, 'monotonic', time.time)
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize')
+
+
+def _lookup(digestmod):
+    """Return the EVP_MD and digest size for digestmod, cached by digestmod.
+
+    digestmod is a message digest name, a module supporting PEP 247 or a
+    hashlib constructor. Modules and constructors are searched for a name in
+    their '__name__' and 'args' attributes.
+    """
+    try:
+        return _digests[digestmod]
+    except (KeyError, TypeError):
+        pass
+    md = _get_md(digestmod)
+    result = (md, api.EVP_MD_size(md))
+    try:
+        _digests[digestmod] = result
+    except TypeError:
+        pass
+    return result
+
+
+def _get_md(digestmod):
+    "Return the EVP_MD for digestmod, raising ValueError if unknown"
+    md = api.NULL
+    if isinstance(digestmod, bytes):
+        md = api.EVP_get_digestbyname(digestmod)
+    if md == api.NULL:
+        name = getattr(digestmod, '__name__', '').encode()
+        md = api.EVP_get_digestbyname(name)
+    if md == api.NULL:
+        name = getattr(digestmod, '__name__', '').encode()
+        name = name.replace(b'openssl_', b'')
+        md = api.EVP_get_digestbyname(name)
+    if md == api.NULL:
+        for name in getattr(digestmod, 'args', []):
+            md = api.EVP_get_digestbyname(name)
+            if md != api.NULL:
+                break
+    if md == api.NULL:
+        msg = 'Unknown message digest {0}'.format(repr(digestmod))
+        raise ValueError(msg)
+    return md
 
 
 class HMAC(object):
     """RFC 2104 HMAC class.  Also complies with RFC 4231.
 
     This supports the API for Cryptographic Hash Functions (PEP 247) with the
-    following exceptions:
+    following exception:
 
-     - There is no copy() method.
      - After calling digest() or hexdigest() the HMAC can no longer be updated
+       until reset() is called.
 
-    These exceptions are limitations of OpenSSL's HMAC functions.
+    copy() and reset() reuse the inner and outer digest states prepared from
+    the key, without repeating the key setup.
     """
 
-    def __init__(self, key, msg=None, digestmod=None):
+    def __init__(self, key, msg=None, digestmod=None, engine=None):
         """Create a new HMAC object.
 
         key:       key for the keyed hash object.
@@ -34,42 +104,30 @@ class HMAC(object):
         and 'args' attributes are searched to find a message digest name. If
         not provied the digestmod defaults to 'md5'.
 
+        engine:    A tls.engine.Engine or engine id used to calculate the
+                   message digest, if provided.
+
         Note: key and msg must be a bytes objects.
         """
         if digestmod is None:
             self._md = api.EVP_md5()
         else:
-            self._md = self._get_md(digestmod)
+            self._md = _lookup(digestmod)[0]
+        self._engine = _engine.resolve(engine)
         ctx = api.new('HMAC_CTX*')
         self._key = api.new('char[]', key)
         api.HMAC_Init_ex(ctx, api.cast('void*', self._key),
-                len(key), self._md, api.NULL)
-        cleanup = lambda _: api.HMAC_CTX_cleanup(ctx)
-        self._weakref = weakref.ref(self, cleanup)
-        self._ctx = ctx
+                len(key), self._md, _engine.handle(self._engine))
+        self._track(ctx)
         if msg is not None:
             self.update(msg)
 
-    def _get_md(self, digestmod):
-        md = api.NULL
-        if isinstance(digestmod, bytes):
-            md = api.EVP_get_digestbyname(digestmod)
-        if md == api.NULL:
-            name = getattr(digestmod, '__name__', '').encode()
-            md = api.EVP_get_digestbyname(name)
-        if md == api.NULL:
-            name = getattr(digestmod, '__name__', '').encode()
-            name = name.replace(b'openssl_', b'')
-            md = api.EVP_get_digestbyname(name)
-        if md == api.NULL:
-            for name in getattr(digestmod, 'args', []):
-                md = api.EVP_get_digestbyname(name)
-                if md != api.NULL:
-                    break
-        if md == api.NULL:
-            msg = 'Unknown message digest {0}'.format(repr(digestmod))
-            raise ValueError(msg)
-        return md
+    def _track(self, ctx):
+        "Use ctx as this object's context, cleaning it up with the object"
+        cleanup = lambda _: api.HMAC_CTX_cleanup(ctx)
+        self._weakref = weakref.ref(self, cleanup)
+        self._ctx = ctx
+        self._digest = None
 
     @property
     def digest_size(self):
@@ -78,10 +136,11 @@ class HMAC(object):
     def update(self, msg):
         """Update this hashing object with the string msg.
         """
-        if self._ctx is None:
+        if self._digest is not None:
             raise ValueError('HMAC already closed')
-        data = api.new('char[]', msg)
-        api.HMAC_Update(self._ctx, api.cast('void*', data), len(msg))
+        data = api.from_buffer(msg)
+        api.HMAC_Update(self._ctx, api.cast('unsigned char*', data),
+                len(data))
 
     def digest(self):
         """Return the hash value of this hashing object.
@@ -90,29 +149,463 @@ class HMAC(object):
         it's no longer possible to call update(). The digest value can continue
         to be retrieved.
         """
-        if hasattr(self, '_digest'):
+        if self._digest is not None:
             return self._digest
-        if self._ctx is None:
-            raise ValueError('HMAC already closed')
         buff = api.new('unsigned char[]', api.EVP_MAX_MD_SIZE)
         size = api.new('unsigned int*')
         api.HMAC_Final(self._ctx, buff, size)
         self._digest = bytes(api.buffer(buff, size[0]))
-        self._ctx = None
         return self._digest
 
     def hexdigest(self):
         """Like digest(), but returns a string of hexadecimal digits instead.
         """
-        if self._ctx is None:
+        if self._digest is not None:
             raise ValueError('HMAC already closed')
         return ''.join(
                 '{0:02x}'.format(
                     b if isinstance(b, numbers.Integral) else ord(b))
                 for b in self.digest())
 
+    def copy(self):
+        """Return a copy of this hashing object.
+
+        The copy has the same key and the same data passed to update(). The
+        HMAC must not have been closed by digest().
+        """
+        if self._digest is not None:
+            raise ValueError('HMAC already closed')
+        ctx = api.new('HMAC_CTX*')
+        if not api.HMAC_CTX_copy(ctx, self._ctx):
+            raise ValueError('Failed to copy HMAC')
+        return self._sibling(ctx)
+
+    def _sibling(self, ctx):
+        "Return an HMAC with this object's key, using the copied context ctx"
+        other = HMAC.__new__(HMAC)
+        other._md = self._md
+        other._engine = self._engine
+        other._key = self._key
+        other._track(ctx)
+        return other
+
+    def reset(self):
+        """Discard the data passed to update() and reopen a closed HMAC.
+
+        The object returns to the state it had when created with its key,
+        without repeating the key setup.
+        """
+        api.HMAC_Init_ex(self._ctx, api.NULL, 0, api.NULL, api.NULL)
+        self._digest = None
+
+
+class HMACKey(object):
+    """A key prepared once for computing the HMACs of many messages.
+
+    The key is padded and hashed into the inner and outer digest states when
+    the HMACKey is created. new() copies those states into each new HMAC
+    object, saving the two compression function calls of the key setup.
+
+        >>> key = HMACKey(b'secret', digestmod=b'sha256')
+        >>> signature = key.new(b'message').digest()
+    """
+
+    def __init__(self, key, digestmod=None, engine=None):
+        self._template = HMAC(key, None, digestmod, engine)
+
+    @property
+    def digest_size(self):
+        return self._template.digest_size
+
+    def new(self, msg=None):
+        """Return a new HMAC object using this key.
+
+        msg: if available, will immediately be hashed into the object's
+        starting state.
+        """
+        if self._template is None:
+            raise ValueError('HMACKey wiped')
+        hmac = self._template.copy()
+        if msg is not None:
+            hmac.update(msg)
+        return hmac
+
+    def wipe(self):
+        """Erase the key and the digest states prepared from it.
+
+        HMAC objects already created by new() are unaffected. The HMACKey
+        can no longer be used.
+        """
+        template, self._template = self._template, None
+        if template is not None:
+            api.OPENSSL_cleanse(template._key, len(template._key))
+            api.HMAC_CTX_cleanup(template._ctx)
+
+
+class HMACKeyCache(object):
+    """A cache of HMACKey objects by key id, such as the keys of tenants.
+
+    Keys are prepared the first time their id is used, by calling load with
+    the key id to return the key, and are then reused without repeating the
+    key setup. At most maxsize keys are kept, evicting the least recently
+    used, and if ttl is given a key is reloaded once ttl seconds have passed
+    since it was prepared. Evicted keys are wiped from memory.
+
+        >>> cache = HMACKeyCache(load_tenant_key, digestmod=b'sha256')
+        >>> signature = cache.new(tenant, b'message').digest()
+    """
+
+    def __init__(self, load=None, maxsize=1024, ttl=None, digestmod=None,
+                 engine=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be positive')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._load = load
+        self._digestmod = digestmod
+        self._engine = engine
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key_id):
+        entry = self._entries.get(key_id)
+        return entry is not None and not self._expired(entry, _clock())
+
+    def info(self):
+        "Return the hit, miss and eviction counts and the size of the cache"
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                self.maxsize, len(self._entries))
+
+    def get(self, key_id):
+        """Return the HMACKey of key_id, loading it if not cached.
+
+        The HMACKey is wiped if it is later evicted, so threads sharing the
+        cache should use new() instead. Raises KeyError if the key is not
+        cached and there is no load function.
+        """
+        now = _clock()
+        with self._lock:
+            prepared = self._hit(key_id, now)
+        if prepared is None:
+            prepared = self._miss(key_id)
+            self._insert(key_id, prepared)
+        return prepared
+
+    def new(self, key_id, msg=None):
+        "Return a new HMAC object using the key of key_id"
+        now = _clock()
+        with self._lock:
+            prepared = self._hit(key_id, now)
+            hmac = prepared.new() if prepared is not None else None
+        if hmac is None:
+            prepared = self._miss(key_id)
+            hmac = prepared.new()
+            self._insert(key_id, prepared)
+        if msg is not None:
+            hmac.update(msg)
+        return hmac
+
+    def put(self, key_id, key):
+        "Prepare and cache key for key_id, replacing any cached key"
+        prepared = HMACKey(key, self._digestmod, self._engine)
+        self._insert(key_id, prepared)
+        return prepared
+
+    def discard(self, key_id):
+        "Remove and wipe the key of key_id, if cached"
+        with self._lock:
+            entry = self._entries.pop(key_id, None)
+        if entry is not None:
+            entry[0].wipe()
+
+    def expire(self):
+        "Remove and wipe every expired key"
+        now = _clock()
+        with self._lock:
+            for key_id, entry in list(self._entries.items()):
+                if self._expired(entry, now):
+                    del self._entries[key_id]
+                    self.evictions += 1
+                    entry[0].wipe()
+
+    def clear(self):
+        "Remove and wipe every key"
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+        for prepared, _ in entries.values():
+            prepared.wipe()
+
+    def _hit(self, key_id, now):
+        "Return the cached HMACKey of key_id, or None. Requires the lock"
+        entry = self._entries.pop(key_id, None)
+        if entry is not None:
+            if not self._expired(entry, now):
+                self._entries[key_id] = entry
+                self.hits += 1
+                return entry[0]
+            self.evictions += 1
+            entry[0].wipe()
+        self.misses += 1
+        return None
+
+    def _miss(self, key_id):
+        "Return a new HMACKey for key_id from the load function"
+        if self._load is None:
+            raise KeyError(key_id)
+        return HMACKey(self._load(key_id), self._digestmod, self._engine)
+
+    def _insert(self, key_id, prepared):
+        "Cache prepared for key_id, evicting keys beyond maxsize"
+        now = _clock()
+        with self._lock:
+            entry = self._entries.pop(key_id, None)
+            if entry is not None:
+                entry[0].wipe()
+            self._entries[key_id] = (prepared, now)
+            while len(self._entries) > self.maxsize:
+                self._evict()
+            while self._expired(self._oldest(), now):
+                self._evict()
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[1] >= self.ttl
+
+    def _oldest(self):
+        return next(iter(self._entries.values()))
+
+    def _evict(self):
+        "Remove and wipe the least recently used key"
+        key_id, entry = self._entries.popitem(last=False)
+        self.evictions += 1
+        entry[0].wipe()
+
+
+def digest(key, msg, digestmod):
+    """Return the HMAC of msg using key and the digestmod message digest.
+
+    The HMAC is calculated by a single call to OpenSSL, without creating an
+    HMAC object. key and msg may be bytes or any object supporting the buffer
+    protocol with contiguous memory, and are passed to OpenSSL without being
+    copied. digestmod is a message digest name, a module supporting PEP 247
+    or a hashlib constructor, as for new().
+    """
+    md, size = _lookup(digestmod)
+    key = api.from_buffer(key)
+    data = api.from_buffer(msg)
+    output = api.new('unsigned char[]', size)
+    if api.HMAC(md, key, len(key), api.cast('unsigned char*', data),
+            len(data), output, api.NULL) == api.NULL:
+        raise ValueError('Error calculating HMAC')
+    return bytes(api.buffer(output))
+
+
+def compare_digest(a, b):
+    """Return a == b for two HMACs, taking a time independent of their content.
+
+    The time taken depends only on the length of the HMACs, not on where they
+    differ. a and b may be bytes or any object supporting the buffer protocol
+    with contiguous memory.
+    """
+    a = api.from_buffer(a)
+    b = api.from_buffer(b)
+    if len(a) != len(b):
+        return False
+    return api.CRYPTO_memcmp(a, b, len(a)) == 0
+
+
+def _keyed(key, digestmod, engine):
+    "Return an HMAC object keyed by key, which may be an HMACKey"
+    if isinstance(key, HMACKey):
+        return key.new()
+    return HMAC(key, None, digestmod, engine)
+
+
+def sign_many(key, messages, digestmod=None, offsets=None, packed=False,
+              engine=None):
+    """Return the HMACs of many messages using the same key.
+
+    The messages are signed by a single call to OpenSSL, reusing one keyed
+    context. key is bytes or an HMACKey, whose message digest and engine are
+    then used. messages is an iterable of bytes, or a single buffer holding
+    every message if offsets is provided, as for tls.hashlib.hash_many().
+
+    Returns a list of HMACs, or if packed is true the concatenation of the
+    HMACs as a single bytes object.
+    """
+    hmac = _keyed(key, digestmod, engine)
+    data, c_offsets, count = pack_messages(messages, offsets)
+    size = hmac.digest_size
+    output = api.new('unsigned char[]', count * size)
+    result = api.tls_hmac_many(hmac._ctx, api.cast('unsigned char*', data),
+            len(data), c_offsets, count, output, size)
+    if result < 0:
+        raise ValueError('offsets must ascend within the messages')
+    if result == 0:
+        raise ValueError('Error calculating HMAC')
+    signed = bytes(api.buffer(output, count * size))
+    if packed:
+        return signed
+    return [signed[i:i + size] for i in range(0, count * size, size)]
+
+
+def verify_many(key, messages, tags, digestmod=None, offsets=None,
+                engine=None):
+    """Verify the HMACs of many messages using the same key.
+
+    The messages are signed and compared with their tags by a single call to
+    OpenSSL, reusing one keyed context. Each comparison takes a time
+    independent of where the HMACs differ. key and messages are as for
+    sign_many(). tags is a sequence of HMACs, one for each message, or their
+    concatenation as returned by sign_many() with packed true.
+
+    Returns a bytearray bitmap, bit i % 8 of byte i // 8 being set if the HMAC
+    of message i matches its tag. A tag of the wrong length never matches.
+    """
+    hmac = _keyed(key, digestmod, engine)
+    data, c_offsets, count = pack_messages(messages, offsets)
+    size = hmac.digest_size
+    invalid = []
+    if isinstance(tags, (bytes, bytearray, memoryview)):
+        if len(tags) != count * size:
+            raise ValueError('Expected {0} bytes of tags, got {1}'.format(
+                count * size, len(tags)))
+    else:
+        tags = list(tags)
+        if len(tags) != count:
+            raise ValueError('Expected {0} tags, got {1}'.format(
+                count, len(tags)))
+        for index, tag in enumerate(tags):
+            if len(tag) != size:
+                invalid.append(index)
+                tags[index] = b'\x00' * size
+        tags = b''.join(tags)
+    c_tags = api.from_buffer(tags)
+    bitmap = api.new('unsigned char[]', (count + 7) // 8)
+    result = api.tls_hmac_verify_many(hmac._ctx,
+            api.cast('unsigned char*', data), len(data), c_offsets, count,
+            api.cast('unsigned char*', c_tags), size, bitmap)
+    if result < 0:
+        raise ValueError('offsets must ascend within the messages')
+    if result == 0:
+        raise ValueError('Error calculating HMAC')
+    verified = bytearray(api.buffer(bitmap, (count + 7) // 8))
+    for index in invalid:
+        verified[index // 8] &= ~(1 << index % 8) & 0xff
+    return verified
+
+
+def file_hmac(key, fileobj, digestmod=None, bufsize=BUFSIZE, engine=None):
+    """Return a new HMAC object updated with the remaining contents of
+    fileobj.
+
+    key is bytes or an HMACKey, whose message digest and engine are then
+    used. fileobj may be a file name, a file descriptor, a tls.io.BIOChain or
+    a file like object opened for reading in binary mode. File names, file
+    descriptors and BIOChains are read and authenticated by a single call to
+    OpenSSL that releases the GIL until the end of the file, reusing one
+    buffer of bufsize bytes.
+    """
+    hmac = _keyed(key, digestmod, engine)
+    buff = api.new('unsigned char[]', bufsize)
+    if hasattr(fileobj, 'c_bio'):
+        result = api.tls_hmac_bio(hmac._ctx, fileobj.c_bio, buff, bufsize)
+        if result < 0:
+            raise IOError('Error reading from BIO')
+        if result == 0:
+            raise ValueError('Error updating HMAC')
+    elif isinstance(fileobj, numbers.Integral):
+        _hmac_fd(hmac, fileobj, buff)
+    elif hasattr(fileobj, 'readinto'):
+        view = memoryview(api.buffer(buff))
+        size = fileobj.readinto(view)
+        while size:
+            hmac.update(view[:size])
+            size = fileobj.readinto(view)
+    elif hasattr(fileobj, 'read'):
+        data = fileobj.read(bufsize)
+        while data:
+            hmac.update(data)
+            data = fileobj.read(bufsize)
+    else:
+        fd = os.open(fileobj, os.O_RDONLY)
+        try:
+            _hmac_fd(hmac, fd, buff)
+        finally:
+            os.close(fd)
+    return hmac
+
+
+def _hmac_fd(hmac, fd, buff):
+    "Update hmac with the remaining contents of a file descriptor"
+    result = api.tls_hmac_fd(hmac._ctx, fd, buff, len(buff))
+    if result < 0:
+        errno = api.ffi.errno
+        raise OSError(errno, os.strerror(errno))
+    if result == 0:
+        raise ValueError('Error updating HMAC')
+
+
+class HMACFilter(object):
+    """Calculates the HMAC of the data read or written through a BIOChain.
+
+    Creating an HMACFilter pushes a filter BIO onto the chain, which updates
+    the HMAC with the data passing through it in OpenSSL. Resetting the
+    chain restarts the HMAC. The filter is freed when the chain is closed,
+    after which the HMAC is no longer available.
+
+        >>> source = BIOFile('archive.tar')
+        >>> mac = HMACFilter(source, b'secret', b'sha256')
+        >>> source.copy_to(BIOFile('copy.tar', 'w'))
+        >>> signature = mac.digest()
+
+    key is bytes or an HMACKey, whose message digest and engine are then
+    used.
+    """
+
+    def __init__(self, chain, key, digestmod=None, engine=None):
+        self._hmac = _keyed(key, digestmod, engine)
+        method = api.tls_bio_f_hmac()
+        if method == api.NULL:
+            raise ValueError('Failed to create HMAC filter')
+        bio = api.BIO_new(method)
+        if api.cast('void*', bio) == api.NULL:
+            raise ValueError('Failed to create HMAC filter')
+        if not api.tls_bio_set_hmac(bio, self._hmac._ctx):
+            api.BIO_free(bio)
+            raise ValueError('Failed to create HMAC filter')
+        chain.push(bio)
+        self._chain = chain
+        self._bio = bio
+
+    @property
+    def digest_size(self):
+        return self._hmac.digest_size
+
+    def hmac(self):
+        "Return an HMAC object copied from the HMAC of the data so far"
+        if self._chain.closed():
+            raise ValueError('BIOChain already closed')
+        ctx = api.new('HMAC_CTX*')
+        if not api.tls_bio_get_hmac(self._bio, ctx):
+            raise ValueError('Failed to copy HMAC')
+        return self._hmac._sibling(ctx)
+
+    def digest(self):
+        "Return the HMAC of the data passed through the filter so far"
+        return self.hmac().digest()
+
+    def hexdigest(self):
+        "Like digest(), but returns a string of hexadecimal digits instead"
+        return self.hmac().hexdigest()
+
 
-def new(key, msg=None, digestmod=None):
+def new(key, msg=None, digestmod=None, engine=None):
     """Create a new hashing object and return it.
 
     key: The starting key for the hash.
@@ -123,4 +616,4 @@ def new(key, msg=None, digestmod=None):
     When complete the hash value can be retrieved by calling the digest() or
     hexdigest() method.
     """
-    return HMAC(key, msg, digestmod)
+    return HMAC(key, msg, digestmod, engine)
@@ -8,6 +8,8 @@ from tls.c import api
 class BIOBase(object):
     """Base class for Python BIO objects."""
 
+    __slots__ = ()
+
     BIO_ERROR = -1
     BIO_NOT_IMPLEMENTED = -2
 
@@ -75,6 +75,24 @@ class BIOChain(object):
     def c_bio(self):
         return self._bio
 
+    @_not_closed
+    @err.log_errors
+    def copy_to(self, other, bufsize=1024 * 1024):
+        """Write the remaining data read from this chain to another BIOChain.
+
+        The data is copied by a single call to OpenSSL, reusing one buffer
+        of bufsize bytes. Returns the number of bytes copied.
+        """
+        buf = api.new('unsigned char[]', bufsize)
+        copied = api.new('unsigned long long*')
+        result = api.tls_bio_copy(self._bio, other.c_bio, buf, bufsize,
+                copied)
+        if result == -1:
+            raise IOError('Error reading from BIO')
+        if result == -2:
+            raise IOError('Error writing to BIO')
+        return copied[0]
+
     # io.IOBase
 
     @err.log_errors
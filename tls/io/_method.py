@@ -11,8 +11,13 @@ class BIOMethod(BIOBase):
     The original object is the fileobj attribute. To create automatically have
     a BIO object created with the associated method retained until the BIO
     object is garbage collected, use the wrap_io class method.
+
+    The method's name and callbacks are retained by the BIOMethod instance
+    for as long as it is alive.
     """
 
+    __slots__ = ('method', 'fileobj', '_name', '_callbacks')
+
     @classmethod
     def wrap_io(cls, fileobj):
         """Create a new BIO object for a file like Python object.
@@ -29,24 +34,25 @@ class BIOMethod(BIOBase):
         return bio
 
     def __init__(self, fileobj):
-        method = api.new('BIO_METHOD*', coown=True)
+        name = api.new('char[]', repr(fileobj).encode())
+        callbacks = (
+            api.callback('int (*)(BIO*, const char*, int)', self.write),
+            api.callback('int (*)(BIO*, char*, int)', self.read),
+            api.callback('int (*)(BIO*, const char*)', self.puts),
+            api.callback('int (*)(BIO*, char*, int)', self.gets),
+            api.callback('long (*)(BIO*, int, long, void*)', self.ctrl),
+            api.callback('int (*)(BIO*)', self.create),
+        )
+        method = api.new('BIO_METHOD*')
         method.type = api.BIO_TYPE_SOURCE_SINK | 0xFF
-        method.name = api.new('char[]', repr(fileobj).encode())
-        method.bwrite = api.callback('int (*)(BIO*, const char*, int)',
-                self.write)
-        method.bread = api.callback('int (*)(BIO*, char*, int)',
-                self.read)
-        method.bputs = api.callback('int (*)(BIO*, const char*)',
-                self.puts)
-        method.bgets = api.callback('int (*)(BIO*, char*, int)',
-                self.gets)
-        method.ctrl = api.callback('long (*)(BIO*, int, long, void*)',
-                self.ctrl)
-        method.create = api.callback('int (*)(BIO*)',
-                self.create)
+        method.name = name
+        (method.bwrite, method.bread, method.bputs, method.bgets,
+                method.ctrl, method.create) = callbacks
         method.destroy = api.NULL
         method.callback_ctrl = api.NULL
-        self.method = method._unwrap()
+        self._name = name
+        self._callbacks = callbacks
+        self.method = method
         self.fileobj = fileobj
 
     def create(self, bio):
@@ -39,7 +39,8 @@ from random import Random as _Random
 import math
 import os
 
-from tls.c import api
+from tls import engine as _engine
+from tls.c import api, startup
 
 __all__ = ['PseudoRandom', 'Random', 'betavariate', 'choice', 'expovariate',
            'gammavariate', 'gauss', 'getrandbits', 'getstate',
@@ -61,11 +62,19 @@ class Random(_Random):
     sufficiently seeded.
     """
 
-    def __init__(self, state=None):
+    def __init__(self, state=None, engine=None):
         """Initialize an instance.
 
         Optional argument x controls seeding, as for Random.seed().
+
+        Optional argument engine, a tls.engine.Engine or engine id, replaces
+        OpenSSL's random number generator. OpenSSL has a single generator, so
+        this affects all Random instances.
         """
+        self._engine = _engine.resolve(engine)
+        if self._engine is not None:
+            if not api.RAND_set_rand_engine(self._engine.handle):
+                raise RandomError('Unable to use engine for random numbers')
         self.seed(state)
         self.gauss_next = None
 
@@ -176,7 +185,8 @@ class PseudoRandom(Random):
         return api.RAND_pseudo_bytes(buff, blen)
 
 
-_inst = Random()
+with startup.phase('tls.random.Random'):
+    _inst = Random()
 seed = _inst.seed
 random = _inst.random
 uniform = _inst.uniform
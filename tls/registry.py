@@ -0,0 +1,235 @@
+"""Registries of the message digest and cipher algorithms available from
+OpenSSL, shared by tls.hashlib and tls.cipherlib.
+
+  - digests: the Registry of message digest algorithms, also available as
+        tls.hashlib.algorithms_available.
+  - ciphers: the Registry of cipher algorithms, also available as
+        tls.cipherlib.algorithms_available.
+
+A Registry is a set of the canonical names of its algorithms, one name for
+each NID. It is built the first time it is used, so importing a module does
+not enumerate every algorithm. The metadata of an algorithm is returned by
+info(), given its canonical name or any of its aliases:
+
+    >>> from tls import registry
+    >>> info = registry.digests.info(b'sha256')
+    >>> info.name, info.digest_size
+    (b'SHA256', 32)
+
+When the OPENTLS_REGISTRY_CACHE environment variable names a directory, each
+registry is saved there once built, and loaded by later processes using the
+same version of OpenSSL. Algorithms added to OpenSSL at run time, such as by
+a dynamic engine, are not listed until the saved registry is removed.
+"""
+from __future__ import absolute_import, division, print_function
+from collections import namedtuple
+import json
+import os
+import tempfile
+import threading
+
+try:
+    from collections.abc import Set
+except ImportError:
+    from collections import Set
+
+from tls.c import api, startup
+
+__all__ = ['CipherInfo', 'DigestInfo', 'Registry', 'ciphers', 'digests']
+
+DigestInfo = namedtuple('DigestInfo',
+        'name nid aliases digest_size block_size')
+CipherInfo = namedtuple('CipherInfo',
+        'name nid aliases key_length iv_length block_size mode')
+
+
+class Registry(Set):
+    """The set of canonical names of the algorithms of an OpenSSL object type.
+
+    The describe function returns the info of an algorithm given its
+    canonical name, NID and aliases, or None if it is unavailable.
+    """
+
+    def __init__(self, kind, objtype, describe, info_type):
+        self.kind = kind
+        self._objtype = objtype
+        self._describe = describe
+        self._info_type = info_type
+        self._lock = threading.Lock()
+        self._algorithms = None
+        self._names = None
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.kind)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        "Return the results of set operations as a set"
+        return set(iterable)
+
+    def copy(self):
+        "Return the canonical names as a set"
+        return set(self._load())
+
+    def difference(self, *others):
+        return self.copy().difference(*others)
+
+    def intersection(self, *others):
+        return self.copy().intersection(*others)
+
+    def isdisjoint(self, other):
+        return self.copy().isdisjoint(other)
+
+    def issubset(self, other):
+        return self.copy().issubset(other)
+
+    def issuperset(self, other):
+        return self.copy().issuperset(other)
+
+    def symmetric_difference(self, other):
+        return self.copy().symmetric_difference(other)
+
+    def union(self, *others):
+        return self.copy().union(*others)
+
+    def info(self, name):
+        "Return the info of an algorithm by canonical name or alias"
+        algorithms = self._load()
+        try:
+            return algorithms[self._names[name]]
+        except KeyError:
+            msg = "Unknown {0} algorithm '{1}'".format(self.kind, name)
+            raise KeyError(msg)
+
+    def _load(self):
+        "Return the info of each algorithm by name, building it if needed"
+        if self._algorithms is None:
+            with self._lock:
+                if self._algorithms is None:
+                    with startup.phase('tls.registry.' + self.kind):
+                        infos = self._read()
+                        if infos is None:
+                            infos = self._build()
+                            self._write(infos)
+                    names = {}
+                    for info in infos:
+                        names[info.name] = info.name
+                        for alias in info.aliases:
+                            names[alias] = info.name
+                    self._names = names
+                    self._algorithms = dict((info.name, info)
+                                            for info in infos)
+        return self._algorithms
+
+    def _build(self):
+        "Return the info of each algorithm listed by OpenSSL"
+        size = api.tls_obj_names(self._objtype, api.NULL, 0)
+        entries = api.new('struct tls_obj_name[]', size)
+        count = min(size, api.tls_obj_names(self._objtype, entries, size))
+        names = {}
+        targets = {}
+        for index in range(count):
+            entry = entries[index]
+            name = api.string(entry.name)
+            if entry.target != api.NULL:
+                targets[name] = api.string(entry.target)
+            elif entry.nid != api.NID_undef:
+                names.setdefault(entry.nid, []).append(name)
+        canonical = {}
+        for nid in names:
+            names[nid].sort()
+            for name in names[nid]:
+                canonical[name] = names[nid][0]
+        for alias, target in targets.items():
+            seen = set()
+            while target in targets and target not in seen:
+                seen.add(target)
+                target = targets[target]
+            if target in canonical:
+                canonical[alias] = canonical[target]
+        aliases = {}
+        for name, primary in canonical.items():
+            if name != primary:
+                aliases.setdefault(primary, []).append(name)
+        infos = []
+        for nid in names:
+            name = names[nid][0]
+            info = self._describe(name, nid,
+                    tuple(sorted(aliases.get(name, ()))))
+            if info is not None:
+                infos.append(info)
+        return infos
+
+    def _path(self):
+        "Return the path the registry is saved to, or None"
+        directory = os.environ.get('OPENTLS_REGISTRY_CACHE')
+        if not directory:
+            return None
+        filename = 'registry-{0}-{1:x}.json'.format(self.kind, api.SSLeay())
+        return os.path.join(directory, filename)
+
+    def _read(self):
+        "Return the info of each algorithm from the saved registry, or None"
+        path = self._path()
+        if path is None:
+            return None
+        try:
+            with open(path) as saved:
+                rows = json.load(saved)
+            return [self._info_type(row[0].encode('ascii'), row[1],
+                        tuple(alias.encode('ascii') for alias in row[2]),
+                        *row[3:])
+                    for row in rows]
+        except (EnvironmentError, ValueError, TypeError, IndexError):
+            return None
+
+    def _write(self, infos):
+        "Save the info of each algorithm, if enabled"
+        path = self._path()
+        if path is None:
+            return
+        rows = [[info.name.decode('ascii'), info.nid,
+                 [alias.decode('ascii') for alias in info.aliases]]
+                + list(info[3:]) for info in infos]
+        try:
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        except EnvironmentError:
+            return
+        try:
+            with os.fdopen(fd, 'w') as saved:
+                json.dump(rows, saved)
+            os.rename(temporary, path)
+        except EnvironmentError:
+            os.remove(temporary)
+
+
+def _describe_digest(name, nid, aliases):
+    md = api.EVP_get_digestbyname(name)
+    if md == api.NULL:
+        return None
+    return DigestInfo(name, nid, aliases, api.EVP_MD_size(md),
+            api.EVP_MD_block_size(md))
+
+
+def _describe_cipher(name, nid, aliases):
+    cipher = api.EVP_get_cipherbyname(name)
+    if cipher == api.NULL:
+        return None
+    return CipherInfo(name, nid, aliases, api.EVP_CIPHER_key_length(cipher),
+            api.EVP_CIPHER_iv_length(cipher),
+            api.EVP_CIPHER_block_size(cipher), api.EVP_CIPHER_mode(cipher))
+
+
+digests = Registry('digests', api.OBJ_NAME_TYPE_MD_METH, _describe_digest,
+        DigestInfo)
+ciphers = Registry('ciphers', api.OBJ_NAME_TYPE_CIPHER_METH,
+        _describe_cipher, CipherInfo)
@@ -4,8 +4,11 @@ The following utilities are provided:
 
   - all_obj_type_names(objtype): Returns a set of object names for an OpenSSL
         object type.
+  - pack_messages(messages, offsets): Returns a buffer holding many messages
+        and the offsets of each message, for native loops over the messages.
 """
 from __future__ import absolute_import, division, print_function
+import array
 import sys
 
 from tls.c import api
@@ -41,3 +44,37 @@ def all_obj_type_names(objtype, unique_names=True):
         name = sorted(hashes[nid])[selection]
         algorithms.update(name)
     return algorithms
+
+
+def pack_messages(messages, offsets=None):
+    """Return a buffer holding messages, the offsets of each message within it
+    and the number of messages.
+
+    messages is an iterable of bytes objects, or a single buffer if offsets
+    is provided. offsets is then a sequence of ascending positions in the
+    buffer, one more than the number of messages, message i being
+    messages[offsets[i]:offsets[i + 1]]. An array.array of offsets whose
+    items are the size of a size_t is used without being converted, and must
+    be kept alive by the caller while the offsets are used.
+
+    The buffer is returned as a char[] cdata object and the offsets as a
+    size_t pointer. Raises ValueError if there are no offsets.
+    """
+    if offsets is None:
+        messages = list(messages)
+        offsets = [0]
+        total = 0
+        for message in messages:
+            total += len(message)
+            offsets.append(total)
+        messages = b''.join(messages)
+    data = api.from_buffer(messages)
+    if (isinstance(offsets, array.array) and offsets.typecode in 'LQ'
+            and offsets.itemsize == api.ffi.sizeof('size_t')):
+        c_offsets = api.cast('size_t*', api.from_buffer(offsets))
+    else:
+        offsets = c_offsets = api.new('size_t[]', list(offsets))
+    count = len(offsets) - 1
+    if count < 0:
+        raise ValueError('offsets must contain at least one position')
+    return data, c_offsets, count